@@ -0,0 +1,89 @@
+from flask import jsonify, request
+from utils.blockchain import blockchain  # ✅ Local blockchain ledger
+from utils.ledger_index import FILTERS, GROUPS
+
+
+def _filters():
+    filters = {field: request.args.get(field) for field in FILTERS}
+    filters["from"] = request.args.get("from")
+    filters["to"] = request.args.get("to")
+    return filters
+
+
+def _int_arg(name, default=None):
+    value = request.args.get(name)
+    if value is None or value == "":
+        return default
+    return int(value)
+
+
+# -------------------------------------------
+# ✅ Ledger height and tip
+# -------------------------------------------
+def get_ledger_summary():
+    tip = blockchain.tip or {}
+    return jsonify({
+        "height": blockchain.height,
+        "persisted_height": blockchain.persisted_height,
+        "indexed_height": blockchain.events.height,
+        "tip": {
+            "index": tip.get("index"),
+            "hash": tip.get("hash"),
+            "timestamp": tip.get("timestamp")
+        }
+    }), 200
+
+
+# -------------------------------------------
+# ✅ Single block by height
+# -------------------------------------------
+def get_block_by_index(index):
+    block = blockchain.get_block(index)
+    if block is None:
+        return jsonify({"error": "Block not found"}), 404
+    return jsonify(block), 200
+
+
+# -------------------------------------------
+# ✅ Events filtered by event / user_id / business_id / time, newest first
+# -------------------------------------------
+def query_events():
+    try:
+        limit = _int_arg("limit", 50)
+        before = _int_arg("before")
+    except ValueError:
+        return jsonify({"error": "limit and before must be integers"}), 400
+
+    try:
+        indexes, next_cursor = blockchain.events.find(_filters(), before=before, limit=limit)
+        events = [blockchain.get_block(i) for i in indexes]
+        return jsonify({
+            "events": events,
+            "count": len(events),
+            "next_cursor": next_cursor  # pass as ?before= for the next page
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# -------------------------------------------
+# ✅ Aggregate counts (optionally grouped by event / user_id / business_id / day)
+# -------------------------------------------
+def count_events():
+    group_by = request.args.get("group_by")
+    if group_by and group_by not in GROUPS:
+        return jsonify({"error": f"group_by must be one of {', '.join(GROUPS)}"}), 400
+    try:
+        limit = _int_arg("limit", 100)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    try:
+        total, groups = blockchain.events.count(_filters(), group_by=group_by, limit=limit)
+        response = {"total": total}
+        if group_by:
+            response["group_by"] = group_by
+            response["counts"] = groups
+        return jsonify(response), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
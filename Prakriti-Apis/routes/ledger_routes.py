@@ -0,0 +1,24 @@
+from flask import Blueprint
+from controllers.ledger_controller import get_ledger_summary, get_block_by_index, query_events, count_events
+
+ledger_bp = Blueprint("ledger_bp", __name__)
+
+# GET /api/v1/ledger/
+@ledger_bp.route("/", methods=["GET"])
+def ledger_summary():
+    return get_ledger_summary()
+
+# GET /api/v1/ledger/blocks/<index>
+@ledger_bp.route("/blocks/<int:index>", methods=["GET"])
+def ledger_block(index):
+    return get_block_by_index(index)
+
+# GET /api/v1/ledger/events?event=&user_id=&business_id=&from=&to=&limit=&before=
+@ledger_bp.route("/events", methods=["GET"])
+def ledger_events():
+    return query_events()
+
+# GET /api/v1/ledger/counts?group_by=event|user_id|business_id|day&event=&user_id=&business_id=&from=&to=
+@ledger_bp.route("/counts", methods=["GET"])
+def ledger_counts():
+    return count_events()
@@ -10,6 +10,7 @@ from routes.business_apply_routes import business_apply_bp
 from routes.qr_routes import qr_bp
 from routes.verifier_routes import verifier_bp
 from routes.tourist_submission_routes import submissions_bp
+from routes.ledger_routes import ledger_bp
 
 app = Flask(__name__)
 CORS(app)
@@ -25,6 +26,7 @@ app.register_blueprint(business_apply_bp, url_prefix="/api/v1/business")
 app.register_blueprint(qr_bp, url_prefix="/api/v1/qr")
 app.register_blueprint(verifier_bp, url_prefix="/api/v1/verifier")
 app.register_blueprint(submissions_bp, url_prefix="/api/v1/submissions")
+app.register_blueprint(ledger_bp, url_prefix="/api/v1/ledger")
 
 @app.route("/")
 def home():
@@ -0,0 +1,80 @@
+"""
+Test setup for the ledger.
+
+utils.blockchain talks to MongoDB and creates its singleton ledger in the
+working directory on import, so tests run against an in-memory collection
+from a scratch directory.
+
+    cd Prakriti-Apis && python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeCollection:
+    """The part of a pymongo collection the ledger uses"""
+
+    def __init__(self):
+        self.docs = []
+        self.fail = None  # exception the next insert_many calls raise
+
+    def insert_many(self, docs, ordered=True):
+        if self.fail is not None:
+            raise self.fail
+        for doc in docs:
+            doc["_id"] = f"{len(self.docs):024x}"
+            self.docs.append(doc)
+
+    def find_one(self, sort=None, projection=None):
+        if not self.docs:
+            return None
+        field, direction = sort[0]
+        return sorted(self.docs, key=lambda doc: doc[field] * direction)[0]
+
+
+class FakeMongoClient:
+    def __init__(self, uri=None, **kwargs):
+        self.databases = {}
+
+    def __getitem__(self, name):
+        return self.databases.setdefault(name, FakeDatabase())
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        collection = self[name] = FakeCollection()
+        return collection
+
+
+sys.modules["pymongo"] = types.SimpleNamespace(MongoClient=FakeMongoClient)
+try:
+    import bson  # noqa: F401
+except ImportError:
+    sys.modules["bson"] = types.SimpleNamespace(ObjectId=type("ObjectId", (), {}))
+
+os.chdir(tempfile.mkdtemp(prefix="ledger-tests-"))  # where the import-time singleton lives
+
+
+@pytest.fixture
+def open_ledger(tmp_path):
+    """Open (or reopen) a ledger whose files live in tmp_path; closed after the test"""
+    from utils.blockchain import Blockchain
+
+    ledgers = []
+
+    def open_ledger(**kwargs):
+        kwargs.setdefault("flush_interval", 0.005)
+        ledger = Blockchain(journal_file=str(tmp_path / "ledger.jsonl"),
+                            snapshot_file=str(tmp_path / "ledger.json"), **kwargs)
+        ledgers.append(ledger)
+        return ledger
+
+    yield open_ledger
+    for ledger in ledgers:
+        ledger.close()
@@ -0,0 +1,292 @@
+import json
+import os
+import threading
+
+import pytest
+
+import utils.blockchain
+
+
+def journal_blocks(ledger):
+    with open(ledger.journal_file, "rb") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_migrates_single_file_ledger(tmp_path, open_ledger):
+    legacy = [
+        {"index": 0, "timestamp": "2024-01-01 00:00:00", "data": "Genesis Block", "previous_hash": "0" * 64, "hash": "a" * 64},
+        {"index": 1, "timestamp": "2024-01-01 00:00:01", "data": {"event": "qr_scan"}, "previous_hash": "a" * 64, "hash": "b" * 64},
+    ]
+    (tmp_path / "ledger.json").write_text(json.dumps(legacy, indent=4))
+
+    ledger = open_ledger()
+    assert ledger.height == 2
+    assert ledger.tip["hash"] == "b" * 64
+    assert journal_blocks(ledger) == legacy
+
+    ledger.add_block({"event": "qr_scan"}, wait=True)
+    assert ledger.get_block(2)["previous_hash"] == "b" * 64
+
+
+def test_torn_tail_is_truncated(open_ledger):
+    ledger = open_ledger()
+    for i in range(3):
+        ledger.add_block({"event": "qr_scan", "n": i}, wait=True)
+    tip = ledger.tip
+    ledger.close()
+    size = os.path.getsize(ledger.journal_file)
+    with open(ledger.journal_file, "ab") as f:
+        f.write(b'{"index":4,"timestamp":"2025')  # crash mid-write
+
+    reopened = open_ledger()
+    assert os.path.getsize(reopened.journal_file) == size
+    assert (reopened.height, reopened.tip) == (4, tip)
+    reopened.add_block({"event": "qr_scan", "n": 3}, wait=True)
+    assert reopened.get_block(4)["previous_hash"] == tip["hash"]
+    assert reopened.verify()["ok"]
+
+
+def crashed_ledger(open_ledger, blocks=3):
+    ledger = open_ledger()
+    for i in range(blocks):
+        ledger.add_block({"event": "qr_scan", "n": i}, wait=True)
+    ledger.close()
+    return ledger
+
+
+def test_torn_record_at_last_index_entry_is_dropped(open_ledger):
+    ledger = crashed_ledger(open_ledger)
+    tip, size = ledger.tip, os.path.getsize(ledger.journal_file)
+    with open(ledger.journal_file, "ab") as f:
+        f.write(b'{"index":4,"timestamp":"2025')
+    with open(ledger.index_file, "ab") as f:
+        f.write(utils.blockchain.OFFSET.pack(size))  # index entry landed, its record did not
+
+    reopened = open_ledger()
+    assert (reopened.height, reopened.tip) == (4, tip)
+    assert os.path.getsize(reopened.index_file) == 4 * utils.blockchain.OFFSET.size
+    reopened.add_block({"event": "qr_scan", "n": 3}, wait=True)
+    assert reopened.get_block(4)["previous_hash"] == tip["hash"]
+    assert reopened.verify()["ok"]
+
+
+def test_index_behind_journal_is_rebuilt(open_ledger):
+    ledger = crashed_ledger(open_ledger)
+    tip = ledger.tip
+    os.truncate(ledger.index_file, 2 * utils.blockchain.OFFSET.size)
+
+    reopened = open_ledger()
+    assert (reopened.height, reopened.tip) == (4, tip)
+    assert [reopened.get_block(i) for i in range(4)] == journal_blocks(reopened)
+
+
+def test_index_ahead_of_journal_is_cut_back(open_ledger):
+    ledger = crashed_ledger(open_ledger)
+    blocks = journal_blocks(ledger)
+    with open(ledger.journal_file, "rb") as f:
+        lines = f.readlines()
+    with open(ledger.journal_file, "wb") as f:
+        f.writelines(lines[:3])  # journal tail lost, index kept all four entries
+
+    reopened = open_ledger()
+    assert (reopened.height, reopened.tip) == (3, blocks[2])
+    reopened.add_block({"event": "qr_scan", "n": 2}, wait=True)
+    assert reopened.get_block(3)["previous_hash"] == blocks[2]["hash"]
+    assert reopened.verify()["ok"]
+
+
+def test_snapshot_is_only_written_on_demand(open_ledger):
+    ledger = open_ledger()
+    for i in range(5):
+        ledger.add_block({"event": "qr_scan", "n": i})
+    ledger.add_block({"event": "qr_scan", "n": 5}, wait=True)
+    assert not os.path.exists(ledger.snapshot_file)
+
+    ledger.save_chain()
+    with open(ledger.snapshot_file) as f:
+        assert json.load(f) == journal_blocks(ledger)
+
+
+class FailingWrites:
+    """Wraps a file so that every write raises, like a full disk"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, data):
+        raise OSError(28, "No space left on device")
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+
+def test_mongo_failure_is_backfilled_from_the_journal(open_ledger):
+    ledger = open_ledger()
+    collection = ledger.mongo_col
+    collection.fail = ConnectionError("mongo down")
+    future = ledger.submit_block({"event": "qr_scan", "n": 1})
+    assert future.result(timeout=5) == future.block["hash"]  # committed to the journal
+    assert ledger.persisted_height == 2 and ledger.mongo_height == 1
+    assert "_id" not in future.block
+
+    collection.fail = None
+    ledger.add_block({"event": "qr_scan", "n": 2}, wait=True)
+    assert [doc["index"] for doc in collection.docs] == [0, 1, 2]
+    assert collection.docs[1]["hash"] == future.block["hash"]
+    assert ledger.mongo_height == 3
+
+
+def test_transient_journal_failure_is_retried(open_ledger, monkeypatch):
+    monkeypatch.setattr(utils.blockchain, "RETRY_DELAY", 0)
+    ledger = open_ledger()
+    ledger.journal = FailingWrites(ledger.journal)  # the retry reopens the real file
+    ledger.add_block({"event": "qr_scan"}, wait=True)
+
+    assert ledger.failed is None and ledger.persisted_height == 2
+    assert [block["index"] for block in journal_blocks(ledger)] == [0, 1]
+    assert ledger.verify()["ok"]
+
+
+def test_persistent_journal_failure_stops_the_ledger(open_ledger, monkeypatch):
+    monkeypatch.setattr(utils.blockchain, "RETRY_DELAY", 0)
+    ledger = open_ledger()
+    ledger.add_block({"event": "qr_scan", "n": 1}, wait=True)
+    journal_file = ledger.journal_file
+
+    def open_failing(path, *args, **kwargs):
+        f = open(path, *args, **kwargs)
+        return FailingWrites(f) if path == journal_file else f
+
+    monkeypatch.setattr(utils.blockchain, "open", open_failing, raising=False)
+    ledger.journal = FailingWrites(ledger.journal)
+    first = ledger.submit_block({"event": "qr_scan", "n": 2})
+    with pytest.raises(OSError):
+        first.result(timeout=5)
+    with pytest.raises(RuntimeError):
+        ledger.add_block({"event": "qr_scan", "n": 3})
+    assert ledger.persisted_height == 2 and not ledger.unpersisted
+    ledger.close()
+    monkeypatch.undo()
+
+    reopened = open_ledger()
+    assert reopened.height == 2 and reopened.verify()["ok"]
+    reopened.add_block({"event": "qr_scan", "n": 2}, wait=True)
+    assert reopened.get_block(2)["previous_hash"] == reopened.get_block(1)["hash"]
+
+
+def stalled_writer(ledger):
+    """Hold the writer inside _persist until the returned event is set"""
+    entered, release = threading.Event(), threading.Event()
+    persist = ledger._persist
+
+    def stalled(batch):
+        entered.set()
+        release.wait(5)
+        persist(batch)
+
+    ledger._persist = stalled
+    return entered, release
+
+
+def test_full_write_queue_refuses_blocks_without_blocking(open_ledger):
+    ledger = open_ledger(queue_size=1)
+    entered, release = stalled_writer(ledger)
+    first = ledger.submit_block({"event": "qr_scan", "n": 1})
+    assert entered.wait(5)  # the writer holds block 1; the queue is empty again
+    second = ledger.submit_block({"event": "qr_scan", "n": 2})
+    tip = ledger.tip
+
+    with pytest.raises(RuntimeError, match="queue is full"):
+        ledger.add_block({"event": "qr_scan", "n": 3})
+    assert (ledger.height, ledger.tip) == (3, tip)
+    assert sorted(ledger.unpersisted) == [1, 2]
+    assert ledger.lock.acquire(blocking=False)  # not left held by the refused block
+    ledger.lock.release()
+
+    release.set()
+    assert second.result(timeout=5) == second.block["hash"]
+    assert first.done()
+    ledger.add_block({"event": "qr_scan", "n": 3}, wait=True)
+    assert [block["index"] for block in journal_blocks(ledger)] == [0, 1, 2, 3]
+    assert ledger.get_block(3)["previous_hash"] == second.block["hash"]
+    assert ledger.verify()["ok"]
+
+
+def test_add_block_appends_to_the_journal(open_ledger):
+    ledger = open_ledger()
+    ledger.add_block({"event": "qr_scan", "n": 1}, wait=True)
+    with open(ledger.journal_file, "rb") as f:
+        before = f.read()
+
+    ledger.add_block({"event": "qr_scan", "n": 2}, wait=True)
+    with open(ledger.journal_file, "rb") as f:
+        after = f.read()
+    assert after.startswith(before)  # earlier records are never rewritten
+    assert json.loads(after[len(before):]) == ledger.get_block(2)
+    assert os.path.getsize(ledger.index_file) == 3 * utils.blockchain.OFFSET.size
+    assert not os.path.exists(ledger.snapshot_file)
+
+
+def test_queued_blocks_are_written_in_batches(open_ledger):
+    ledger = open_ledger(batch_size=3)
+    collection = ledger.mongo_col
+    inserts = []
+    insert_many = collection.insert_many
+
+    def recording_insert_many(docs, ordered=True):
+        inserts.append([doc["index"] for doc in docs])
+        insert_many(docs, ordered)
+
+    collection.insert_many = recording_insert_many
+    entered, release = stalled_writer(ledger)
+    futures = [ledger.submit_block({"event": "qr_scan", "n": 1})]
+    assert entered.wait(5)
+    futures += [ledger.submit_block({"event": "qr_scan", "n": n}) for n in range(2, 9)]
+
+    release.set()
+    assert [future.result(timeout=5) for future in futures] == [future.block["hash"] for future in futures]
+    assert inserts == [[1], [2, 3, 4], [5, 6, 7], [8]]
+    assert [doc["index"] for doc in collection.docs] == list(range(9))
+    journal = journal_blocks(ledger)
+    assert [block["previous_hash"] for block in journal[1:]] == [block["hash"] for block in journal[:-1]]
+
+
+def test_add_block_only_waits_for_persistence_when_asked(open_ledger):
+    ledger = open_ledger()
+    entered, release = stalled_writer(ledger)
+    block_hash = ledger.add_block({"event": "qr_scan", "n": 1})
+    assert entered.wait(5)
+    assert block_hash == ledger.tip["hash"] and ledger.persisted_height == 1
+    assert ledger.get_block(1)["hash"] == block_hash  # served from the queue
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(ledger.add_block({"event": "qr_scan", "n": 2}, wait=True)))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive() and not results
+
+    release.set()
+    waiter.join(5)
+    assert results == [ledger.tip["hash"]] and ledger.persisted_height == 3
+    assert not ledger.unpersisted
+
+
+def test_reopened_ledger_reads_old_blocks_on_demand(open_ledger, monkeypatch):
+    ledger = crashed_ledger(open_ledger, blocks=20)
+    chain = journal_blocks(ledger)
+
+    parsed = []
+    parse_record = utils.blockchain.Blockchain._parse_record
+    monkeypatch.setattr(utils.blockchain.Blockchain, "_parse_record",
+                        staticmethod(lambda line: parsed.append(line) or parse_record(line)))
+    reopened = open_ledger()
+    assert {json.loads(line)["index"] for line in parsed} == {20}  # only the tip's record is read on startup
+    assert (reopened.height, reopened.tip) == (21, chain[-1])
+    assert not reopened.unpersisted and not hasattr(reopened, "chain")
+
+    assert reopened.get_block(7) == chain[7]
+    assert reopened.get_block(-1) == chain[20]
+    assert reopened.get_block(21) is None and reopened.get_block(-22) is None
+    assert list(reopened.iter_blocks(5, 9)) == chain[5:9]
+    assert list(reopened.iter_blocks(19)) == chain[19:]
+    assert list(reopened.iter_blocks(21)) == []
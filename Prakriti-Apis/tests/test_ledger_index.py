@@ -0,0 +1,97 @@
+from collections import Counter
+
+from utils.ledger_index import MAX_PAGE, NO_VALUE, LedgerIndex
+
+
+def block(index, event, day, user_id=None):
+    return {"index": index, "timestamp": f"{day} 10:00:{index % 60:02d}",
+            "data": {"event": event, "user_id": user_id}}
+
+
+def rollup(index):
+    return sorted(index.conn.execute("SELECT day, event, n FROM daily_counts").fetchall())
+
+
+def rebuilt(tmp_path, name, blocks):
+    index = LedgerIndex(str(tmp_path / name))
+    index.add(blocks)
+    return index
+
+
+def test_truncate_keeps_daily_counts_consistent(tmp_path):
+    blocks = [{"index": 0, "timestamp": "2025-01-01 00:00:00", "data": "Genesis Block"}]
+    blocks += [block(i, "qr_scan" if i % 3 else "redeem", "2025-01-01" if i < 6 else "2025-01-02")
+               for i in range(1, 10)]
+    index = rebuilt(tmp_path, "events.db", blocks)
+
+    for height in (7, 6, 3):
+        index.truncate(height)
+        assert index.height == height
+        assert rollup(index) == rollup(rebuilt(tmp_path, f"expected-{height}.db", blocks[:height]))
+
+    index.add(blocks[3:])
+    assert rollup(index) == rollup(rebuilt(tmp_path, "expected.db", blocks))
+    assert index.count({}) == (10, None)
+
+
+def test_count_limit_is_clamped(tmp_path):
+    blocks = [block(i, "qr_scan", "2025-01-01", user_id=i) for i in range(MAX_PAGE + 5)]
+    index = rebuilt(tmp_path, "events.db", blocks)
+
+    total, groups = index.count({}, group_by="user_id", limit=-1)
+    assert (total, len(groups)) == (MAX_PAGE + 5, 1)
+    total, groups = index.count({}, group_by="user_id", limit=MAX_PAGE * 2)
+    assert len(groups) == MAX_PAGE
+
+
+def three_days(tmp_path):
+    blocks = [block(i, "qr_scan" if i % 3 else "redeem", f"2025-01-0{1 + i // 10}", user_id=i % 4)
+              for i in range(30)]
+    return blocks, rebuilt(tmp_path, "events.db", blocks)
+
+
+def test_find_pages_newest_first(tmp_path):
+    blocks, index = three_days(tmp_path)
+    expected = [b["index"] for b in reversed(blocks) if b["data"]["event"] == "qr_scan"]
+
+    pages, before = [], None
+    while True:
+        indexes, before = index.find({"event": "qr_scan"}, before=before, limit=4)
+        pages.append(indexes)
+        if before is None:
+            break
+    assert all(len(page) == 4 for page in pages[:-1])
+    assert [i for page in pages for i in page] == expected
+
+
+def test_find_by_time_range(tmp_path):
+    _, index = three_days(tmp_path)
+    assert index.find({"from": "2025-01-02", "to": "2025-01-03"})[0] == list(range(19, 9, -1))
+    assert index.find({"from": "2025-01-02T10:00:15Z", "to": "2025-01-03"})[0] == list(range(19, 14, -1))
+    assert index.find({"from": "2025-01-02", "user_id": 1})[0] == [29, 25, 21, 17, 13]
+    assert index.find({"from": "2026-01-01"})[0] == []
+
+
+def test_counts_match_the_events(tmp_path):
+    blocks, index = three_days(tmp_path)
+    day_two = [b for b in blocks if b["timestamp"].startswith("2025-01-02")]
+
+    whole_days = index.count({"from": "2025-01-02", "to": "2025-01-03"}, group_by="event")  # daily rollup
+    by_time = index.count({"from": "2025-01-02 00:00:00", "to": "2025-01-03 00:00:00"}, group_by="event")
+    assert whole_days == by_time == (10, dict(Counter(b["data"]["event"] for b in day_two)))
+
+    total, groups = index.count({"event": "redeem"}, group_by="user_id")
+    redeemed = Counter(str(b["data"]["user_id"]) for b in blocks if b["data"]["event"] == "redeem")
+    assert (total, groups) == (sum(redeemed.values()), dict(redeemed))
+    assert index.count({}, group_by="day")[1] == {"2025-01-01": 10, "2025-01-02": 10, "2025-01-03": 10}
+
+
+def test_ledger_indexes_blocks_as_they_are_persisted(open_ledger):
+    ledger = open_ledger()
+    ledger.add_block({"event": "qr_scanned", "user_id": 7, "business_id": "b1"}, wait=True)
+    ledger.add_block({"event": "user_login", "user_id": 7}, wait=True)
+
+    assert ledger.events.height == 3
+    assert ledger.events.find({"user_id": 7})[0] == [2, 1]
+    assert ledger.events.find({"business_id": "b1"})[0] == [1]
+    assert ledger.events.count({}, group_by="event")[1] == {"qr_scanned": 1, "user_login": 1, NO_VALUE: 1}
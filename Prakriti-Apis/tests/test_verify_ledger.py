@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from utils.verify_ledger import block_hash, verify_ledger
+
+
+def write_ledger(ledger, blocks):
+    with open(ledger.journal_file, "w") as f:
+        for block in blocks:
+            f.write(json.dumps(block) + "\n")
+
+
+@pytest.fixture
+def blocks(open_ledger):
+    ledger = open_ledger()
+    for i in range(8):
+        ledger.add_block({"event": "qr_scan", "n": i}, wait=True)
+    ledger.close()
+    with open(ledger.journal_file) as f:
+        return ledger, [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize("chunk_bytes", [1 << 20, 64])
+def test_intact_ledger(blocks, chunk_bytes):
+    ledger, _ = blocks
+    result = verify_ledger(ledger.journal_file, workers=1, chunk_bytes=chunk_bytes)
+    assert result["ok"] and result["blocks"] == 9 and result["legacy"] == 0
+
+
+@pytest.mark.parametrize("chunk_bytes", [1 << 20, 64])
+def test_tampered_block(blocks, chunk_bytes):
+    ledger, chain = blocks
+    chain[5]["data"]["n"] = 99
+    write_ledger(ledger, chain)
+
+    error = verify_ledger(ledger.journal_file, workers=1, chunk_bytes=chunk_bytes)["error"]
+    assert (error["index"], error["reason"]) == (5, "hash does not match block contents")
+
+
+@pytest.mark.parametrize("chunk_bytes", [1 << 20, 64])
+def test_tampered_block_cannot_pass_as_legacy(blocks, chunk_bytes):
+    ledger, chain = blocks
+    chain[5]["data"]["n"] = 99
+    del chain[5]["hash_version"]
+    write_ledger(ledger, chain)
+
+    result = verify_ledger(ledger.journal_file, workers=1, chunk_bytes=chunk_bytes)
+    assert not result["ok"]
+    assert (result["error"]["index"], result["error"]["reason"]) == \
+        (5, "block without hash_version after versioned blocks")
+
+
+@pytest.mark.parametrize("chunk_bytes", [1 << 20, 64])
+def test_legacy_prefix_is_link_checked(blocks, chunk_bytes):
+    ledger, chain = blocks
+    for block in chain[:3]:
+        del block["hash_version"]
+    write_ledger(ledger, chain)
+
+    result = verify_ledger(ledger.journal_file, workers=1, chunk_bytes=chunk_bytes)
+    assert result["ok"] and result["legacy"] == 3
+
+
+def test_block_hash_covers_only_the_stored_fields(blocks):
+    ledger, chain = blocks
+    block = chain[3]
+    reordered = dict(reversed(list(block.items())))
+    reordered["data"] = dict(reversed(list(block["data"].items())))
+    assert block_hash(reordered) == block_hash(block) == block["hash"]
+    assert block_hash(dict(block, _id="0" * 24)) == block["hash"]  # MongoDB's _id is not hashed
+    assert block_hash(dict(block, timestamp=block["timestamp"] + "1")) != block["hash"]
+
+
+@pytest.mark.parametrize("chunk_bytes", [1 << 20, 64])
+def test_parallel_verify_matches_serial(blocks, chunk_bytes):
+    ledger, chain = blocks
+    serial = verify_ledger(ledger.journal_file, workers=1, chunk_bytes=chunk_bytes)
+    parallel = verify_ledger(ledger.journal_file, workers=3, chunk_bytes=chunk_bytes)
+    assert parallel["ok"] and parallel["blocks"] == serial["blocks"] == 9
+
+    del chain[4]  # the first broken link is reported whichever worker finds it
+    write_ledger(ledger, chain)
+    serial = verify_ledger(ledger.journal_file, workers=1, chunk_bytes=chunk_bytes)
+    parallel = verify_ledger(ledger.journal_file, workers=3, chunk_bytes=chunk_bytes)
+    assert not parallel["ok"] and parallel["error"] == serial["error"]
+    assert parallel["error"]["index"] == 5
@@ -1,76 +1,406 @@
+import atexit
 import json
-import hashlib
 import os
+import queue
+import struct
+import threading
+import time
+from concurrent.futures import Future
 from datetime import datetime
 from pymongo import MongoClient
 from bson import ObjectId  # <-- ✅ import this
+from utils.ledger_index import LedgerIndex
+from utils.verify_ledger import HASH_VERSION, block_hash, verify_ledger
 
-LEDGER_FILE = os.path.join(os.getcwd(), "blockchain_ledger.json")
+LEDGER_FILE = os.path.join(os.getcwd(), "blockchain_ledger.json")    # pre-journal single-file ledger (migrated once)
+JOURNAL_FILE = os.path.join(os.getcwd(), "blockchain_ledger.jsonl")  # append-only journal
+QUEUE_SIZE = 10000      # blocks waiting to be persisted before add_block refuses new ones
+BATCH_SIZE = 500        # blocks per insert_many / journal write
+FLUSH_INTERVAL = 0.05   # seconds a partial batch waits for more blocks
+JOURNAL_RETRIES = 3     # attempts at a batch's journal write before the ledger stops accepting blocks
+RETRY_DELAY = 0.1       # seconds before the first retry (doubled each time)
+MONGO_BACKFILL = 10000  # blocks MongoDB is caught up by per batch after inserts failed
+OFFSET = struct.Struct("<Q")  # one entry per block in the .idx file: byte offset of its journal record
 
 
 class Blockchain:
-    def __init__(self, mongo_uri="mongodb://localhost:27017", mongo_db="PrakritiAi", collection="blockchain"):
-        self.chain = []
+    def __init__(self, mongo_uri="mongodb://localhost:27017", mongo_db="PrakritiAi", collection="blockchain",
+                 journal_file=JOURNAL_FILE, snapshot_file=LEDGER_FILE, fsync=False,
+                 queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        # ✅ Only the tip, the height and the offset index are kept; older blocks are read on demand
+        self.tip = None
+        self.height = 0
+        self.journal_file = journal_file
+        self.index_file = os.path.splitext(journal_file)[0] + ".idx"
+        self.events_file = os.path.splitext(journal_file)[0] + ".events.db"
+        self.snapshot_file = snapshot_file
+        self.fsync = fsync  # fsync the journal after every batch
+        self.journal = None
+        self.index = None
+        self.reader = None  # read-only fds for pread
+        self.index_reader = None
+        self.journal_size = 0
+        self.events = None  # secondary indexes for ledger queries
         self.mongo_client = MongoClient(mongo_uri)
         self.mongo_db = self.mongo_client[mongo_db]
         self.mongo_col = self.mongo_db[collection]
+
+        # ✅ Background writer: blocks are chained in add_block and persisted in batches
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()  # orders index/previous_hash assignment with enqueueing
+        self.pending = queue.Queue(maxsize=queue_size)
+        self.unpersisted = {}  # index -> block, queued but not in the journal yet
+        self.persisted_height = 0
+        self.mongo_height = 0  # blocks [0, mongo_height) are in MongoDB
+        self.failed = None  # journal error that stopped the ledger from accepting blocks
+        self.writer = threading.Thread(target=self._writer_loop, name="ledger-writer", daemon=True)
+
         self.load_chain()
+        self.writer.start()
+        self.create_genesis_block()
 
     def load_chain(self):
-        if os.path.exists(LEDGER_FILE):
-            try:
-                with open(LEDGER_FILE, "r") as f:
-                    self.chain = json.load(f)
-            except Exception:
-                self.chain = []
-        else:
-            self.chain = []
-            self.create_genesis_block()
+        """
+        The journal (one JSON block per line) is the source of truth and
+        the .idx file holds the offset of every record in it. Only records
+        after the last indexed one are scanned, so startup does not depend
+        on ledger size. Ledgers from before the journal existed are
+        migrated from the old single-file format once.
+        """
+        if not os.path.exists(self.journal_file):
+            chain = []
+            if os.path.exists(self.snapshot_file):
+                try:
+                    with open(self.snapshot_file, "r") as f:
+                        chain = json.load(f)
+                except Exception:
+                    chain = []
+            self._write_file(self.journal_file, (self._journal_line(b) for b in chain))
+
+        self.journal = open(self.journal_file, "ab")
+        self.index = open(self.index_file, "ab")
+        self.reader = os.open(self.journal_file, os.O_RDONLY)
+        self.index_reader = os.open(self.index_file, os.O_RDONLY)
+        self._recover()
+
+        # ✅ Bring the query indexes in line with the journal (only new blocks are read)
+        self.events = LedgerIndex(self.events_file)
+        if self.events.height > self.persisted_height:
+            self.events.truncate(self.persisted_height)
+        self.events.add(self.iter_blocks(self.events.height))
+        self.mongo_height = self._mongo_height()
+
+    def _recover(self):
+        """Bring the offset index up to date with the journal and load the tip"""
+        journal_size = os.path.getsize(self.journal_file)
+        height = os.path.getsize(self.index_file) // OFFSET.size
+        while height and self._offset(height - 1) >= journal_size:
+            height -= 1  # entries for records lost with the journal tail
+
+        with open(self.journal_file, "rb") as f:
+            # ✅ Step back over entries pointing at torn records, so the tip is a complete block
+            while height:
+                f.seek(self._offset(height - 1))
+                block = self._parse_record(f.readline())
+                if block is not None and block.get("index") == height - 1:
+                    break
+                height -= 1
+            height = max(height - 1, 0)  # re-read the last indexed record to load the tip
+            start = self._offset(height) if height else 0
+            self.index.truncate(height * OFFSET.size)
+
+            # ✅ Scan only the unindexed tail, truncating a torn record left by a crash
+            good_bytes = start
+            self.tip = None
+            f.seek(start)
+            for line in f:
+                block = self._parse_record(line)
+                if block is None:
+                    break
+                self.tip = block
+                self.index.write(OFFSET.pack(good_bytes))
+                good_bytes += len(line)
+                height += 1
+
+        if journal_size > good_bytes:
+            print(f"⚠️ Truncating torn ledger record at byte {good_bytes} of {self.journal_file}")
+            self.journal.truncate(good_bytes)
+        self.index.flush()
+
+        self.journal_size = good_bytes
+        self.height = self.persisted_height = height
+
+    @staticmethod
+    def _parse_record(line):
+        """A complete journal record as a block, or None if it is torn or unreadable"""
+        if not line.endswith(b"\n"):
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def _mongo_height(self):
+        """Blocks MongoDB already holds, so inserts missed before a restart are backfilled"""
+        try:
+            last = self.mongo_col.find_one(sort=[("index", -1)], projection={"index": 1})
+        except Exception as e:
+            print(f"⚠️ Could not read the MongoDB ledger height: {e}")
+            return self.persisted_height
+        return 0 if last is None else last["index"] + 1
 
     def create_genesis_block(self):
-        if not self.chain:
-            genesis_data = "Genesis Block"
-            previous_hash = "0" * 64
-            hash_val = self.compute_hash(genesis_data, previous_hash)
+        if not self.height:
             genesis_block = {
                 "index": 0,
                 "timestamp": str(datetime.utcnow()),
-                "data": genesis_data,
+                "data": "Genesis Block",
+                "previous_hash": "0" * 64,
+                "hash_version": HASH_VERSION
+            }
+            genesis_block["hash"] = self.compute_hash(genesis_block)
+            # save to MongoDB and the journal before serving requests
+            with self.lock:
+                future = self._enqueue(genesis_block)
+            future.result()
+
+    def compute_hash(self, block):
+        """Deterministic hash of the stored block fields (see utils.verify_ledger)"""
+        return block_hash(block)
+
+    def add_block(self, data: dict, wait=False):
+        """
+        Chain a new block and queue it for persistence.
+        Returns the block hash right away; with wait=True only once the
+        block is in the journal (and MongoDB, unless the insert failed and
+        is left to be backfilled from the journal).
+        """
+        future = self.submit_block(data)
+        if wait:
+            return future.result()
+        return future.block["hash"]
+
+    def submit_block(self, data: dict):
+        """
+        Chain a new block and queue it for persistence.
+        Returns a Future that resolves to the block hash once it is
+        persisted (future.block holds the block itself).
+        Raises RuntimeError once a journal failure has stopped the ledger,
+        or when the writer is queue_size blocks behind (retry shortly).
+        """
+        with self.lock:
+            if self.failed is not None:
+                raise RuntimeError(f"Ledger stopped accepting blocks after a journal write failed: {self.failed}")
+            previous_hash = self.tip["hash"] if self.tip else "0" * 64
+
+            block = {
+                "index": self.height,
+                "timestamp": str(datetime.utcnow()),
+                "data": data,
                 "previous_hash": previous_hash,
-                "hash": hash_val
+                "hash_version": HASH_VERSION
             }
-            self.chain.append(genesis_block)
-            # save to MongoDB
-            self.mongo_col.insert_one(genesis_block)
-            self.save_chain()
-
-    def compute_hash(self, data, previous_hash):
-        block_string = f"{data}{previous_hash}{datetime.utcnow().isoformat()}"
-        return hashlib.sha256(block_string.encode()).hexdigest()
-
-    def add_block(self, data: dict):
-        last_block = self.chain[-1] if self.chain else None
-        previous_hash = last_block["hash"] if last_block else "0" * 64
-        data_str = json.dumps(data, sort_keys=True)
-        new_hash = self.compute_hash(data_str, previous_hash)
-
-        block = {
-            "index": len(self.chain),
-            "timestamp": str(datetime.utcnow()),
-            "data": data,
-            "previous_hash": previous_hash,
-            "hash": new_hash
-        }
-
-        # ✅ Insert into MongoDB
-        inserted = self.mongo_col.insert_one(block)
-        block["_id"] = str(inserted.inserted_id)  # convert ObjectId to string
-
-        # ✅ Append to local chain (safe for JSON)
-        self.chain.append(self._clean_block(block))
-        self.save_chain()
-
-        return new_hash
+            block["hash"] = self.compute_hash(block)
+            return self._enqueue(block)
+
+    def _enqueue(self, block):
+        """
+        Make a block the new tip and hand it to the writer (caller holds self.lock).
+        Never waits for room in the queue: that would stall every add_block
+        behind the lock, so a full queue is refused and the tip is left as it was.
+        """
+        future = Future()
+        future.block = block
+        previous_tip = self.tip
+        self.tip = block
+        self.height += 1
+        self.unpersisted[block["index"]] = block  # before the writer can see (and drop) it
+        try:
+            self.pending.put_nowait((block, future))
+        except queue.Full:
+            del self.unpersisted[block["index"]]
+            self.height -= 1
+            self.tip = previous_tip
+            raise RuntimeError(f"Ledger write queue is full ({self.pending.maxsize} blocks behind), retry shortly")
+        return future
+
+    def get_block(self, index):
+        """Block at a height (negative counts from the tip), or None"""
+        if index < 0:
+            index += self.height
+        block = self.unpersisted.get(index)  # still queued for the writer
+        if block is not None:
+            return block
+        if not 0 <= index < self.persisted_height:
+            return None
+        offset = self._offset(index)
+        end = self._offset(index + 1) if index + 1 < self.persisted_height else self.journal_size
+        record = os.pread(self.reader, end - offset, offset)
+        return json.loads(record[:record.index(b"\n")])
+
+    def iter_blocks(self, start=0, stop=None):
+        """Stream persisted blocks [start, stop) from the journal"""
+        stop = self.persisted_height if stop is None else min(stop, self.persisted_height)
+        if start >= stop:
+            return
+        with open(self.journal_file, "rb") as f:
+            f.seek(self._offset(start))
+            for _ in range(stop - start):
+                yield json.loads(f.readline())
+
+    def _offset(self, index):
+        return OFFSET.unpack(os.pread(self.index_reader, OFFSET.size, index * OFFSET.size))[0]
+
+    def _writer_loop(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.pending.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._persist(batch)
+            if stop:
+                return
+
+    def _persist(self, batch):
+        """
+        Write a batch with one journal write, one index write and one insert_many.
+        The journal is the source of truth: it decides whether the blocks are
+        persisted, and MongoDB is caught up from it when an insert fails.
+        """
+        blocks = [block for block, _ in batch]
+        error = self.failed or self._write_journal(blocks)
+        if error is None:
+            self._index_events(blocks)
+            self._insert_mongo(blocks)
+        else:
+            for block in blocks:
+                self.unpersisted.pop(block["index"], None)
+
+        for block, future in batch:
+            if error is None:
+                future.set_result(block["hash"])
+            else:
+                future.set_exception(error)
+
+    def _write_journal(self, blocks):
+        """Append blocks to the journal and the offset index, retrying failed writes; returns the error if all failed"""
+        records = [self._journal_line(self._clean_block(block)).encode() for block in blocks]
+        offsets = []
+        end = self.journal_size
+        for record in records:
+            offsets.append(OFFSET.pack(end))
+            end += len(record)
+
+        for attempt in range(JOURNAL_RETRIES):
+            try:
+                self.journal.write(b"".join(records))
+                self.journal.flush()
+                if self.fsync:
+                    os.fsync(self.journal.fileno())
+                # index entries are written after the records they point at
+                self.index.write(b"".join(offsets))
+                self.index.flush()
+            except Exception as e:
+                print(f"❌ Journal write of blocks {blocks[0]['index']}-{blocks[-1]['index']} failed: {e}")
+                error = e
+                self._discard_partial_write()
+                if attempt + 1 < JOURNAL_RETRIES:
+                    time.sleep(RETRY_DELAY * 2 ** attempt)
+                continue
+            self.journal_size = end
+            self.persisted_height = blocks[-1]["index"] + 1
+            for block in blocks:
+                self.unpersisted.pop(block["index"], None)
+            return None
+
+        self._stop_accepting(error)
+        return error
+
+    def _discard_partial_write(self):
+        """Cut the journal and index back to the last persisted record before a retry"""
+        try:
+            for f in (self.journal, self.index):
+                try:
+                    f.close()  # drops whatever is still buffered
+                except Exception:
+                    pass
+            os.truncate(self.journal_file, self.journal_size)
+            os.truncate(self.index_file, self.persisted_height * OFFSET.size)
+            self.journal = open(self.journal_file, "ab")
+            self.index = open(self.index_file, "ab")
+        except Exception as e:
+            print(f"❌ Could not reset {self.journal_file} after a failed write: {e}")
+
+    def _stop_accepting(self, error):
+        """
+        Queued blocks are chained on top of the ones that could not be written,
+        so after a persistent journal failure they fail too and add_block raises.
+        The journal stays consistent up to persisted_height; restart to recover.
+        """
+        print(f"❌ Ledger stopped accepting blocks at height {self.persisted_height}: {error}")
+        self.failed = error
+
+    def _insert_mongo(self, blocks):
+        """Insert persisted blocks into MongoDB, first backfilling any that earlier inserts missed"""
+        start = blocks[0]["index"]
+        if self.mongo_height >= start:
+            # insert_many adds _id to these copies only
+            docs = [dict(block) for block in blocks if block["index"] >= self.mongo_height]
+            if not docs:
+                return
+        else:
+            stop = min(self.mongo_height + MONGO_BACKFILL, self.persisted_height)
+            docs = list(self.iter_blocks(self.mongo_height, stop))
+        try:
+            self.mongo_col.insert_many(docs, ordered=True)
+            self.mongo_height = docs[-1]["index"] + 1
+        except Exception as e:
+            inserted = (getattr(e, "details", None) or {}).get("nInserted", 0)  # BulkWriteError: ordered prefix went in
+            if inserted:
+                self.mongo_height = docs[0]["index"] + inserted
+            print(f"⚠️ MongoDB insert of blocks {docs[0]['index']}-{docs[-1]['index']} failed "
+                  f"(backfilled from the journal later): {e}")
+
+    def _index_events(self, blocks):
+        try:
+            if self.events.height < blocks[0]["index"]:
+                # an earlier batch failed to index: fill the gap from the journal
+                self.events.add(self.iter_blocks(self.events.height, blocks[0]["index"]))
+            self.events.add(blocks)
+        except Exception as e:
+            print(f"⚠️ Ledger index update for blocks {blocks[0]['index']}-{blocks[-1]['index']} failed: {e}")
+
+    def verify(self, workers=None):
+        """Verify the persisted journal; returns the verify_ledger summary"""
+        return verify_ledger(self.journal_file, workers)
+
+    def close(self):
+        """Persist everything still queued and stop the writer"""
+        if self.writer.is_alive():
+            self.pending.put(None)
+            self.writer.join()
+        if self.journal:
+            self.journal.close()
+            self.index.close()
+            os.close(self.reader)
+            os.close(self.index_reader)
+            self.events.close()
+            self.journal = None
+
+    def _journal_line(self, block):
+        return json.dumps(block, separators=(",", ":"), default=str) + "\n"
 
     def _clean_block(self, block):
         """Convert ObjectIds and other non-serializable objects to strings"""
@@ -85,11 +415,34 @@ class Blockchain:
         return clean_block
 
     def save_chain(self):
-        # ✅ always clean blocks before writing
-        cleaned_chain = [self._clean_block(b) for b in self.chain]
-        with open(LEDGER_FILE, "w") as f:
-            json.dump(cleaned_chain, f, indent=4)
+        """
+        Export the persisted ledger in the old single-file format (one JSON array), streamed from the journal.
+        Only for tools that still read that file: recovery starts from the journal and its .idx.
+        """
+        self._write_file(self.snapshot_file, self._snapshot_lines(self.journal_size))
+
+    def _snapshot_lines(self, size):
+        yield "[\n"
+        read = 0
+        with open(self.journal_file, "rb") as f:
+            for line in f:
+                read += len(line)
+                if read > size:  # records appended after the snapshot started
+                    break
+                yield ("," if read > len(line) else "") + line.decode("utf-8")
+        yield "]\n"
+
+    def _write_file(self, path, lines):
+        """Write a file atomically: temp file, fsync, rename"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
 
 
-# ✅ Singleton
+# ✅ Singleton (queued blocks are flushed on interpreter exit)
 blockchain = Blockchain()
+atexit.register(blockchain.close)
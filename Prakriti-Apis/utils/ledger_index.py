@@ -0,0 +1,203 @@
+"""
+Secondary indexes over the ledger: event, user_id, business_id and timestamp.
+
+One row per block lives in a small SQLite file next to the journal. Rows
+are added as blocks are persisted, so queries never scan the journal.
+Block timestamps are assigned in block order, so a time range is turned
+into a block_index range and every query becomes an index range scan.
+Per-day event counts are rolled up on insert, so ledger-wide aggregates
+read a few hundred rows instead of every event.
+"""
+import sqlite3
+import threading
+from collections import Counter
+
+FILTERS = ("event", "user_id", "business_id")
+GROUPS = {
+    "event": "event",
+    "user_id": "user_id",
+    "business_id": "business_id",
+    "day": "substr(timestamp, 1, 10)",
+}
+MAX_PAGE = 500
+NO_VALUE = "(none)"  # group key for blocks without the grouped field (genesis, legacy)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    block_index INTEGER PRIMARY KEY,
+    event TEXT,
+    user_id TEXT,
+    business_id TEXT,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_event ON events(event, block_index);
+CREATE INDEX IF NOT EXISTS idx_events_user ON events(user_id, block_index);
+CREATE INDEX IF NOT EXISTS idx_events_business ON events(business_id, block_index);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp);
+CREATE TABLE IF NOT EXISTS daily_counts (
+    day TEXT NOT NULL,
+    event TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (day, event)
+);
+"""
+
+
+def _key(value):
+    return None if value is None else str(value)
+
+
+def normalize_timestamp(value):
+    """Accept ISO timestamps ("2025-01-01T10:00:00") as well as the ledger's own format"""
+    return value.replace("T", " ").rstrip("Z") if value else None
+
+
+class LedgerIndex:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()  # one read connection per thread
+        self.write_lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)  # used only under write_lock
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        last = self.conn.execute("SELECT MAX(block_index) FROM events").fetchone()[0]
+        self.height = 0 if last is None else last + 1
+
+    def _reader(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def _row(self, block):
+        data = block.get("data") if isinstance(block.get("data"), dict) else {}
+        return (block["index"], data.get("event"), _key(data.get("user_id")),
+                _key(data.get("business_id")), block.get("timestamp"))
+
+    def add(self, blocks, chunk_size=10000):
+        """Index blocks in order (an iterable, so a whole journal can be streamed in)"""
+        with self.write_lock:
+            rows = []
+            for block in blocks:
+                rows.append(self._row(block))
+                if len(rows) >= chunk_size:
+                    self._insert(rows)
+                    rows = []
+            if rows:
+                self._insert(rows)
+
+    def _insert(self, rows):
+        rows = [row for row in rows if row[0] >= self.height]  # already indexed (e.g. re-read tip)
+        if not rows:
+            return
+        daily = Counter(((row[4] or "")[:10], row[1] or NO_VALUE) for row in rows)
+        with self.conn:
+            self.conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?)", rows)
+            self.conn.executemany("""
+                INSERT INTO daily_counts VALUES (?, ?, ?)
+                ON CONFLICT(day, event) DO UPDATE SET n = n + excluded.n
+            """, [(day, event, n) for (day, event), n in daily.items()])
+        self.height = rows[-1][0] + 1
+
+    def truncate(self, height):
+        """Drop rows for blocks the journal no longer has"""
+        with self.write_lock, self.conn:
+            for day, event, n in self.conn.execute("""
+                SELECT substr(timestamp, 1, 10), COALESCE(event, ?), COUNT(*) FROM events
+                WHERE block_index >= ? GROUP BY 1, 2
+            """, (NO_VALUE, height)).fetchall():
+                self.conn.execute("UPDATE daily_counts SET n = n - ? WHERE day = ? AND event = ?",
+                                  (n, day or "", event))
+            self.conn.execute("DELETE FROM daily_counts WHERE n <= 0")
+            self.conn.execute("DELETE FROM events WHERE block_index >= ?", (height,))
+            self.height = min(self.height, height)
+
+    def _block_range(self, since=None, until=None):
+        """Map a [since, until) timestamp range to a [lo, hi) block_index range"""
+        conn = self._reader()
+        lo, hi = 0, self.height
+        if since:
+            row = conn.execute("SELECT block_index FROM events WHERE timestamp >= ? ORDER BY timestamp LIMIT 1",
+                               (normalize_timestamp(since),)).fetchone()
+            lo = row[0] if row else hi
+        if until:
+            row = conn.execute("SELECT block_index FROM events WHERE timestamp < ? ORDER BY timestamp DESC LIMIT 1",
+                               (normalize_timestamp(until),)).fetchone()
+            hi = row[0] + 1 if row else 0
+        return lo, hi
+
+    def _where(self, filters):
+        clauses, params = [], []
+        if filters.get("from") or filters.get("to"):
+            lo, hi = self._block_range(filters.get("from"), filters.get("to"))
+            clauses += ["block_index >= ?", "block_index < ?"]
+            params += [lo, hi]
+        for field in FILTERS:
+            if filters.get(field) is not None:
+                clauses.append(f"{field} = ?")
+                params.append(_key(filters[field]))
+        return " AND ".join(clauses) or "1", params
+
+    def find(self, filters, before=None, limit=50):
+        """
+        Block indexes matching the filters, newest first.
+        Returns (indexes, next_cursor); pass next_cursor as `before` for the next page.
+        """
+        limit = max(1, min(limit, MAX_PAGE))
+        where, params = self._where(filters)
+        if before is not None:
+            where += " AND block_index < ?"
+            params.append(before)
+        rows = self._reader().execute(
+            f"SELECT block_index FROM events WHERE {where} ORDER BY block_index DESC LIMIT ?",
+            params + [limit + 1]).fetchall()
+        indexes = [r[0] for r in rows[:limit]]
+        return indexes, (indexes[-1] if len(rows) > limit else None)
+
+    def count(self, filters, group_by=None, limit=100):
+        """Total matching events, plus the top `limit` groups when group_by is set"""
+        limit = max(1, min(limit, MAX_PAGE))  # a negative LIMIT means no limit to SQLite
+        if self._rollup_covers(filters, group_by):
+            return self._count_daily(filters, group_by, limit)
+        where, params = self._where(filters)
+        conn = self._reader()
+        total = conn.execute(f"SELECT COUNT(*) FROM events WHERE {where}", params).fetchone()[0]
+        if not group_by:
+            return total, None
+        expr = GROUPS[group_by]
+        rows = conn.execute(
+            f"SELECT {expr}, COUNT(*) AS n FROM events WHERE {where} GROUP BY {expr} ORDER BY n DESC LIMIT ?",
+            params + [limit]).fetchall()
+        return total, {NO_VALUE if k is None else str(k): n for k, n in rows}
+
+    def _rollup_covers(self, filters, group_by):
+        """daily_counts answers event/day aggregates over whole days"""
+        whole_days = all(not filters.get(k) or len(filters[k]) == 10 for k in ("from", "to"))
+        return (whole_days and group_by in (None, "event", "day")
+                and filters.get("user_id") is None and filters.get("business_id") is None)
+
+    def _count_daily(self, filters, group_by, limit):
+        clauses, params = [], []
+        if filters.get("from"):
+            clauses.append("day >= ?")
+            params.append(filters["from"])
+        if filters.get("to"):
+            clauses.append("day < ?")
+            params.append(filters["to"])
+        if filters.get("event") is not None:
+            clauses.append("event = ?")
+            params.append(filters["event"])
+        where = " AND ".join(clauses) or "1"
+        conn = self._reader()
+        total = conn.execute(f"SELECT COALESCE(SUM(n), 0) FROM daily_counts WHERE {where}", params).fetchone()[0]
+        if not group_by:
+            return total, None
+        rows = conn.execute(
+            f"SELECT {group_by}, SUM(n) AS total FROM daily_counts WHERE {where} "
+            f"GROUP BY {group_by} ORDER BY total DESC LIMIT ?", params + [limit]).fetchall()
+        return total, {str(k): n for k, n in rows}
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,168 @@
+"""
+Ledger hashing + verification.
+
+A block's hash covers exactly what is stored: index, timestamp, data,
+previous_hash and hash_version. Blocks written before hashes were
+deterministic (no hash_version) can only have their links checked, so they
+are only accepted as a prefix of the ledger: once a versioned block has been
+seen, a block without hash_version is an error (otherwise deleting the field
+would let any block be rewritten).
+
+Usage:
+    python -m utils.verify_ledger [blockchain_ledger.jsonl] [--workers N] [--chunk-mb MB]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+HASH_VERSION = 2  # version 1 = legacy hashes that mixed in the wall clock
+HASHED_FIELDS = ("index", "timestamp", "data", "previous_hash", "hash_version")
+GENESIS_PREVIOUS_HASH = "0" * 64
+CHUNK_BYTES = 16 * 1024 * 1024
+
+_canonical = json.JSONEncoder(sort_keys=True, separators=(",", ":"), default=str)  # reused encoder, cheaper than json.dumps per call
+
+
+def block_hash(block):
+    """SHA-256 over the canonical JSON of the stored fields"""
+    fields = {k: block[k] for k in HASHED_FIELDS if k in block}
+    return hashlib.sha256(_canonical.encode(fields).encode()).hexdigest()
+
+
+def _verify_chunk(task):
+    """
+    Verify the records that start inside [start, end) of the journal.
+    Returns the first and last block of the chunk (for linking chunks
+    together), whether it holds versioned blocks and where its first legacy
+    block is (for the legacy-prefix rule across chunks) and the first
+    problem found inside it.
+    """
+    path, start, end = task
+    result = {"start": start, "blocks": 0, "legacy": 0, "first": None, "last": None,
+              "versioned": False, "first_legacy": None, "error": None}
+    prev = None
+
+    with open(path, "rb") as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()  # skip the record that began in the previous chunk
+        offset = f.tell()
+        while offset < end:
+            line = f.readline()
+            if not line:
+                break
+            if not line.endswith(b"\n"):
+                result["error"] = {"offset": offset, "index": None, "reason": "torn record at end of journal"}
+                break
+            try:
+                block = json.loads(line)
+                index, previous_hash, stored_hash = block["index"], block["previous_hash"], block["hash"]
+            except (ValueError, KeyError, TypeError):
+                result["error"] = {"offset": offset, "index": None, "reason": "unreadable record"}
+                break
+
+            reason = None
+            if prev is not None and index != prev[0] + 1:
+                reason = f"index {index} follows {prev[0]}"
+            elif prev is not None and previous_hash != prev[1]:
+                reason = "previous_hash does not match the previous block"
+            elif "hash_version" not in block:
+                if result["versioned"]:
+                    reason = "block without hash_version after versioned blocks"
+                else:
+                    result["legacy"] += 1
+                    if result["first_legacy"] is None:
+                        result["first_legacy"] = {"offset": offset, "index": index}
+            elif block["hash_version"] != HASH_VERSION:
+                reason = f"unknown hash_version {block['hash_version']}"
+            elif block_hash(block) != stored_hash:
+                reason = "hash does not match block contents"
+            else:
+                result["versioned"] = True
+            if reason:
+                result["error"] = {"offset": offset, "index": index, "reason": reason}
+                break
+
+            prev = (index, stored_hash)
+            if result["first"] is None:
+                result["first"] = (index, previous_hash)
+            result["last"] = prev
+            result["blocks"] += 1
+            offset += len(line)
+    return result
+
+
+def verify_ledger(path, workers=None, chunk_bytes=CHUNK_BYTES):
+    """
+    Stream-verify a JSON Lines ledger in parallel chunks.
+    Stops at and reports the first broken link:
+        {"ok", "blocks", "legacy", "error": {"offset", "index", "reason"} | None, "seconds"}
+    """
+    started = time.perf_counter()
+    size = os.path.getsize(path)
+    tasks = [(path, start, min(start + chunk_bytes, size)) for start in range(0, size, chunk_bytes)]
+    workers = workers or os.cpu_count() or 1
+
+    summary = {"ok": True, "blocks": 0, "legacy": 0, "error": None}
+    prev = None  # (index, hash) of the last verified block
+    versioned = False  # legacy blocks are only allowed before the first versioned one
+
+    def check(results):
+        nonlocal prev, versioned
+        for result in results:
+            first = result["first"]
+            if first is not None:
+                # ✅ link this chunk to the end of the previous one
+                expected = (prev[0] + 1, prev[1]) if prev else (0, GENESIS_PREVIOUS_HASH)
+                if first != expected:
+                    reason = "previous_hash does not match the previous block" if first[0] == expected[0] \
+                        else f"index {first[0]} follows {prev[0] if prev else 'nothing'}"
+                    summary["error"] = {"offset": result["start"], "index": first[0], "reason": reason}
+                    return
+            if versioned and result["first_legacy"]:
+                summary["error"] = dict(result["first_legacy"], reason="block without hash_version after versioned blocks")
+                return
+            versioned = versioned or result["versioned"]
+            summary["blocks"] += result["blocks"]
+            summary["legacy"] += result["legacy"]
+            if result["error"]:
+                summary["error"] = result["error"]
+                return
+            prev = result["last"] or prev
+
+    if workers == 1 or len(tasks) <= 1:
+        check(map(_verify_chunk, tasks))
+    else:
+        with Pool(workers) as pool:  # leaving the block terminates chunks still running
+            check(pool.imap(_verify_chunk, tasks))
+
+    summary["ok"] = summary["error"] is None
+    summary["seconds"] = time.perf_counter() - started
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify the Prakriti ledger journal")
+    parser.add_argument("path", nargs="?", default=os.path.join(os.getcwd(), "blockchain_ledger.jsonl"))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES / (1024 * 1024))
+    args = parser.parse_args(argv)
+
+    result = verify_ledger(args.path, args.workers, int(args.chunk_mb * 1024 * 1024))
+    rate = result["blocks"] / result["seconds"] if result["seconds"] else 0
+    print(f"Verified {result['blocks']} blocks ({result['legacy']} legacy, link-checked only) "
+          f"in {result['seconds']:.2f}s ({rate:,.0f} blocks/s)")
+    if result["ok"]:
+        print("✅ Ledger is intact")
+        return 0
+    error = result["error"]
+    print(f"❌ First broken link at block {error['index']} (byte {error['offset']}): {error['reason']}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
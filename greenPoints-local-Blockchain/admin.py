@@ -6,7 +6,9 @@ Provides administrative controls for managing the system
 import json
 import time
 from typing import Dict, List, Optional
+from backup import import_chain, iter_chain_records, write_backup
 from blockchain import Blockchain
+from block_store import BlockStore
 from wallet_centralized import UserManager, UserType
 from tasks import TaskManager, Task, TaskCategory
 from database import DatabaseSync
@@ -252,6 +254,27 @@ class AdminSystem:
             "new_reward": new_reward
         }, indent=2)
     
+    def start_chain_audit(self, admin_id: int = None) -> str:
+        """
+        Start a full validation of every block in the background (admin function)
+        
+        Returns:
+            JSON response; the result appears as last_full_audit on the dashboard
+        """
+        if not self.blockchain.start_full_audit():
+            return json.dumps({
+                "success": False,
+                "error": "A chain audit is already running"
+            })
+        
+        self.log_action("chain_audit", f"Started full audit of {len(self.blockchain.chain)} blocks", admin_id)
+        
+        return json.dumps({
+            "success": True,
+            "message": "Full chain audit started",
+            "last_full_audit": self.blockchain.last_audit
+        }, indent=2)
+    
     # ============ DATABASE SYNC ============
     
     def sync_database(self, admin_id: int = None) -> str:
@@ -295,6 +318,8 @@ class AdminSystem:
         dashboard = {
             "system_health": {
                 "blockchain_valid": self.blockchain.is_chain_valid(),
+                "validated_height": self.blockchain.validated_height,
+                "last_full_audit": self.blockchain.last_audit,
                 "chain_length": len(self.blockchain.chain),
                 "pending_transactions": len(self.blockchain.pending_transactions)
             },
@@ -343,6 +368,9 @@ class AdminSystem:
         """
         Export complete system data for backup
         
+        This builds the whole export in memory; use save_system_backup()
+        for a streaming backup of large deployments.
+        
         Returns:
             JSON string with all system data
         """
@@ -350,7 +378,7 @@ class AdminSystem:
             "export_timestamp": time.time(),
             "blockchain": {
                 "chain": [block.to_dict() for block in self.blockchain.chain],
-                "pending": self.blockchain.pending_transactions,
+                "pending": list(self.blockchain.pending_transactions),
                 "difficulty": self.blockchain.difficulty,
                 "mining_reward": self.blockchain.mining_reward
             },
@@ -364,26 +392,71 @@ class AdminSystem:
         
         return json.dumps(export_data, indent=2)
     
-    def save_system_backup(self, filename: str = "blockchain_backup.json") -> str:
+    def save_system_backup(self, filename: str = "blockchain_backup.ndjson", chunk_size: int = 100) -> str:
         """
         Save complete system backup to file
         
+        The backup is streamed as newline-delimited JSON chunks (see
+        backup.py), so memory use is bounded by chunk_size rather than the
+        chain length. A ".gz" or ".zst" suffix compresses the file.
+        
         Returns:
             JSON response
         """
-        data = self.export_system_data()
+        sections = {
+            "users": (wallet.to_dict() for wallet in self.user_manager.get_all_wallets()),
+            "tasks": (task.to_dict() for task in self.task_manager.get_all_tasks()),
+            "completions": (c.to_dict() for c in self.task_manager.completions),
+            "admin_log": iter(list(self.admin_actions_log))
+        }
         
         try:
-            with open(filename, 'w') as f:
-                f.write(data)
+            summary = write_backup(filename, iter_chain_records(self.blockchain, chunk_size, sections))
+            self.log_action("export_data", f"Saved streaming backup to {filename}")
             
             return json.dumps({
                 "success": True,
                 "message": f"System backup saved to {filename}",
-                "filename": filename
+                "filename": filename,
+                "blocks": len(self.blockchain.chain),
+                "lines": summary["lines"]
             }, indent=2)
         except Exception as e:
             return json.dumps({
                 "success": False,
                 "error": str(e)
             })
+    
+    def restore_chain_backup(self, filename: str, store_directory: str) -> str:
+        """
+        Import the chain from a backup into a block store directory
+        
+        The import resumes if the directory already holds part of the
+        backup. Start a node on the directory afterwards to serve the chain.
+        
+        Args:
+            filename: Backup written by save_system_backup()
+            store_directory: Target BlockStore directory
+        
+        Returns:
+            JSON response
+        """
+        store = BlockStore(store_directory)
+        try:
+            summary = import_chain(filename, store, difficulty=self.blockchain.difficulty)
+        except (OSError, ValueError) as e:
+            return json.dumps({
+                "success": False,
+                "error": str(e),
+                "height": len(store)
+            })
+        finally:
+            store.close()
+        
+        self.log_action("import_data", f"Imported {summary['blocks_imported']} blocks from {filename}")
+        
+        return json.dumps({
+            "success": True,
+            "message": f"Chain restored to {store_directory}",
+            **summary
+        }, indent=2)
@@ -9,7 +9,7 @@ import time
 from typing import Dict, List, Optional
 from blockchain import Blockchain
 from database import Database
-from qr_system import QRCodeManager
+from qr_system import MAX_BATCH_QR_CODES, QRCodeManager
 from task_definitions import TaskManager, TaskType
 from transaction import Transaction
 
@@ -288,6 +288,44 @@ class GreenPointsAPI:
         else:
             return {"success": False, "message": message, "data": None}
     
+    def generate_qr_code_batch(self, business_id: int, reward_amount: float, count: int,
+                               service_description: str = "",
+                               expires_in_hours: Optional[int] = None) -> Dict:
+        """
+        Generate many QR codes for a business (e.g. printed for an event)
+        
+        On success data["qr_codes"] is an iterator: codes are created and
+        committed a chunk at a time as it is consumed, so a large batch can
+        be streamed to the client without being held in memory. Consuming
+        it can raise (e.g. a database error); codes already yielded stay
+        committed, so streaming callers must report the failure in-band.
+        """
+        business = self.db.get_user_by_id(business_id)
+        if not business or business['role'] != 'business':
+            return {"success": False, "message": "Only businesses can generate QR codes", "data": None}
+        
+        if reward_amount <= 0:
+            return {"success": False, "message": "Reward amount must be positive", "data": None}
+        
+        if not 0 < count <= MAX_BATCH_QR_CODES:
+            return {"success": False, "message": f"Count must be between 1 and {MAX_BATCH_QR_CODES}", "data": None}
+        
+        chunks = self.qr_manager.iter_batch_qr_codes(
+            business, reward_amount, count, service_description, expires_in_hours
+        )
+        return {
+            "success": True,
+            "message": f"Generating {count} QR codes",
+            "data": {
+                "business_id": business_id,
+                "count": count,
+                "reward_amount": reward_amount,
+                "service_description": service_description,
+                "expires_in_hours": expires_in_hours,
+                "qr_codes": (qr_code for chunk in chunks for qr_code in chunk)
+            }
+        }
+    
     def scan_qr_code(self, qr_code: str, user_id: int) -> Dict:
         """Scan and redeem a QR code"""
         success, message, tx_data = self.qr_manager.scan_qr_code(qr_code, user_id)
@@ -305,7 +343,7 @@ class GreenPointsAPI:
             return {"success": False, "message": "No pending transactions", "data": None}
         
         block = self.blockchain.mine_pending_transactions(miner_address)
-        self.db.rebuild_leaderboard(self.blockchain)
+        self.db.apply_block_to_leaderboard(self.blockchain, block)
         
         return {
             "success": True,
@@ -314,7 +352,8 @@ class GreenPointsAPI:
                 "block_index": block.index,
                 "block_hash": block.hash,
                 "transactions_count": len(block.transactions),
-                "miner_reward": self.blockchain.mining_reward
+                "miner_reward": self.blockchain.mining_reward,
+                "hashrate": self.blockchain.miner.last_stats["hashrate"]
             }
         }
     
@@ -337,19 +376,37 @@ class GreenPointsAPI:
             }
         }
     
-    def get_transaction_history(self, user_id: int, limit: int = 50) -> Dict:
-        """Get user's transaction history"""
+    def get_transaction_history(self, user_id: int, limit: int = 50,
+                                cursor: Optional[int] = None) -> Dict:
+        """Get a page of the user's transaction history, newest page first"""
         user = self.db.get_user_by_id(user_id)
         if not user:
             return {"success": False, "message": "User not found", "data": None}
         
-        history = self.blockchain.get_transaction_history(user['wallet_address'])
-        history = history[-limit:]
+        history, next_cursor = self.blockchain.get_transaction_page(
+            user['wallet_address'], limit, cursor
+        )
         
         return {
             "success": True,
             "message": "Transaction history retrieved",
-            "data": {"transactions": history, "total_count": len(history)}
+            "data": {
+                "transactions": history,
+                "total_count": len(history),
+                "next_cursor": next_cursor
+            }
+        }
+    
+    def get_transaction_proof(self, transaction_id: str) -> Dict:
+        """Get a Merkle inclusion proof for a confirmed transaction"""
+        proof = self.blockchain.get_transaction_proof(transaction_id)
+        if not proof:
+            return {"success": False, "message": "Transaction not found in a mined block", "data": None}
+        
+        return {
+            "success": True,
+            "message": "Inclusion proof retrieved",
+            "data": proof
         }
     
     # ==================== LEADERBOARD ====================
@@ -414,6 +471,8 @@ class GreenPointsAPI:
                     "transaction_id": tx.transaction_id
                 }
             }
+        elif self.blockchain.is_pool_full():
+            return {"success": False, "message": "Transaction pool is full, please retry", "data": None}
         else:
             return {"success": False, "message": "Failed to create transaction", "data": None}
     
@@ -0,0 +1,262 @@
+"""
+Streaming Backups for Green Points Blockchain
+Exports the chain and system data as newline-delimited JSON chunks and imports them back
+"""
+
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from blockchain import Block
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+
+BACKUP_FORMAT = 1
+
+# Record kinds, in the order they appear in a backup
+KIND_HEADER = "header"
+KIND_BLOCKS = "blocks"
+KIND_FOOTER = "footer"
+
+
+def _chunk_hash(items_json: str) -> str:
+    return hashlib.sha256(items_json.encode()).hexdigest()
+
+
+def _dump_items(items: List) -> str:
+    """Serialize chunk items in the form their hash is taken over"""
+    return json.dumps(items, sort_keys=True, separators=(",", ":"))
+
+
+def compression_for(path: str) -> Optional[str]:
+    """Pick the compression for a backup path from its suffix ("gzip", "zstd" or None)"""
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def open_backup(path: str, mode: str, compression: Optional[str] = None):
+    """
+    Open a backup file as text, compressed or decompressed on the fly
+
+    Args:
+        path: File path
+        mode: "r" or "w"
+        compression: "gzip", "zstd" or None (default: chosen from the suffix)
+
+    Returns:
+        A text file object
+    """
+    compression = compression or compression_for(path)
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("zstd backups need the 'zstandard' package")
+        raw = open(path, mode + "b")
+        if mode == "w":
+            stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+# ============ EXPORT ============
+
+def iter_chain_records(blockchain, chunk_size: int = 100,
+                       sections: Optional[Dict[str, Iterable]] = None) -> Iterator[str]:
+    """
+    Generate the lines of a backup one chunk at a time
+
+    Only one chunk of blocks is materialized at a time. The chain height is
+    fixed when the export starts, so blocks appended while it runs are
+    left for the next backup.
+
+    Args:
+        blockchain: Blockchain to export
+        chunk_size: Number of blocks (or section items) per line
+        sections: Extra named item streams to include after the chain
+                  (e.g. users, tasks), each chunked the same way
+
+    Yields:
+        Newline-terminated JSON lines
+    """
+    height = len(blockchain.chain)
+    yield json.dumps({
+        "kind": KIND_HEADER,
+        "format": BACKUP_FORMAT,
+        "export_timestamp": time.time(),
+        "height": height,
+        "difficulty": blockchain.difficulty,
+        "mining_reward": blockchain.mining_reward
+    }) + "\n"
+
+    chunks = 0
+    blocks = itertools.islice(iter(blockchain.chain), height)
+    for start in range(0, height, chunk_size):
+        items = [block.to_dict() for block in itertools.islice(blocks, chunk_size)]
+        yield _chunk_line(KIND_BLOCKS, start, items)
+        chunks += 1
+
+    all_sections = {"pending": list(blockchain.pending_transactions)}
+    all_sections.update(sections or {})
+    for kind, stream in all_sections.items():
+        stream = iter(stream)
+        start = 0
+        while True:
+            items = list(itertools.islice(stream, chunk_size))
+            if not items:
+                break
+            yield _chunk_line(kind, start, items)
+            start += len(items)
+            chunks += 1
+
+    yield json.dumps({"kind": KIND_FOOTER, "chunks": chunks, "height": height}) + "\n"
+
+
+def _chunk_line(kind: str, start: int, items: List) -> str:
+    """Build one chunk line, embedding the items' serialization and its hash"""
+    items_json = _dump_items(items)
+    prefix = json.dumps({
+        "kind": kind,
+        "start": start,
+        "count": len(items),
+        "sha256": _chunk_hash(items_json)
+    })
+    return prefix[:-1] + ', "items": ' + items_json + "}\n"
+
+
+def write_backup(path: str, lines: Iterable[str]) -> Dict:
+    """
+    Write backup lines to a file via a temporary name
+
+    Args:
+        path: Destination path (compression chosen by suffix)
+        lines: Output of iter_chain_records()
+
+    Returns:
+        Summary with the path, lines written and uncompressed size
+    """
+    temp_path = path + ".partial"
+    count = 0
+    size = 0
+    with open_backup(temp_path, "w", compression_for(path)) as f:
+        for line in lines:
+            f.write(line)
+            count += 1
+            size += len(line)
+    os.replace(temp_path, path)
+    return {"path": path, "lines": count, "bytes": size}
+
+
+# ============ IMPORT ============
+
+def iter_backup(path: str) -> Iterator[Dict]:
+    """
+    Read and verify backup records one line at a time
+
+    Args:
+        path: Backup file path
+
+    Yields:
+        Parsed records; chunk records have passed their hash check
+    """
+    with open_backup(path, "r") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "items" in record:
+                if _chunk_hash(_dump_items(record["items"])) != record["sha256"]:
+                    raise ValueError(f"Chunk hash mismatch on line {number}")
+            yield record
+
+
+def import_chain(path: str, store, on_record: Optional[Callable[[Dict], None]] = None,
+                 difficulty: Optional[int] = None) -> Dict:
+    """
+    Import a backup's blocks into a BlockStore, resuming where it left off
+
+    Blocks already present in the store are skipped after checking that
+    they match the backup, so an interrupted import can simply be rerun.
+    Every new block is held to the same checks as chain validation
+    (Block.check: hash, Merkle root, proof of work and link to its
+    predecessor) before it is appended.
+
+    Args:
+        path: Backup file path
+        store: BlockStore to append to (empty, or holding a prefix of the backup)
+        on_record: Optional callback for non-block records (pending, users, ...)
+        difficulty: Proof of work to require (default: the backup's own)
+
+    Returns:
+        Summary with blocks imported and skipped and the final height
+    """
+    imported = 0
+    skipped = 0
+    expected_height = None
+    footer_seen = False
+
+    try:
+        for record in iter_backup(path):
+            kind = record["kind"]
+            if kind == KIND_HEADER:
+                if record.get("format") != BACKUP_FORMAT:
+                    raise ValueError(f"Unsupported backup format: {record.get('format')}")
+                expected_height = record["height"]
+                if difficulty is None:
+                    difficulty = record["difficulty"]
+            elif kind == KIND_BLOCKS:
+                if difficulty is None:
+                    raise ValueError("Backup has no header")
+                last = record["items"][-1]
+                if last["index"] < len(store):
+                    # Blocks are hash-linked, so matching the last one covers the chunk
+                    if store.read_dict(last["index"])["hash"] != last["hash"]:
+                        raise ValueError(f"Store diverges from backup before block #{last['index']}")
+                    skipped += len(record["items"])
+                    continue
+                for data in record["items"]:
+                    height = len(store)
+                    if data["index"] < height:
+                        if store.read_dict(data["index"])["hash"] != data["hash"]:
+                            raise ValueError(f"Store diverges from backup at block #{data['index']}")
+                        skipped += 1
+                        continue
+                    block = Block.from_dict(data)
+                    if block.index != height:
+                        raise ValueError(f"Expected block #{height}, got #{block.index}")
+                    # The genesis block has no predecessor to link to
+                    previous_hash = store.read_dict(height - 1)["hash"] if height else block.previous_hash
+                    problem = block.check(previous_hash, difficulty)
+                    if problem is not None:
+                        raise ValueError(f"{problem} at block #{block.index}")
+                    store.append(block)
+                    imported += 1
+            elif kind == KIND_FOOTER:
+                footer_seen = True
+            elif on_record is not None:
+                on_record(record)
+    finally:
+        store.sync()
+
+    if not footer_seen:
+        raise ValueError("Backup is truncated (no footer)")
+    return {
+        "blocks_imported": imported,
+        "blocks_skipped": skipped,
+        "height": len(store),
+        "expected_height": expected_height
+    }
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Green Points Database Benchmark
+Compares the default SQLite profile (rollback journal, full sync, no indexes)
+with the tuned one (WAL, synchronous=NORMAL, schema indexes)
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+from database import Database, MIGRATIONS
+
+
+def open_database(path: str, tuned: bool) -> Database:
+    """Open a fresh database with the tuned or the legacy storage profile"""
+    with redirect_stdout(StringIO()):
+        if tuned:
+            return Database(path)
+        db = Database(path, journal_mode="DELETE", synchronous="FULL")
+    for _, statements in MIGRATIONS:
+        for statement in statements:
+            name = statement.split("EXISTS ")[1].split()[0]
+            db.conn.execute(f"DROP INDEX IF EXISTS {name}")
+    return db
+
+
+def timed(operation, count: int) -> float:
+    """Run operation(i) count times and return operations per second"""
+    start = time.perf_counter()
+    for i in range(count):
+        operation(i)
+    return count / (time.perf_counter() - start)
+
+
+def run_profile(tuned: bool, users: int, writes: int, reads: int) -> dict:
+    """Load a database and measure write and read throughput"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_database(os.path.join(directory, "bench.db"), tuned)
+        try:
+            return measure(db, users, writes, reads)
+        finally:
+            db.close()
+
+
+def measure(db: Database, users: int, writes: int, reads: int) -> dict:
+    """Bulk load history into db, then time the hot queries and mutators"""
+    rng = random.Random(42)
+
+    # Bulk load a realistic amount of history
+    with db.conn:
+        db.conn.executemany("""
+            INSERT INTO users (name, email, role, wallet_address, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(f"user{i}", f"user{i}@bench.test", "business" if i % 50 == 0 else "user",
+               f"GP_{i}", time.time()) for i in range(users)])
+        db.conn.executemany("""
+            INSERT INTO pending_verifications (user_id, task_type, submitted_at, status, reward_amount)
+            VALUES (?, 'recycling', ?, ?, 10)
+        """, [(rng.randint(1, users), time.time(), rng.choice(["pending", "approved", "rejected"]))
+              for _ in range(users * 5)])
+        db.conn.executemany("""
+            INSERT INTO qr_codes (qr_code, business_id, business_name, reward_amount, created_at,
+                                  is_used, used_by)
+            VALUES (?, ?, 'shop', 5, ?, ?, ?)
+        """, [(f"QR{i}", 1 + 50 * rng.randint(0, users // 50 - 1), time.time(), i % 2,
+               rng.randint(1, users) if i % 2 else None) for i in range(users * 2)])
+        db.conn.executemany("""
+            INSERT INTO leaderboard_cache (user_id, name, total_gp, tasks_completed, last_updated)
+            VALUES (?, ?, ?, 0, ?)
+        """, [(i, f"user{i}", rng.random() * 1000, time.time()) for i in range(1, users + 1)])
+
+    with redirect_stdout(StringIO()):
+        results = {
+            "submit_verification": timed(
+                lambda i: db.submit_verification(rng.randint(1, users), "recycling", "photo", 10), writes),
+            "approve_verification": timed(
+                lambda i: db.approve_verification(i + 1, "admin", f"tx{i}"), writes),
+            "get_user_stats": timed(lambda i: db.get_user_stats(rng.randint(1, users)), reads),
+            "get_pending_verifications": timed(lambda i: db.get_pending_verifications(), max(reads // 100, 1)),
+            "get_leaderboard": timed(lambda i: db.get_leaderboard(10), reads)
+        }
+    return results
+
+
+def run_concurrent_writes(group_commit_ms, threads: int, writes: int) -> float:
+    """Submit verifications from several threads and return writes per second"""
+    with tempfile.TemporaryDirectory() as directory:
+        with redirect_stdout(StringIO()):
+            db = Database(os.path.join(directory, "bench.db"), synchronous="FULL",
+                          group_commit_ms=group_commit_ms)
+            user_id = db.create_user("bench", "bench@bench.test", None, "user", "GP_BENCH")
+
+            def worker():
+                for _ in range(writes):
+                    db.submit_verification(user_id, "recycling", "photo", 10)
+
+            workers = [threading.Thread(target=worker) for _ in range(threads)]
+            start = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            db.close()
+    return threads * writes / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Green Points SQLite profile")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--writes", type=int, default=500)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    before = run_profile(False, args.users, args.writes, args.reads)
+    after = run_profile(True, args.users, args.writes, args.reads)
+
+    print(f"\n{'operation':<28}{'before ops/s':>14}{'after ops/s':>14}{'speedup':>10}")
+    print("-" * 66)
+    for name in before:
+        print(f"{name:<28}{before[name]:>14.0f}{after[name]:>14.0f}{after[name] / before[name]:>9.1f}x")
+
+    # Concurrent writers, fsync on every commit (synchronous=FULL)
+    per_call = run_concurrent_writes(None, args.threads, args.writes // args.threads or 1)
+    grouped = run_concurrent_writes(2, args.threads, args.writes // args.threads or 1)
+    print(f"\n{args.threads} concurrent writers, synchronous=FULL")
+    print(f"{'commit per call':<28}{per_call:>14.0f} writes/s")
+    print(f"{'group commit (2 ms)':<28}{grouped:>14.0f} writes/s{grouped / per_call:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Green Points QR Scan Storm Benchmark
+Many threads scan a shared pool of QR codes (with replays) and the run
+checks that every code was redeemed exactly once
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import redirect_stdout
+from io import StringIO
+
+from blockchain import Blockchain
+from database import Database
+from qr_system import QRCodeManager, RecentCodeCache
+
+
+def scan_storm(codes: int, scans: int, threads: int, cache_ttl: float) -> dict:
+    """Run one storm and return throughput and exactly-once checks"""
+    with tempfile.TemporaryDirectory() as directory, redirect_stdout(StringIO()):
+        db = Database(os.path.join(directory, "bench.db"), group_commit_ms=2)
+        blockchain = Blockchain(difficulty=1)
+        manager = QRCodeManager(db, blockchain, RecentCodeCache(ttl=cache_ttl))
+
+        business = db.create_user("Venue", "venue@bench.test", None, "business", "GP_VENUE")
+        users = [db.create_user(f"fan{i}", f"fan{i}@bench.test", None, "user", f"GP_FAN{i}")
+                 for i in range(100)]
+        _, _, qr_codes = manager.create_batch_qr_codes(business, 5, codes, "Concert")
+
+        successes = Counter()
+        lock = threading.Lock()
+
+        def worker(seed: int):
+            rng = random.Random(seed)
+            for _ in range(scans // threads):
+                qr_code = rng.choice(qr_codes)
+                success, _, _ = manager.scan_qr_code(qr_code, rng.choice(users))
+                if success:
+                    with lock:
+                        successes[qr_code] += 1
+
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        redeemed_in_db = db.conn.execute("SELECT COUNT(*) FROM qr_codes WHERE is_used = 1").fetchone()[0]
+        rewarded = Counter(tx["task_id"] for tx in blockchain.pending_transactions)
+        db.close()
+
+    return {
+        "scans_per_second": (scans // threads) * threads / elapsed,
+        "redeemed": sum(successes.values()),
+        "exactly_once": (max(successes.values(), default=1) == 1
+                         and redeemed_in_db == len(successes)
+                         and rewarded == successes),
+        "cache_hits": manager.metrics["cache_hits"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent QR code redemption")
+    parser.add_argument("--codes", type=int, default=2000)
+    parser.add_argument("--scans", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"\n{args.threads} threads, {args.scans} scans over {args.codes} codes")
+    print(f"{'':<20}{'scans/s':>10}{'redeemed':>10}{'cache hits':>12}{'exactly once':>14}")
+    print("-" * 66)
+    for label, ttl in (("without cache", 0.0), ("with cache", 60.0)):
+        result = scan_storm(args.codes, args.scans, args.threads, ttl)
+        print(f"{label:<20}{result['scans_per_second']:>10.0f}{result['redeemed']:>10}"
+              f"{result['cache_hits']:>12}{str(result['exactly_once']):>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Background Block Producer for Green Points Blockchain
+Seals pending transactions into blocks by batch size or elapsed time
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from blockchain import Blockchain, Block
+
+
+class BlockProducer:
+    """
+    Seals a block whenever max_batch transactions are pending or the oldest
+    pending transaction has waited max_wait_ms, whichever comes first
+
+    The producer also bounds the blockchain's transaction pool and exposes
+    a saturation signal so the HTTP layer can shed write load early.
+    """
+
+    def __init__(self, blockchain: Blockchain, miner_address: str = "SYSTEM",
+                 max_batch: int = 100, max_wait_ms: int = 500, max_pending: int = 10000,
+                 high_watermark: float = 0.8, on_block: Optional[Callable[[Block], None]] = None):
+        """
+        Initialize the producer
+
+        Args:
+            blockchain: Blockchain whose pending transactions are sealed
+            miner_address: Address receiving the mining reward
+            max_batch: Pending transaction count that triggers a seal
+            max_wait_ms: Age of the oldest pending transaction that triggers a seal
+            max_pending: Capacity of the transaction pool
+            high_watermark: Fraction of max_pending at which is_saturated() turns True
+            on_block: Optional callback run after each sealed block
+        """
+        self.blockchain = blockchain
+        self.miner_address = miner_address
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.high_watermark = high_watermark
+        self.on_block = on_block
+
+        self.blockchain.max_pending = max_pending
+        self.blockchain.transaction_listeners.append(self._on_transaction)
+
+        self._wakeup = threading.Condition()
+        self._first_pending_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        self.metrics = {
+            "blocks_sealed": 0,
+            "transactions_sealed": 0,
+            "seals_by_size": 0,
+            "seals_by_time": 0,
+            "last_seal_latency_ms": 0.0,
+            "max_seal_latency_ms": 0.0,
+            "total_seal_latency_ms": 0.0,
+            "last_queue_wait_ms": 0.0,
+            "rejected_transactions": 0
+        }
+
+    # ============ LIFECYCLE ============
+
+    def start(self) -> None:
+        """Start the producer thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="block-producer", daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True) -> None:
+        """
+        Stop the producer thread
+
+        Args:
+            flush: Seal any remaining pending transactions before returning
+        """
+        with self._wakeup:
+            self._running = False
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if flush:
+            while self.blockchain.pending_transactions:
+                self._seal(by_size=False)
+
+    # ============ SIGNALS ============
+
+    def _on_transaction(self, transaction: Dict) -> None:
+        """Blockchain listener: wake the producer when a transaction arrives"""
+        with self._wakeup:
+            if self._first_pending_at is None:
+                self._first_pending_at = time.time()
+            if len(self.blockchain.pending_transactions) >= self.max_batch:
+                self._wakeup.notify()
+
+    def record_rejection(self) -> None:
+        """Count a transaction turned away because the pool was full"""
+        self.metrics["rejected_transactions"] += 1
+
+    def queue_depth(self) -> int:
+        """Number of transactions waiting to be sealed"""
+        return len(self.blockchain.pending_transactions)
+
+    def is_saturated(self) -> bool:
+        """True when the pool is above the high watermark and writers should back off"""
+        return self.queue_depth() >= self.blockchain.max_pending * self.high_watermark
+
+    def get_metrics(self) -> Dict:
+        """Get queue depth and seal latency metrics"""
+        blocks = self.metrics["blocks_sealed"]
+        oldest = self._first_pending_at
+        return {
+            **self.metrics,
+            "avg_seal_latency_ms": self.metrics["total_seal_latency_ms"] / blocks if blocks else 0.0,
+            "queue_depth": self.queue_depth(),
+            "queue_capacity": self.blockchain.max_pending,
+            "oldest_pending_age_ms": (time.time() - oldest) * 1000 if oldest else 0.0,
+            "saturated": self.is_saturated(),
+            "running": self._running
+        }
+
+    # ============ PRODUCTION ============
+
+    def _run(self) -> None:
+        """Producer loop: sleep until the batch fills or the oldest transaction times out"""
+        while True:
+            with self._wakeup:
+                while self._running:
+                    depth = self.queue_depth()
+                    if depth >= self.max_batch:
+                        by_size = True
+                        break
+                    if depth and self._first_pending_at is not None:
+                        remaining = self._first_pending_at + self.max_wait - time.time()
+                        if remaining <= 0:
+                            by_size = False
+                            break
+                        self._wakeup.wait(remaining)
+                    else:
+                        self._wakeup.wait(self.max_wait)
+                if not self._running:
+                    return
+            self._seal(by_size)
+
+    def _seal(self, by_size: bool) -> Optional[Block]:
+        """Mine up to max_batch pending transactions into a block"""
+        if not self.blockchain.pending_transactions:
+            return None
+
+        queued_since = self._first_pending_at or time.time()
+        started = time.time()
+        block = self.blockchain.mine_pending_transactions(self.miner_address, self.max_batch)
+        finished = time.time()
+
+        with self._wakeup:
+            # Leftovers have been waiting at least since this seal started
+            self._first_pending_at = started if self.blockchain.pending_transactions else None
+
+        latency_ms = (finished - started) * 1000
+        self.metrics["blocks_sealed"] += 1
+        self.metrics["transactions_sealed"] += len(block.transactions) - 1  # minus mining reward
+        self.metrics["seals_by_size" if by_size else "seals_by_time"] += 1
+        self.metrics["last_seal_latency_ms"] = latency_ms
+        self.metrics["max_seal_latency_ms"] = max(self.metrics["max_seal_latency_ms"], latency_ms)
+        self.metrics["total_seal_latency_ms"] += latency_ms
+        self.metrics["last_queue_wait_ms"] = (finished - queued_since) * 1000
+
+        if self.on_block:
+            self.on_block(block)
+        return block
+
+    def seal_now(self) -> Optional[Block]:
+        """Seal a block immediately, e.g. for a manual /api/mine request"""
+        return self._seal(by_size=False)
@@ -0,0 +1,463 @@
+"""
+Append-only On-disk Block Store for Green Points Blockchain
+Blocks are written to length-prefixed segment files and read back lazily through mmap
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterator, Tuple
+
+from blockchain import Block
+from encoding import canonical_decode
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows; the writer lock is skipped there
+    fcntl = None
+
+
+# Record header: payload length and CRC32 of the payload
+RECORD_HEADER = struct.Struct(">II")
+
+# Index entry: segment number, byte offset of the record, payload length
+INDEX_ENTRY = struct.Struct(">IQI")
+
+FSYNC_ALWAYS = "always"      # fsync after every appended block
+FSYNC_INTERVAL = "interval"  # fsync at most once per fsync_interval seconds
+FSYNC_NEVER = "never"        # leave flushing to the operating system
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".dat"
+INDEX_FILE = "blocks.idx"
+LOCK_FILE = "writer.lock"
+
+
+class StoreLockedError(RuntimeError):
+    """Another process already has the block store open for writing"""
+
+
+class BlockStore:
+    """
+    Persists blocks in append-only segment files
+
+    Each record is a RECORD_HEADER followed by the block's canonical
+    encoding (Block.canonical_bytes()). A separate index file holds one fixed-size INDEX_ENTRY per block so a
+    block can be located by height without scanning the segments.
+
+    A writable store takes an exclusive flock on LOCK_FILE for as long as
+    it is open, so two processes can never append to the same directory;
+    read-only stores take no lock.
+    """
+
+    def __init__(self, directory: str, fsync: str = FSYNC_INTERVAL,
+                 fsync_interval: float = 1.0, segment_size: int = 64 * 1024 * 1024,
+                 read_only: bool = False):
+        """
+        Open (or create) a block store
+
+        Args:
+            directory: Directory holding the segment and index files
+            fsync: Durability policy (FSYNC_ALWAYS, FSYNC_INTERVAL or FSYNC_NEVER)
+            fsync_interval: Seconds between fsyncs for FSYNC_INTERVAL
+            segment_size: Size in bytes after which a new segment is started
+            read_only: Follow a store written by another process; nothing
+                       is repaired or written, and refresh() picks up
+                       blocks the writer has appended since
+
+        Raises:
+            StoreLockedError: If another process has the store open for writing
+        """
+        if fsync not in (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER):
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+
+        self.directory = directory
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.segment_size = segment_size
+        self.read_only = read_only
+        self.last_sync = time.time()
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._index = bytearray()
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._map_sizes: Dict[int, int] = {}
+        self._segment_file = None
+        self._index_file = None
+        self.active_segment = 0
+        self.active_size = 0
+        self._lock = threading.RLock()  # serializes appends with index and mmap reads
+        self._lock_file = None
+        self._writer_pid = os.getpid()
+
+        if read_only:
+            self.refresh()
+        else:
+            self._lock_writer()
+            self._recover()
+
+    # ============ PATHS ============
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment:05d}{SEGMENT_SUFFIX}")
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_FILE)
+
+    # ============ WRITER LOCK ============
+
+    def _lock_writer(self) -> None:
+        """Take the exclusive writer lock, failing at once if another process holds it"""
+        if fcntl is None:
+            return
+        lock_file = open(os.path.join(self.directory, LOCK_FILE), "a+")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.seek(0)
+            holder = lock_file.read().strip() or "unknown"
+            lock_file.close()
+            raise StoreLockedError(
+                f"Block store {self.directory} is already open for writing (pid {holder})") from None
+        lock_file.truncate(0)
+        lock_file.write(str(self._writer_pid))
+        lock_file.flush()
+        self._lock_file = lock_file
+
+    def check_writer(self) -> None:
+        """
+        Check that this process is the one that opened the store for writing
+
+        A process forked after the store was opened (e.g. a gunicorn
+        --preload worker) shares the parent's lock, so the lock alone
+        would not stop several processes appending.
+
+        Raises:
+            StoreLockedError: If called from such a forked process
+        """
+        if os.getpid() != self._writer_pid:
+            raise StoreLockedError(
+                f"Block store {self.directory} was opened for writing by process {self._writer_pid}")
+
+    # ============ RECOVERY ============
+
+    def _recover(self) -> None:
+        """
+        Load the offset index and repair any torn tail left by a crash
+
+        Index entries that point past the end of their segment are dropped,
+        records that made it into the active segment (or a segment a crash
+        had just rolled over to) but not the index are re-indexed, and a
+        partially written record is truncated away.
+        """
+        index_path = self._index_path()
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                data = f.read()
+            usable = len(data) - len(data) % INDEX_ENTRY.size
+            self._index = bytearray(data[:usable])
+
+        # Drop index entries whose records are missing from disk
+        while len(self):
+            segment, offset, length = self._entry(len(self) - 1)
+            path = self._segment_path(segment)
+            end = offset + RECORD_HEADER.size + length
+            if os.path.exists(path) and os.path.getsize(path) >= end:
+                break
+            del self._index[-INDEX_ENTRY.size:]
+
+        if len(self):
+            segment, offset, length = self._entry(len(self) - 1)
+            self.active_segment = segment
+            position = offset + RECORD_HEADER.size + length
+        else:
+            self.active_segment = 0
+            position = 0
+
+        # Re-index complete records written after the last index entry,
+        # following them into any later segment
+        while True:
+            path = self._segment_path(self.active_segment)
+            torn = False
+            if os.path.exists(path):
+                position = self._scan_records(self.active_segment, position)
+                if os.path.getsize(path) > position:
+                    print(f"Truncating torn record at {path}:{position}")
+                    with open(path, "r+b") as f:
+                        f.truncate(position)
+                    torn = True
+
+            following = self._segment_path(self.active_segment + 1)
+            if not os.path.exists(following):
+                break
+            if torn:
+                # Nothing after a torn record was ever indexed
+                self._remove_segments_after(self.active_segment)
+                break
+            self.active_segment += 1
+            position = 0
+
+        with open(index_path, "wb") as f:
+            f.write(self._index)
+
+        self.active_size = position
+        self._segment_file = open(path, "ab")
+        self._index_file = open(index_path, "ab")
+
+    def _scan_records(self, segment: int, position: int) -> int:
+        """Index the complete records of a segment from a position on; returns where they end"""
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(position)
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                length, checksum = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    break
+                self._index += INDEX_ENTRY.pack(segment, position, length)
+                position += RECORD_HEADER.size + length
+        return position
+
+    def _remove_segments_after(self, segment: int) -> None:
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                number = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+                if number > segment:
+                    print(f"Removing unindexed segment {name}")
+                    os.remove(os.path.join(self.directory, name))
+
+    def refresh(self) -> int:
+        """
+        Load index entries appended by the writing process (read-only stores)
+
+        Only whole entries whose records are completely on disk are taken,
+        so a block the writer is still appending is picked up next time.
+
+        Returns:
+            The height of the store
+        """
+        with self._lock:
+            try:
+                with open(self._index_path(), "rb") as f:
+                    f.seek(len(self._index))
+                    data = f.read()
+            except FileNotFoundError:
+                return len(self)
+
+            for position in range(0, len(data) - INDEX_ENTRY.size + 1, INDEX_ENTRY.size):
+                entry = data[position:position + INDEX_ENTRY.size]
+                segment, offset, length = INDEX_ENTRY.unpack(entry)
+                path = self._segment_path(segment)
+                if not os.path.exists(path) or os.path.getsize(path) < offset + RECORD_HEADER.size + length:
+                    break
+                self._index += entry
+                self.active_segment = segment
+            return len(self)
+
+    # ============ WRITES ============
+
+    def append(self, block: Block) -> int:
+        """
+        Append a block to the store
+
+        Args:
+            block: Block to persist; its index must equal the current height
+
+        Returns:
+            The height of the store after the append
+        """
+        if self.read_only:
+            raise ValueError("Cannot append to a read-only block store")
+        self.check_writer()
+        payload = block.canonical_bytes()
+
+        with self._lock:
+            if block.index != len(self):
+                raise ValueError(f"Expected block #{len(self)}, got #{block.index}")
+
+            if self.active_size and self.active_size + RECORD_HEADER.size + len(payload) > self.segment_size:
+                self._roll_segment()
+
+            offset = self.active_size
+            self._segment_file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+            self._segment_file.write(payload)
+            self.active_size += RECORD_HEADER.size + len(payload)
+
+            # Hand the record to the OS before its index entry, so processes
+            # following the store never see an entry without its record
+            self._segment_file.flush()
+            entry = INDEX_ENTRY.pack(self.active_segment, offset, len(payload))
+            self._index_file.write(entry)
+            self._index_file.flush()
+            self._index += entry
+
+            self._maybe_sync()
+            return len(self)
+
+    def _roll_segment(self) -> None:
+        """Seal the active segment and start a new one"""
+        self.sync()
+        self._segment_file.close()
+        self.active_segment += 1
+        path = self._segment_path(self.active_segment)
+        self._segment_file = open(path, "ab")
+        # Offsets must match where "ab" actually writes, even if the file exists
+        self.active_size = os.path.getsize(path)
+
+    def _maybe_sync(self) -> None:
+        """Apply the configured fsync policy after an append"""
+        if self.fsync == FSYNC_ALWAYS:
+            self.sync()
+        elif self.fsync == FSYNC_INTERVAL and time.time() - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        """Flush buffered writes and fsync the active segment and index"""
+        with self._lock:
+            if self.read_only:
+                return
+            for f in (self._segment_file, self._index_file):
+                f.flush()
+                os.fsync(f.fileno())
+            self.last_sync = time.time()
+
+    # ============ READS ============
+
+    def __len__(self) -> int:
+        return len(self._index) // INDEX_ENTRY.size
+
+    def _entry(self, height: int) -> Tuple[int, int, int]:
+        return INDEX_ENTRY.unpack_from(self._index, height * INDEX_ENTRY.size)
+
+    def _segment_view(self, segment: int, needed: int) -> mmap.mmap:
+        """Get a read-only mapping of a segment covering at least `needed` bytes"""
+        if self._map_sizes.get(segment, 0) < needed:
+            if segment == self.active_segment and self._segment_file is not None:
+                self._segment_file.flush()
+            old = self._maps.pop(segment, None)
+            if old is not None:
+                old.close()
+            with open(self._segment_path(segment), "rb") as f:
+                self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._map_sizes[segment] = len(self._maps[segment])
+        return self._maps[segment]
+
+    def read_payload(self, height: int) -> bytes:
+        """
+        Read the raw stored payload of a block
+
+        Args:
+            height: Block index
+
+        Returns:
+            The block's canonical bytes
+        """
+        if not 0 <= height < len(self):
+            raise IndexError(f"Block #{height} not in store")
+
+        with self._lock:
+            segment, offset, length = self._entry(height)
+            start = offset + RECORD_HEADER.size
+            view = self._segment_view(segment, start + length)
+            return view[start:start + length]
+
+    def read_dict(self, height: int) -> Dict:
+        """
+        Read the stored dictionary form of a block
+
+        Args:
+            height: Block index
+
+        Returns:
+            The block as produced by Block.to_dict()
+        """
+        return canonical_decode(self.read_payload(height))
+
+    def read_block(self, height: int) -> Block:
+        """Read a block by height"""
+        return Block.from_canonical(self.read_payload(height))
+
+    def chain_view(self, cache_size: int = 1024) -> "StoredChain":
+        """Get a list-like view of the stored chain for use as Blockchain.chain"""
+        return StoredChain(self, cache_size)
+
+    def close(self) -> None:
+        """Sync and close all files and mappings, and release the writer lock"""
+        with self._lock:
+            if self._segment_file is not None:
+                self.sync()
+                self._segment_file.close()
+                self._index_file.close()
+                self._segment_file = None
+                self._index_file = None
+            for view in self._maps.values():
+                view.close()
+            self._maps.clear()
+            self._map_sizes.clear()
+            if self._lock_file is not None:
+                self._lock_file.close()  # releases the writer lock
+                self._lock_file = None
+
+
+class StoredChain:
+    """
+    List-like chain backed by a BlockStore
+
+    Supports the operations Blockchain uses on its chain list (len, indexing,
+    slicing, iteration and append). Blocks are decoded on first access and
+    kept in a small LRU cache, so memory use does not grow with chain length.
+    The cache is guarded by a lock so request threads can read concurrently.
+    """
+
+    def __init__(self, store: BlockStore, cache_size: int = 1024):
+        self.store = store
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[int, Block]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[i] for i in range(*key.indices(len(self)))]
+
+        height = key + len(self) if key < 0 else key
+        if not 0 <= height < len(self):
+            raise IndexError("chain index out of range")
+
+        with self._cache_lock:
+            block = self._cache.get(height)
+            if block is not None:
+                self._cache.move_to_end(height)
+                return block
+
+        # Decode outside the lock; a concurrent miss for the same height
+        # just decodes the block twice
+        block = self.store.read_block(height)
+        self._remember(height, block)
+        return block
+
+    def __iter__(self) -> Iterator[Block]:
+        for height in range(len(self)):
+            block = self._cache.get(height)
+            yield block if block is not None else self.store.read_block(height)
+
+    def append(self, block: Block) -> None:
+        """Persist a block and keep it cached as the new tip"""
+        self.store.append(block)
+        self._remember(block.index, block)
+
+    def _remember(self, height: int, block: Block) -> None:
+        with self._cache_lock:
+            self._cache[height] = block
+            self._cache.move_to_end(height)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -3,78 +3,513 @@ Core Blockchain Implementation for Green Points Reward System
 """
 
 import hashlib
+import hmac
 import json
+import secrets
+import threading
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Iterable, Optional, Tuple, Callable
+from concurrency import RWLock
+from encoding import canonical_decode, canonical_encode
+from merkle import MerkleTree, compute_merkle_root
+from miner import ProofOfWorkMiner, search_nonces
+from postings import PostingsIndex
+from transaction import Mempool, TransactionRecord, transaction_key
+
+
+# Block hash schemes, recorded per block so chains from before Merkle roots stay verifiable
+HASH_LEGACY = 0  # SHA-256 over the whole block as sorted-key JSON
+HASH_MERKLE = 1  # canonical binary header (see encoding.py) over a Merkle root of the transactions
+
+# Per-address activity totals maintained alongside the balance index
+EMPTY_COUNTERS = {"gp_earned": 0, "gp_spent": 0, "tasks_completed": 0}
 
 
 class Block:
     """Represents a single block in the blockchain"""
     
     def __init__(self, index: int, timestamp: float, transactions: List[Dict], 
-                 previous_hash: str, nonce: int = 0):
+                 previous_hash: str, nonce: int = 0, hash_version: int = HASH_MERKLE):
+        """
+        Initialize a block
+        
+        Transactions are stored as compact TransactionRecord objects; use
+        to_dict() to get them back as plain dictionaries.
+        """
         self.index = index
         self.timestamp = timestamp
-        self.transactions = transactions
+        self.transactions = [TransactionRecord.from_dict(tx) for tx in transactions]
         self.previous_hash = previous_hash
         self.nonce = nonce
-        self.hash = self.calculate_hash()
+        self.hash_version = hash_version
+        self._header: Optional[Tuple[Tuple, bytes]] = None
+        self._canonical: Optional[Tuple[str, bytes]] = None
+        self.merkle_mutated = False  # set by calculate_hash() when transactions are duplicated
+        if hash_version == HASH_LEGACY:
+            self.merkle_root: Optional[str] = None
+            self.hash = self.calculate_hash()
+        else:
+            self.merkle_root, self.merkle_mutated = compute_merkle_root(self.transactions)
+            self.hash = self._header_hash(self.merkle_root)
+    
+    def merkle_tree(self) -> MerkleTree:
+        """
+        Build the block's full Merkle tree, e.g. for an inclusion proof
+        
+        The tree is not kept on the block: its levels would take more
+        memory than the transactions themselves.
+        """
+        return MerkleTree(self.transactions)
+    
+    def header_prefix(self, merkle_root: Optional[str] = None) -> bytes:
+        """
+        Serialize the block header, minus the nonce, for hashing
+        
+        The hash of a block is SHA-256 over this prefix followed by the
+        decimal nonce, so miners can serialize the header once per block.
+        The prefix is cached and only re-encoded when a header field or
+        the Merkle root differs from the cached one. The header also
+        commits to the number of transactions.
+        
+        Args:
+            merkle_root: Root to commit to (defaults to the stored root)
+        """
+        names = ("index", "timestamp", "merkle_root", "previous_hash", "transaction_count")
+        fields = (self.index, self.timestamp, merkle_root or self.merkle_root, self.previous_hash,
+                  len(self.transactions))
+        if self._header is not None and self._header[0] == fields:
+            return self._header[1]
+        
+        prefix = canonical_encode(dict(zip(names, fields)))
+        self._header = (fields, prefix)
+        return prefix
     
     def calculate_hash(self) -> str:
-        """Calculate the SHA-256 hash of the block"""
-        block_string = json.dumps({
-            "index": self.index,
-            "timestamp": self.timestamp,
-            "transactions": self.transactions,
-            "previous_hash": self.previous_hash,
-            "nonce": self.nonce
-        }, sort_keys=True)
-        return hashlib.sha256(block_string.encode()).hexdigest()
+        """
+        Calculate the SHA-256 hash of the block
+        
+        The Merkle root is recomputed from the transactions, so a modified
+        transaction changes the hash. Blocks older than Merkle roots were
+        hashed over the full transaction list and keep that scheme.
+        merkle_mutated records whether the recomputed tree has duplicated
+        siblings.
+        """
+        if self.hash_version == HASH_LEGACY:
+            block_string = json.dumps({
+                "index": self.index,
+                "timestamp": self.timestamp,
+                "transactions": [tx.to_dict() for tx in self.transactions],
+                "previous_hash": self.previous_hash,
+                "nonce": self.nonce
+            }, sort_keys=True)
+            return hashlib.sha256(block_string.encode()).hexdigest()
+        
+        merkle_root, self.merkle_mutated = compute_merkle_root(self.transactions)
+        return self._header_hash(merkle_root)
+    
+    def _header_hash(self, merkle_root: str) -> str:
+        return hashlib.sha256(self.header_prefix(merkle_root) + str(self.nonce).encode()).hexdigest()
+    
+    def check(self, previous_hash: str, difficulty: int) -> Optional[str]:
+        """
+        Check the block's hash, Merkle root, proof of work and link
+        
+        Shared by chain validation and backup import, so a block is held
+        to the same rules wherever it comes from.
+        
+        Args:
+            previous_hash: Hash of the block before this one
+            difficulty: Number of leading zeros required in the hash
+        
+        Returns:
+            What is wrong with the block, or None if it is valid
+        """
+        if self.hash_version == HASH_LEGACY:
+            if self.hash != self.calculate_hash():
+                return "Invalid hash"
+        else:
+            merkle_root, mutated = compute_merkle_root(self.transactions)
+            # The stored root backs inclusion proofs, so it must be the real one
+            if merkle_root != self.merkle_root:
+                return "Merkle root does not match the transactions"
+            if self.hash != self._header_hash(merkle_root):
+                return "Invalid hash"
+            # Duplicated trailing transactions leave older Merkle roots unchanged
+            if mutated:
+                return "Duplicated transactions"
+        
+        if self.previous_hash != previous_hash:
+            return "Invalid previous hash"
+        
+        if not self.hash.startswith("0" * difficulty):
+            return "Not properly mined"
+        return None
     
     def mine_block(self, difficulty: int) -> None:
         """
-        Mine the block using proof-of-work
+        Mine the block using proof-of-work in the calling process
         
         Args:
             difficulty: Number of leading zeros required in hash
         """
-        target = "0" * difficulty
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self.calculate_hash()
+        self.nonce, self.hash, _ = search_nonces(self.header_prefix(), difficulty, self.nonce, 1)
         print(f"Block mined: {self.hash}")
     
-    def to_dict(self) -> Dict:
-        """Convert block to dictionary format"""
-        return {
+    def _fields(self, transactions: List) -> Dict:
+        """Build the dictionary form of the block around a transaction list"""
+        block_dict = {
             "index": self.index,
             "timestamp": self.timestamp,
-            "transactions": self.transactions,
+            "transactions": transactions,
             "previous_hash": self.previous_hash,
             "nonce": self.nonce,
             "hash": self.hash
         }
+        if self.merkle_root is not None:
+            block_dict["merkle_root"] = self.merkle_root
+        if self.hash_version != HASH_LEGACY:
+            block_dict["hash_version"] = self.hash_version
+        return block_dict
+    
+    def to_dict(self) -> Dict:
+        """Convert block to dictionary format"""
+        return self._fields([tx.to_dict() for tx in self.transactions])
+    
+    def canonical_bytes(self) -> bytes:
+        """
+        Get the canonical encoding of to_dict(), as written to the block store
+        
+        The encoding is computed once per sealed block and cached against
+        its hash; blocks read from the store keep the bytes they were
+        decoded from.
+        """
+        if self._canonical is None or self._canonical[0] != self.hash:
+            self._canonical = (self.hash, canonical_encode(self._fields(self.transactions)))
+        return self._canonical[1]
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Block":
+        """
+        Rebuild a block from its dictionary format without re-hashing it
+        
+        Blocks without a hash_version are from before Merkle roots and
+        use the legacy scheme.
+        
+        Args:
+            data: Dictionary produced by to_dict()
+        
+        Returns:
+            The block, carrying the stored hash
+        """
+        block = cls.__new__(cls)
+        block.index = data["index"]
+        block.timestamp = data["timestamp"]
+        block.transactions = [TransactionRecord.from_dict(tx) for tx in data["transactions"]]
+        block.previous_hash = data["previous_hash"]
+        block.nonce = data["nonce"]
+        block.merkle_root = data.get("merkle_root")
+        block.hash_version = data.get("hash_version", HASH_LEGACY)
+        block._header = None
+        block._canonical = None
+        block.merkle_mutated = False
+        block.hash = data["hash"]
+        return block
+    
+    @classmethod
+    def from_canonical(cls, payload: bytes) -> "Block":
+        """
+        Rebuild a block from canonical_bytes() output, keeping the bytes cached
+        
+        Args:
+            payload: Encoded block
+        
+        Returns:
+            The block, carrying the stored hash
+        """
+        block = cls.from_dict(canonical_decode(payload))
+        block._canonical = (block.hash, bytes(payload))
+        return block
 
 
 class Blockchain:
     """The main blockchain class managing the chain and transactions"""
     
-    def __init__(self, difficulty: int = 2):
-        self.chain: List[Block] = []
+    def __init__(self, difficulty: int = 2, store=None,
+                 checkpoint_interval: int = 100, checkpoint_key: Optional[bytes] = None,
+                 miner: Optional[ProofOfWorkMiner] = None, mempool: Optional[Mempool] = None,
+                 snapshots=None, postings: Optional[PostingsIndex] = None):
+        """
+        Initialize the blockchain
+        
+        Args:
+            difficulty: Number of leading zeros required in block hashes
+            store: Optional BlockStore; when given, the chain is persisted to
+                   it and an existing chain is loaded from it instead of
+                   creating a new genesis block
+            checkpoint_interval: Number of validated blocks between signed checkpoints
+            checkpoint_key: HMAC key for signing checkpoints (see deployment.load_checkpoint_key);
+                            a random key is used if not given, so saved checkpoints
+                            stop verifying after a restart
+            miner: Proof-of-work engine (default: mine in the calling process)
+            mempool: Pending transaction pool (default: unbounded, oldest first)
+            snapshots: Optional SnapshotStore; derived state is restored from
+                       its latest snapshot on startup and saved to it every
+                       snapshots.interval blocks
+            postings: Index of each address's transactions (default: the
+                      snapshot store's index, or an in-memory one)
+        """
+        self.chain: List[Block] = store.chain_view() if store is not None else []
+        self.store = store
         self.difficulty = difficulty
-        self.pending_transactions: List[Dict] = []
+        self.pending_transactions: Mempool = mempool or Mempool()
+        self.pending_transactions.on_evict = self._on_evict
         self.mining_reward = 10  # Green points reward for mining
-        self.create_genesis_block()
+        self.miner = miner or ProofOfWorkMiner(workers=1)
+        self.transaction_listeners: List[Callable[[Dict], None]] = []  # called after add_transaction
+        self.block_listeners: List[Callable[[Block], None]] = []  # called as each block's balances are credited
+        self._pool_lock = threading.Lock()  # guards pending_transactions and the chain tip
+        self._mining_lock = threading.Lock()  # one block is mined at a time
+        self._state_lock = RWLock()  # readers share the chain and indexes; append_block writes
+        self._validation_lock = threading.Lock()  # guards the validation watermark and checkpoints
+        self.tip: Optional[Block] = None  # latest block, replaced (never mutated) on append
+        self.balances: Dict[str, float] = {}  # address -> confirmed balance
+        self.pending_deltas: Dict[str, float] = {}  # address -> unconfirmed change
+        self.address_counters: Dict[str, Dict[str, float]] = {}  # address -> confirmed activity totals
+        self.snapshots = snapshots
+        self.snapshot_height = 0  # chain height covered by the latest snapshot
+        if postings is None:
+            postings = snapshots.open_postings() if snapshots is not None else PostingsIndex()
+        self.postings = postings  # address -> (block_index, tx_offset) postings, on disk
+        
+        # Validation watermark: blocks below validated_height are known good
+        self.validated_height = 0
+        self.validated_hash: Optional[str] = None
+        self.invalid_height: Optional[int] = None  # first bad block found; cleared by a passing full audit
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_key = checkpoint_key or secrets.token_bytes(32)
+        self.checkpoints: List[Dict] = []
+        self.last_audit: Optional[Dict] = None
+        self._audit_thread: Optional[threading.Thread] = None
+        
+        if len(self.chain) > 0:
+            if not self.restore_snapshot():
+                self.rebuild_indexes()
+        else:
+            self.create_genesis_block()
     
     def create_genesis_block(self) -> None:
         """Create the first block in the chain"""
         genesis_block = Block(0, time.time(), [], "0")
-        genesis_block.mine_block(self.difficulty)
-        self.chain.append(genesis_block)
+        self.miner.mine(genesis_block, self.difficulty)
+        self.append_block(genesis_block)
     
     def get_latest_block(self) -> Block:
-        """Get the most recent block in the chain"""
-        return self.chain[-1]
+        """Get the most recent block in the chain (lock-free)"""
+        return self.tip
+    
+    def read_lock(self):
+        """
+        Hold the state lock for reading, for callers that combine several
+        indexes (e.g. iterate balances) and need them mutually consistent
+        
+        Usage:
+            with blockchain.read_lock():
+                ...
+        """
+        return self._state_lock.read()
+    
+    def append_block(self, block: Block) -> None:
+        """
+        Append a block to the chain and update the derived indexes
+        
+        This is the only path that changes confirmed state. It holds the
+        state lock for writing, so readers never see a half-applied block;
+        the tip is published last.
+        
+        Args:
+            block: A block whose previous_hash points at the current tip
+        """
+        snapshot = None
+        with self._state_lock.write():
+            self.chain.append(block)
+            self._index_block(block)
+            self._index_postings([block])
+            self.tip = block
+            
+            if self.snapshots is not None and len(self.chain) - self.snapshot_height >= self.snapshots.interval:
+                snapshot = self.snapshot_state()
+                self.snapshot_height = len(self.chain)
+        
+        # Written after the lock is released: only the state copy is taken under it
+        if snapshot is not None:
+            self.snapshots.save(snapshot)
+    
+    def _index_block(self, block: Block) -> None:
+        """Apply a block's transactions to the balance and counter indexes"""
+        for transaction in block.transactions:
+            amount = transaction.amount
+            sender = transaction.sender
+            recipient = transaction.recipient
+            self.balances[sender] = self.balances.get(sender, 0) - amount
+            self.balances[recipient] = self.balances.get(recipient, 0) + amount
+            
+            sender_counters = self.address_counters.setdefault(sender, dict(EMPTY_COUNTERS))
+            sender_counters["gp_spent"] += amount
+            recipient_counters = self.address_counters.setdefault(recipient, dict(EMPTY_COUNTERS))
+            recipient_counters["gp_earned"] += amount
+            if transaction.type == "task_reward":
+                recipient_counters["tasks_completed"] += 1
+        
+        # Under the state write lock, so listeners see the block's balances and no later ones
+        for listener in self.block_listeners:
+            listener(block)
+    
+    def _index_postings(self, blocks: Iterable[Block]) -> None:
+        """Add blocks' transactions to the history and location index (unless it is read-only)"""
+        if self.postings.read_only:
+            return
+        self.postings.add_blocks(
+            (block.index, block.hash,
+             [(self._location_key(tx), tx.sender, tx.recipient) for tx in block.transactions])
+            for block in blocks
+        )
+    
+    def _sync_postings(self) -> None:
+        """
+        Bring the postings index in line with the chain on startup
+        
+        The index is kept up to the last block both agree on (block hashes
+        are chained, so one matching hash vouches for every block before
+        it); later blocks are re-indexed.
+        """
+        if self.postings.read_only:
+            return
+        height = min(self.postings.height, len(self.chain))
+        if height and self.postings.block_hash(height - 1) != self.chain[height - 1].hash:
+            print("Postings index does not match the chain, rebuilding")
+            height = 0
+        self.postings.truncate(height)
+        self._index_postings(self.chain[index] for index in range(height, len(self.chain)))
+    
+    @staticmethod
+    def _location_key(transaction: TransactionRecord) -> Optional[str]:
+        """
+        Key of a confirmed transaction in the postings index
+        
+        Keyed like the mempool (see transaction_key), so replays of
+        transactions with an ID or nonce are caught; others have no key.
+        """
+        if "transaction_id" in transaction:
+            return transaction.transaction_id
+        return transaction_key(transaction)
+    
+    def rebuild_indexes(self) -> None:
+        """
+        Rebuild the balance and history indexes with a single pass over the chain
+        
+        Call this after the chain has been loaded or replaced wholesale.
+        The postings index is only re-indexed from where it stops matching
+        the chain.
+        """
+        with self._state_lock.write():
+            self.balances = {}
+            self.address_counters = {}
+            for block in self.chain:
+                self._index_block(block)
+            self._sync_postings()
+            self.tip = self.chain[-1]
+        
+        with self._pool_lock:
+            self.pending_deltas = {}
+            for transaction in self.pending_transactions:
+                self._index_pending(transaction)
+    
+    # ============ SNAPSHOTS ============
+    
+    def snapshot_state(self) -> Dict:
+        """
+        Copy the per-address state of the confirmed chain
+        
+        The postings index grows with every transaction, so it is not
+        copied; it is kept on disk and updated with every block instead.
+        
+        Returns:
+            Balances, per-address counters, checkpoints and the tip they
+            were computed up to, in a JSON-serializable form
+        
+        Callers must hold the state lock (see save_snapshot()).
+        """
+        return {
+            "height": len(self.chain),
+            "tip_hash": self.get_latest_block().hash,
+            "balances": dict(self.balances),
+            "address_counters": {address: dict(counters) for address, counters in self.address_counters.items()},
+            "checkpoints": list(self.checkpoints)
+        }
+    
+    def save_snapshot(self) -> Optional[str]:
+        """
+        Write a snapshot of the current state to the snapshot store
+        
+        Returns:
+            Path of the snapshot file, or None if no store is configured
+        """
+        if self.snapshots is None:
+            return None
+        with self._state_lock.read():
+            state = self.snapshot_state()
+        path = self.snapshots.save(state)
+        self.snapshot_height = max(self.snapshot_height, state["height"])
+        return path
+    
+    def restore_snapshot(self) -> bool:
+        """
+        Load the latest snapshot that matches the chain and replay later blocks
+        
+        A snapshot is only used if the block at its height still has the
+        recorded hash. The postings index is on disk already and only
+        catches up with the chain. Checkpoints are restored as-is and are
+        only trusted by validation if their signatures verify.
+        
+        Returns:
+            True if the state was restored, False if a full rebuild is needed
+        """
+        if self.snapshots is None:
+            return False
+        
+        state = self.snapshots.load_latest(max_height=len(self.chain))
+        if state is None:
+            return False
+        
+        height = state["height"]
+        if height < 1 or self.chain[height - 1].hash != state["tip_hash"]:
+            print(f"Snapshot at height {height} does not match the chain, rebuilding")
+            return False
+        
+        with self._state_lock.write():
+            self.balances = state["balances"]
+            self.address_counters = state["address_counters"]
+            self.checkpoints = state["checkpoints"]
+            self.snapshot_height = height
+            
+            for index in range(height, len(self.chain)):
+                self._index_block(self.chain[index])
+            self._sync_postings()
+            self.tip = self.chain[-1]
+        
+        with self._pool_lock:
+            self.pending_deltas = {}
+            for transaction in self.pending_transactions:
+                self._index_pending(transaction)
+        return True
+    
+    def _index_pending(self, transaction: Dict, sign: int = 1) -> None:
+        """Apply (or with sign=-1, remove) a pending transaction's balance deltas"""
+        amount = transaction["amount"] * sign
+        sender = transaction["from"]
+        recipient = transaction["to"]
+        self.pending_deltas[sender] = self.pending_deltas.get(sender, 0) - amount
+        self.pending_deltas[recipient] = self.pending_deltas.get(recipient, 0) + amount
     
     def add_transaction(self, transaction: Dict) -> bool:
         """
@@ -96,47 +531,95 @@ class Blockchain:
             print("Transaction amount must be positive")
             return False
         
-        self.pending_transactions.append(transaction)
+        with self._pool_lock:
+            # Reject replays of transactions that are already confirmed
+            key = transaction_key(transaction)
+            if key is not None and self.postings.locate(key) is not None:
+                print("Transaction already confirmed")
+                return False
+            if not self.pending_transactions.add(transaction):
+                return False
+            self._index_pending(transaction)
+        
+        for listener in self.transaction_listeners:
+            listener(transaction)
         return True
     
-    def mine_pending_transactions(self, miner_address: str) -> Block:
+    def _on_evict(self, transaction: Dict) -> None:
+        """Mempool callback: drop an evicted transaction's pending deltas"""
+        self._index_pending(transaction, sign=-1)
+    
+    @property
+    def max_pending(self) -> Optional[int]:
+        """Maximum number of pending transactions (None = unbounded)"""
+        return self.pending_transactions.max_transactions
+    
+    @max_pending.setter
+    def max_pending(self, value: Optional[int]) -> None:
+        self.pending_transactions.max_transactions = value
+    
+    def is_pool_full(self) -> bool:
+        """Check whether the transaction pool is at its capacity"""
+        return self.pending_transactions.is_full()
+    
+    def mine_pending_transactions(self, miner_address: str,
+                                  max_transactions: Optional[int] = None) -> Block:
         """
-        Mine all pending transactions into a new block
+        Mine pending transactions into a new block
+        
+        Transactions added while the block is being mined stay pending.
         
         Args:
             miner_address: Address of the miner to receive the reward
+            max_transactions: Optional cap on pending transactions included,
+                              taken in the mempool's priority order; the
+                              rest stay pending
         
         Returns:
             The newly mined block
         """
-        # Create reward transaction for miner
-        reward_transaction = {
-            "from": "SYSTEM",
-            "to": miner_address,
-            "amount": self.mining_reward,
-            "type": "mining_reward",
-            "timestamp": time.time()
-        }
-        
-        # Create new block with pending transactions
-        block = Block(
-            index=len(self.chain),
-            timestamp=time.time(),
-            transactions=self.pending_transactions + [reward_transaction],
-            previous_hash=self.get_latest_block().hash
-        )
-        
-        print(f"\nMining block {block.index}...")
-        block.mine_block(self.difficulty)
-        
-        self.chain.append(block)
-        self.pending_transactions = []  # Clear pending transactions
+        with self._mining_lock:
+            with self._pool_lock:
+                batch = self.pending_transactions.select(max_transactions)
+                previous_hash = self.get_latest_block().hash
+                index = len(self.chain)
+            
+            # Create reward transaction for miner
+            reward_transaction = {
+                "from": "SYSTEM",
+                "to": miner_address,
+                "amount": self.mining_reward,
+                "type": "mining_reward",
+                "timestamp": time.time()
+            }
+            
+            # Create new block with the batch of pending transactions
+            block = Block(
+                index=index,
+                timestamp=time.time(),
+                transactions=batch + [reward_transaction],
+                previous_hash=previous_hash
+            )
+            
+            print(f"\nMining block {block.index}...")
+            stats = self.miner.mine(block, self.difficulty)
+            print(f"Block mined: {block.hash} ({stats['hashes']} hashes, {stats['hashrate']:.0f} H/s)")
+            
+            with self._pool_lock:
+                self.append_block(block)
+                # Clear mined transactions
+                for transaction in batch:
+                    key = self.pending_transactions.key_of(transaction)
+                    if key is not None and self.pending_transactions.remove(key) is not None:
+                        self._index_pending(transaction, sign=-1)
+                if not self.pending_transactions:
+                    self.pending_deltas = {}
         
         return block
     
     def get_balance(self, address: str) -> float:
         """
-        Calculate the balance of an address by going through all transactions
+        Get the confirmed balance of an address from the balance index
         
         Args:
             address: The address to check balance for
@@ -144,43 +627,148 @@ class Blockchain:
         Returns:
             The current balance
         """
-        balance = 0
+        return self.balances.get(address, 0)
+    
+    def get_address_counters(self, address: str) -> Dict[str, float]:
+        """
+        Get confirmed activity totals for an address
         
-        for block in self.chain:
-            for transaction in block.transactions:
-                if transaction["from"] == address:
-                    balance -= transaction["amount"]
-                if transaction["to"] == address:
-                    balance += transaction["amount"]
+        Args:
+            address: The address to look up
         
-        return balance
+        Returns:
+            Points earned and spent and the number of task rewards received
+        """
+        return dict(self.address_counters.get(address, EMPTY_COUNTERS))
     
-    def is_chain_valid(self) -> bool:
+    def get_pending_balance(self, address: str) -> float:
         """
-        Validate the entire blockchain
+        Get the balance of an address including transactions not yet mined
+        
+        Args:
+            address: The address to check balance for
+        
+        Returns:
+            The confirmed balance plus any pending credits and debits
+        """
+        return self.balances.get(address, 0) + self.pending_deltas.get(address, 0)
+    
+    def is_chain_valid(self, full: bool = False) -> bool:
+        """
+        Validate the blockchain
+        
+        By default only blocks appended since the last successful validation
+        (or the latest intact checkpoint) are checked. Once a validation has
+        failed, the chain stays invalid until a full audit passes.
+        
+        Args:
+            full: Re-check every block from genesis instead of starting
+                  at the watermark or a checkpoint (audit mode)
         
         Returns:
             True if the blockchain is valid, False otherwise
         """
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i - 1]
-            
-            # Check if current block hash is correct
-            if current_block.hash != current_block.calculate_hash():
-                print(f"Invalid hash at block {i}")
+        with self._validation_lock:
+            if self.invalid_height is not None and not full:
                 return False
+            end = len(self.chain)
+            start = 1 if full else self._validation_start()
             
-            # Check if previous hash reference is correct
-            if current_block.previous_hash != previous_block.hash:
-                print(f"Invalid previous hash at block {i}")
+            invalid = self._validate_range(start, end)
+            if invalid is not None:
+                self.validated_height = 0
+                self.validated_hash = None
+                self.invalid_height = invalid
+                # Checkpoints at or above the failing block no longer vouch for anything
+                self.checkpoints = [c for c in self.checkpoints if c["height"] < invalid]
                 return False
             
-            # Check if block meets difficulty requirement
-            if not current_block.hash.startswith("0" * self.difficulty):
-                print(f"Block {i} not properly mined")
-                return False
+            self.invalid_height = None
+            if end > self.validated_height or full:
+                self.validated_height = end
+                self.validated_hash = self.chain[end - 1].hash
+                self._create_checkpoints()
+            return True
+    
+    def _validate_range(self, start: int, end: int) -> Optional[int]:
+        """Validate blocks in [start, end); returns the first invalid height, or None"""
+        for i in range(start, end):
+            problem = self.chain[i].check(self.chain[i - 1].hash, self.difficulty)
+            if problem is not None:
+                print(f"{problem} at block {i}")
+                return i
+        
+        return None
+    
+    def _validation_start(self) -> int:
+        """Find the first block that still needs validating"""
+        if (self.validated_height > 0 and self.validated_height <= len(self.chain) and
+                self.chain[self.validated_height - 1].hash == self.validated_hash):
+            return self.validated_height
+        
+        for checkpoint in reversed(self.checkpoints):
+            if self.verify_checkpoint(checkpoint):
+                return checkpoint["height"]
+        return 1
+    
+    def _sign_checkpoint(self, height: int, block_hash: str) -> str:
+        message = f"{height}:{block_hash}".encode()
+        return hmac.new(self.checkpoint_key, message, hashlib.sha256).hexdigest()
+    
+    def _create_checkpoints(self) -> None:
+        """Record signed checkpoints for every full interval below the watermark"""
+        last_height = self.checkpoints[-1]["height"] if self.checkpoints else 0
+        while last_height + self.checkpoint_interval <= self.validated_height:
+            last_height += self.checkpoint_interval
+            block_hash = self.chain[last_height - 1].hash
+            self.checkpoints.append({
+                "height": last_height,
+                "block_hash": block_hash,
+                "timestamp": time.time(),
+                "signature": self._sign_checkpoint(last_height, block_hash)
+            })
+    
+    def verify_checkpoint(self, checkpoint: Dict) -> bool:
+        """
+        Check a checkpoint's signature and that the chain still matches it
+        
+        Args:
+            checkpoint: Checkpoint dictionary from self.checkpoints
+        
+        Returns:
+            True if the checkpoint is authentic and its block is unchanged
+        """
+        height = checkpoint["height"]
+        expected = self._sign_checkpoint(height, checkpoint["block_hash"])
+        if not hmac.compare_digest(expected, checkpoint["signature"]):
+            return False
+        return height <= len(self.chain) and self.chain[height - 1].hash == checkpoint["block_hash"]
+    
+    def start_full_audit(self) -> bool:
+        """
+        Run a full validation of the chain in a background thread
+        
+        The outcome is recorded in self.last_audit when the audit finishes.
+        
+        Returns:
+            True if an audit was started, False if one is already running
+        """
+        if self._audit_thread is not None and self._audit_thread.is_alive():
+            return False
+        
+        def audit():
+            started_at = time.time()
+            height = len(self.chain)
+            valid = self.is_chain_valid(full=True)
+            self.last_audit = {
+                "started_at": started_at,
+                "finished_at": time.time(),
+                "height": height,
+                "valid": valid
+            }
         
+        self._audit_thread = threading.Thread(target=audit, name="chain-audit", daemon=True)
+        self._audit_thread.start()
         return True
     
     def get_transaction_history(self, address: str) -> List[Dict]:
@@ -193,18 +781,99 @@ class Blockchain:
         Returns:
             List of transactions
         """
-        history = []
+        with self._state_lock.read():
+            return [self._history_entry(posting) for posting in self.postings.page(address)]
+    
+    def get_transaction_page(self, address: str, limit: int = 50,
+                             cursor: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Get the newest transactions involving an address, one page at a time
         
-        for block in self.chain:
-            for transaction in block.transactions:
-                if transaction["from"] == address or transaction["to"] == address:
-                    history.append({
-                        **transaction,
-                        "block_index": block.index,
-                        "block_hash": block.hash
-                    })
-        
-        return history
+        Only the requested page is read from the postings index, so the
+        cost depends on limit rather than on the length of the address's
+        history.
+        
+        Args:
+            address: The address to get history for
+            limit: Maximum number of transactions to return
+            cursor: Value of next_cursor from the previous page, or None
+                    to start from the most recent transaction
+        
+        Returns:
+            (transactions oldest-first within the page, next_cursor) where
+            next_cursor is None once the oldest transaction has been returned
+        """
+        with self._state_lock.read():
+            count = self.postings.count(address)
+            end = count if cursor is None else max(0, min(cursor, count))
+            start = max(0, end - max(0, limit))
+            page = [self._history_entry(posting) for posting in self.postings.page(address, start, end)]
+        
+        next_cursor = start if start > 0 else None
+        return page, next_cursor
+    
+    def get_transaction_count(self, address: str) -> int:
+        """Get the number of confirmed transactions involving an address"""
+        return self.postings.count(address)
+    
+    def get_transaction_status(self, transaction_id: str) -> Optional[str]:
+        """
+        Find out what became of a submitted transaction
+        
+        Args:
+            transaction_id: ID of the transaction
+        
+        Returns:
+            "pending", "confirmed", or None if the node has no record of it
+            (never received, rejected, or evicted from the pool)
+        """
+        # Under the pool lock a mined transaction is either still pending or confirmed
+        with self._pool_lock:
+            if transaction_id in self.pending_transactions:
+                return "pending"
+            if self.postings.locate(transaction_id) is not None:
+                return "confirmed"
+        return None
+    
+    def get_transaction_proof(self, transaction_id: str) -> Optional[Dict]:
+        """
+        Get a Merkle inclusion proof for a confirmed transaction
+        
+        Args:
+            transaction_id: ID of the transaction
+        
+        Returns:
+            The transaction, its block header fields and the proof, or None
+            if the transaction is unknown or its block predates Merkle roots
+        """
+        location = self.postings.locate(transaction_id)
+        if location is None:
+            return None
+        
+        block_index, offset = location
+        block = self.chain[block_index]
+        if block.merkle_root is None:
+            return None
+        
+        return {
+            "transaction": block.transactions[offset].to_dict(),
+            "block_index": block.index,
+            "block_hash": block.hash,
+            "merkle_root": block.merkle_root,
+            "hash_version": block.hash_version,
+            "leaf_index": offset,
+            "proof": block.merkle_tree().get_proof(offset)
+        }
+    
+    def _history_entry(self, posting: Tuple[int, int]) -> Dict:
+        """Resolve a (block_index, tx_offset) posting to a history record"""
+        block_index, offset = posting
+        block = self.chain[block_index]
+        return {
+            **block.transactions[offset].to_dict(),
+            "block_index": block.index,
+            "block_hash": block.hash
+        }
     
     def display_chain(self) -> None:
         """Display the entire blockchain in a readable format"""
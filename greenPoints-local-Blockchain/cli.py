@@ -203,7 +203,7 @@ class GreenPointsCLI:
     def validate_blockchain(self):
         """Validate the blockchain"""
         print("\n--- BLOCKCHAIN VALIDATION ---")
-        is_valid = self.blockchain.is_chain_valid()
+        is_valid = self.blockchain.is_chain_valid(full=True)
         if is_valid:
             print("✓ Blockchain is VALID")
         else:
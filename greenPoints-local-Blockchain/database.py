@@ -6,11 +6,211 @@ Only USER and BUSINESS roles - Users earn GP, Businesses issue rewards
 
 import sqlite3
 import json
+import queue
+import threading
 import time
-from typing import Optional, Dict, List, Tuple
+from typing import Any, Callable, Optional, Dict, List, Tuple
 from enum import Enum
 
 
+# Schema migrations, applied in order to databases whose PRAGMA user_version
+# is below their version. Each step must be safe on a freshly created schema.
+MIGRATIONS: List[Tuple[int, List[str]]] = [
+    (1, [
+        # Verification queue, per-user stats and leaderboard task counts
+        "CREATE INDEX IF NOT EXISTS idx_verifications_status_submitted "
+        "ON pending_verifications (status, submitted_at)",
+        "CREATE INDEX IF NOT EXISTS idx_verifications_user_status "
+        "ON pending_verifications (user_id, status)",
+        # QR redemptions per user and per-business issuance stats
+        "CREATE INDEX IF NOT EXISTS idx_qr_codes_used_by ON qr_codes (used_by)",
+        "CREATE INDEX IF NOT EXISTS idx_qr_codes_business "
+        "ON qr_codes (business_id, is_used, reward_amount)",
+        # User listings by role
+        "CREATE INDEX IF NOT EXISTS idx_users_role_active "
+        "ON users (role, is_active, created_at)",
+        # Leaderboard page, answered from the index alone
+        "CREATE INDEX IF NOT EXISTS idx_leaderboard_total_gp "
+        "ON leaderboard_cache (total_gp DESC, user_id, name, tasks_completed)"
+    ])
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# UPDATE ... RETURNING needs SQLite 3.35+
+RETURNING_SUPPORTED = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+class GroupCommitter:
+    """
+    Coalesces writes from many threads into shared transactions
+    
+    Each submitted operation runs on a dedicated writer connection inside a
+    SAVEPOINT, so a failing operation is rolled back alone. Operations that
+    arrive within window_ms of the first one in a batch (up to max_batch)
+    are committed together, and every caller is released only after the
+    COMMIT covering its write has returned. With synchronous=FULL (the
+    Database default when group commit is on) that COMMIT is fsynced, so
+    callers get a durability acknowledgement at one fsync per batch
+    instead of one per call; with NORMAL in WAL mode commits are not
+    fsynced and batching saves little.
+    """
+    
+    def __init__(self, connect: Callable[[], sqlite3.Connection],
+                 window_ms: float = 2.0, max_batch: int = 256):
+        """
+        Start the writer thread
+        
+        Args:
+            connect: Opens the writer's connection
+            window_ms: How long a batch stays open for more writes
+            max_batch: Maximum operations per transaction
+        """
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._connect = connect
+        self._queue: "queue.Queue" = queue.Queue()
+        self.metrics = {"batches": 0, "writes": 0, "max_batch_size": 0}
+        self._thread = threading.Thread(target=self._run, name="db-group-commit", daemon=True)
+        self._thread.start()
+    
+    def submit(self, operation: Callable[[sqlite3.Cursor], Any]) -> Any:
+        """
+        Run a write and wait until it is committed
+        
+        Args:
+            operation: Called with a cursor on the writer connection
+        
+        Returns:
+            The operation's return value
+        
+        Raises:
+            Whatever the operation (or the commit) raised
+        """
+        job = {"operation": operation, "done": threading.Event(), "result": None, "error": None}
+        self._queue.put(job)
+        job["done"].wait()
+        if job["error"] is not None:
+            raise job["error"]
+        return job["result"]
+    
+    def stop(self) -> None:
+        """Commit queued writes and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join()
+    
+    def _run(self) -> None:
+        conn = self._connect()
+        running = True
+        while running:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch = [job]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if job is None:
+                    running = False
+                    break
+                batch.append(job)
+            self._commit(conn, batch)
+        conn.close()
+    
+    def _commit(self, conn: sqlite3.Connection, batch: List[Dict]) -> None:
+        """Run a batch of operations in one transaction and release their callers"""
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job in batch:
+                conn.execute("SAVEPOINT job")
+                try:
+                    job["result"] = job["operation"](conn.cursor())
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    job["error"] = e
+                conn.execute("RELEASE job")
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for job in batch:
+                job["error"] = job["error"] or e
+        
+        self.metrics["batches"] += 1
+        self.metrics["writes"] += len(batch)
+        self.metrics["max_batch_size"] = max(self.metrics["max_batch_size"], len(batch))
+        for job in batch:
+            job["done"].set()
+
+
+class ConnectionPool:
+    """
+    A bounded set of sqlite connections shared by many threads
+    
+    Connections are opened on demand, up to size, and reused after they
+    are released, so a server that starts a thread per request (werkzeug
+    with threaded=True) does not open a connection per request. acquire()
+    waits while every connection is checked out.
+    """
+    
+    def __init__(self, connect: Callable[[], sqlite3.Connection], size: int = 8,
+                 timeout: float = 10.0):
+        """
+        Create an empty pool
+        
+        Args:
+            connect: Opens a new connection
+            size: Maximum number of open connections
+            timeout: Seconds acquire() waits for a free connection
+        """
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()  # most recently used first
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Check out a connection
+        
+        Raises:
+            TimeoutError: If none was released within the timeout
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            if len(self._connections) < self.size:
+                conn = self._connect()
+                self._connections.append(conn)
+                return conn
+        
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection was free within {self.timeout}s") from None
+    
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Return a connection, rolling back anything it left uncommitted"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+    
+    def close(self) -> None:
+        """Close every connection, including ones still checked out"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            self._idle = queue.LifoQueue()
+
+
 class UserRole(Enum):
     """User roles in the system"""
     USER = "user"  # Regular users who earn GP
@@ -18,17 +218,110 @@ class UserRole(Enum):
 
 
 class Database:
-    """Handles all database operations"""
+    """
+    Handles all database operations
+    
+    Connections come from a bounded ConnectionPool. A thread checks one
+    out on first use and keeps it until release_connection() (the server
+    releases it at the end of each request), so no two threads share a
+    cursor or transaction and the number of connections stays bounded
+    however many request threads are started. An in-memory database
+    cannot be shared between connections and keeps a single connection.
+    
+    Mutators go through _write(). With group_commit_ms set, writes from
+    concurrent threads are committed together by a GroupCommitter;
+    otherwise each write commits on the calling thread's connection.
+    """
     
-    def __init__(self, db_path: str = "greenpoints.db"):
+    def __init__(self, db_path: str = "greenpoints.db", timeout: float = 10.0,
+                 journal_mode: str = "WAL", synchronous: Optional[str] = None,
+                 group_commit_ms: Optional[float] = None, pool_size: int = 8):
+        """
+        Open a database
+        
+        Args:
+            db_path: SQLite file path (or ":memory:")
+            timeout: Seconds a connection waits for another thread's write lock
+            journal_mode: SQLite journal mode; WAL lets readers run alongside
+                          the writer and turns each commit into one append
+            synchronous: SQLite synchronous level; NORMAL fsyncs at WAL
+                         checkpoints rather than on every commit (a power
+                         loss can drop the last commits, never corrupt),
+                         FULL fsyncs every commit. Defaults to FULL with
+                         group commit, which shares that fsync between the
+                         writes of a batch, and NORMAL otherwise
+            group_commit_ms: Batch writes from concurrent threads into one
+                             transaction per window of this many milliseconds
+                             (file databases only; default: commit per call)
+            pool_size: Maximum number of pooled connections; threads wait
+                       up to timeout seconds for one beyond that
+        """
         self.db_path = db_path
-        self.conn = None
+        self.timeout = timeout
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous or ("FULL" if group_commit_ms is not None else "NORMAL")
+        self._local = threading.local()  # the connection checked out by each thread
+        self._shared_conn: Optional[sqlite3.Connection] = None
+        self.pool = ConnectionPool(self._connect, pool_size, timeout)
         self.initialize_database()
+        self.release_connection()
+        
+        self.committer: Optional[GroupCommitter] = None
+        if group_commit_ms is not None and db_path != ":memory:":
+            self.committer = GroupCommitter(self._connect, group_commit_ms)
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.timeout,
+                               cached_statements=256)  # reuse prepared statements
+        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The calling thread's connection, checked out of the pool on first use"""
+        if self.db_path == ":memory:":
+            if self._shared_conn is None:
+                self._shared_conn = self._connect()
+            return self._shared_conn
+        
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.pool.acquire()
+            self._local.conn = conn
+        return conn
+    
+    def release_connection(self) -> None:
+        """Return the calling thread's connection to the pool (e.g. when a request ends)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            self.pool.release(conn)
+    
+    def _write(self, operation: Callable[[sqlite3.Cursor], Any]) -> Any:
+        """
+        Run a write operation and commit it
+        
+        Args:
+            operation: Called with a cursor; its return value is passed back
+        
+        Returns:
+            The operation's return value, once its transaction has committed
+        """
+        if self.committer is not None:
+            return self.committer.submit(operation)
+        
+        try:
+            result = operation(self.conn.cursor())
+            self.conn.commit()
+            return result
+        except Exception:
+            self.conn.rollback()
+            raise
     
     def initialize_database(self):
         """Create database tables if they don't exist"""
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row  # Return rows as dictionaries
         cursor = self.conn.cursor()
         
         # Users table - synced with blockchain wallets
@@ -104,9 +397,44 @@ class Database:
             )
         """)
         
+        # QR claims whose reward transaction may or may not have reached the chain
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS unconfirmed_claims (
+                qr_code TEXT PRIMARY KEY,
+                transaction_id TEXT NOT NULL,
+                claimed_at REAL NOT NULL,
+                FOREIGN KEY (qr_code) REFERENCES qr_codes(qr_code)
+            )
+        """)
+        
         self.conn.commit()
+        
+        # The journal mode is stored in the database file, so set it once here
+        if self.db_path != ":memory:":
+            self.conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        self.migrate()
         print("✓ Database initialized successfully")
     
+    def migrate(self) -> int:
+        """
+        Apply schema migrations newer than the database's user_version
+        
+        Returns:
+            The schema version after migrating
+        """
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, statements in MIGRATIONS:
+            if target <= version:
+                continue
+            with self.conn:
+                self.conn.execute("BEGIN")
+                for statement in statements:
+                    self.conn.execute(statement)
+                self.conn.execute(f"PRAGMA user_version = {target}")
+            print(f"✓ Database migrated to schema version {target}")
+            version = target
+        return version
+    
     def create_user(self, name: str, email: Optional[str], phone: Optional[str], 
                    role: str, wallet_address: str) -> Optional[int]:
         """
@@ -130,15 +458,12 @@ class Database:
             print(f"Error: Invalid role '{role}'")
             return None
         
-        cursor = self.conn.cursor()
         try:
-            cursor.execute("""
+            user_id = self._write(lambda cursor: cursor.execute("""
                 INSERT INTO users (name, email, phone, role, wallet_address, created_at)
                 VALUES (?, ?, ?, ?, ?, ?)
-            """, (name, email, phone, role, wallet_address, time.time()))
+            """, (name, email, phone, role, wallet_address, time.time())).lastrowid)
             
-            self.conn.commit()
-            user_id = cursor.lastrowid
             print(f"✓ User created: {name} (ID: {user_id}, Role: {role})")
             return user_id
         
@@ -187,8 +512,6 @@ class Database:
                        qr_code: str, service_description: str = "",
                        expires_in_hours: Optional[int] = None) -> Optional[int]:
         """Create a QR code for business reward"""
-        cursor = self.conn.cursor()
-        
         # Get business name
         business = self.get_user_by_id(business_id)
         if not business or business['role'] != 'business':
@@ -200,20 +523,47 @@ class Database:
             expires_at = time.time() + (expires_in_hours * 3600)
         
         try:
-            cursor.execute("""
+            return self._write(lambda cursor: cursor.execute("""
                 INSERT INTO qr_codes (qr_code, business_id, business_name, reward_amount, 
                                      service_description, created_at, expires_at)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (qr_code, business_id, business['name'], reward_amount, 
-                  service_description, time.time(), expires_at))
-            
-            self.conn.commit()
-            return cursor.lastrowid
+                  service_description, time.time(), expires_at)).lastrowid)
         
         except sqlite3.IntegrityError:
             print("Error: QR code already exists")
             return None
     
+    def create_qr_codes(self, business_id: int, business_name: str, reward_amount: float,
+                        qr_codes: List[str], service_descriptions: List[str],
+                        expires_at: Optional[float] = None) -> int:
+        """
+        Insert many QR codes for a business in one transaction
+        
+        Args:
+            business_id: ID of a business (already validated by the caller)
+            business_name: The business's name
+            reward_amount: GP amount per code
+            qr_codes: Codes to insert
+            service_descriptions: Description for each code
+            expires_at: Optional expiry timestamp shared by all codes
+        
+        Returns:
+            Number of codes inserted
+        
+        Raises:
+            sqlite3.IntegrityError: If any code already exists (nothing is inserted)
+        """
+        created_at = time.time()
+        rows = [(qr_code, business_id, business_name, reward_amount, description, created_at, expires_at)
+                for qr_code, description in zip(qr_codes, service_descriptions)]
+        self._write(lambda cursor: cursor.executemany("""
+            INSERT INTO qr_codes (qr_code, business_id, business_name, reward_amount, 
+                                 service_description, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows))
+        return len(rows)
+    
     def get_qr_code(self, qr_code: str) -> Optional[Dict]:
         """Get QR code details"""
         cursor = self.conn.cursor()
@@ -243,15 +593,98 @@ class Database:
     
     def use_qr_code(self, qr_code: str, user_id: int, transaction_id: str) -> bool:
         """Mark QR code as used"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
+        updated = self._write(lambda cursor: cursor.execute("""
             UPDATE qr_codes 
             SET is_used = 1, used_by = ?, used_at = ?, transaction_id = ?
             WHERE qr_code = ? AND is_used = 0
-        """, (user_id, time.time(), transaction_id, qr_code))
+        """, (user_id, time.time(), transaction_id, qr_code)).rowcount)
         
-        self.conn.commit()
-        return cursor.rowcount > 0
+        return updated > 0
+    
+    def claim_qr_code(self, qr_code: str, user_id: int, transaction_id: str) -> Optional[Dict]:
+        """
+        Atomically mark an unused, unexpired QR code as used
+        
+        The check and the update are a single conditional UPDATE, so of any
+        number of concurrent scans exactly one claims the code.
+        
+        Args:
+            qr_code: Code being redeemed
+            user_id: Redeeming user
+            transaction_id: ID of the reward transaction recorded on the code
+        
+        Returns:
+            The code's business and reward details if this call claimed it, None otherwise
+        """
+        now = time.time()
+        params = (user_id, now, transaction_id, qr_code, now)
+        claim_sql = """
+            UPDATE qr_codes 
+            SET is_used = 1, used_by = ?, used_at = ?, transaction_id = ?
+            WHERE qr_code = ? AND is_used = 0 AND (expires_at IS NULL OR expires_at > ?)
+        """
+        
+        def claim(cursor):
+            if RETURNING_SUPPORTED:
+                rows = cursor.execute(claim_sql + """
+                    RETURNING business_id, business_name, reward_amount, service_description
+                """, params).fetchall()
+            else:
+                # Same transaction, so the SELECT sees exactly what was claimed
+                if not cursor.execute(claim_sql, params).rowcount:
+                    return None
+                rows = cursor.execute("""
+                    SELECT business_id, business_name, reward_amount, service_description
+                    FROM qr_codes WHERE qr_code = ?
+                """, (qr_code,)).fetchall()
+            return dict(rows[0]) if rows else None
+        
+        return self._write(claim)
+    
+    def release_qr_code(self, qr_code: str, transaction_id: str) -> bool:
+        """Undo a claim whose reward transaction could not be submitted"""
+        updated = self._write(lambda cursor: cursor.execute("""
+            UPDATE qr_codes 
+            SET is_used = 0, used_by = NULL, used_at = NULL, transaction_id = NULL
+            WHERE qr_code = ? AND transaction_id = ?
+        """, (qr_code, transaction_id)).rowcount)
+        
+        return updated > 0
+    
+    def mark_claim_unconfirmed(self, qr_code: str, transaction_id: str) -> None:
+        """Record a claim whose reward transaction has an unknown outcome, for reconciliation"""
+        self._write(lambda cursor: cursor.execute("""
+            INSERT OR REPLACE INTO unconfirmed_claims (qr_code, transaction_id, claimed_at)
+            VALUES (?, ?, ?)
+        """, (qr_code, transaction_id, time.time())))
+    
+    def get_unconfirmed_claims(self) -> List[Dict]:
+        """Get claims awaiting reconciliation, oldest first"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM unconfirmed_claims ORDER BY claimed_at")
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def resolve_unconfirmed_claim(self, qr_code: str, transaction_id: str, release: bool) -> None:
+        """
+        Settle a claim awaiting reconciliation
+        
+        Args:
+            qr_code: The claimed code
+            transaction_id: ID of its reward transaction
+            release: Give the code back (the transaction never reached the
+                     chain) instead of keeping the claim (it was confirmed)
+        """
+        def resolve(cursor):
+            if release:
+                cursor.execute("""
+                    UPDATE qr_codes 
+                    SET is_used = 0, used_by = NULL, used_at = NULL, transaction_id = NULL
+                    WHERE qr_code = ? AND transaction_id = ?
+                """, (qr_code, transaction_id))
+            cursor.execute("DELETE FROM unconfirmed_claims WHERE qr_code = ? AND transaction_id = ?",
+                           (qr_code, transaction_id))
+        
+        self._write(resolve)
     
     def submit_verification(self, user_id: int, task_type: str, evidence: str,
                           reward_amount: float, image_path: Optional[str] = None,
@@ -260,20 +693,16 @@ class Database:
                           longitude: Optional[float] = None,
                           metadata: Dict = None) -> Optional[int]:
         """Submit a task for verification"""
-        cursor = self.conn.cursor()
-        
         metadata_json = json.dumps(metadata or {})
         
-        cursor.execute("""
+        verification_id = self._write(lambda cursor: cursor.execute("""
             INSERT INTO pending_verifications 
             (user_id, task_type, evidence, image_path, location, latitude, longitude,
              submitted_at, reward_amount, metadata, status)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending')
         """, (user_id, task_type, evidence, image_path, location, latitude, longitude,
-              time.time(), reward_amount, metadata_json))
+              time.time(), reward_amount, metadata_json)).lastrowid)
         
-        self.conn.commit()
-        verification_id = cursor.lastrowid
         print(f"✓ Verification submitted (ID: {verification_id})")
         return verification_id
     
@@ -304,40 +733,33 @@ class Database:
     def approve_verification(self, verification_id: int, verified_by: str, 
                             transaction_id: str) -> bool:
         """Approve a verification request"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
+        updated = self._write(lambda cursor: cursor.execute("""
             UPDATE pending_verifications
             SET status = 'approved', verified_at = ?, verified_by = ?, transaction_id = ?
             WHERE id = ? AND status = 'pending'
-        """, (time.time(), verified_by, transaction_id, verification_id))
+        """, (time.time(), verified_by, transaction_id, verification_id)).rowcount)
         
-        self.conn.commit()
-        return cursor.rowcount > 0
+        return updated > 0
     
     def reject_verification(self, verification_id: int, verified_by: str, 
                            reason: str) -> bool:
         """Reject a verification request"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
+        updated = self._write(lambda cursor: cursor.execute("""
             UPDATE pending_verifications
             SET status = 'rejected', verified_at = ?, verified_by = ?, rejection_reason = ?
             WHERE id = ? AND status = 'pending'
-        """, (time.time(), verified_by, reason, verification_id))
+        """, (time.time(), verified_by, reason, verification_id)).rowcount)
         
-        self.conn.commit()
-        return cursor.rowcount > 0
+        return updated > 0
     
     def update_leaderboard_cache(self, user_id: int, name: str, total_gp: float, 
                                 tasks_completed: int):
         """Update leaderboard cache for a user"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
+        self._write(lambda cursor: cursor.execute("""
             INSERT OR REPLACE INTO leaderboard_cache 
             (user_id, name, total_gp, tasks_completed, last_updated)
             VALUES (?, ?, ?, ?, ?)
-        """, (user_id, name, total_gp, tasks_completed, time.time()))
-        
-        self.conn.commit()
+        """, (user_id, name, total_gp, tasks_completed, time.time())))
     
     def get_leaderboard(self, limit: int = 10) -> List[Dict]:
         """Get leaderboard data"""
@@ -354,31 +776,85 @@ class Database:
         
         return [dict(row) for row in cursor.fetchall()]
     
-    def rebuild_leaderboard(self, blockchain):
-        """Rebuild entire leaderboard from blockchain data"""
-        users = self.get_all_users(role='user')
+    def _leaderboard_rows(self, blockchain, addresses: Optional[List[str]] = None) -> List[Tuple]:
+        """
+        Build leaderboard_cache rows for active users in one grouped query
         
-        for user in users:
-            balance = blockchain.get_balance(user['wallet_address'])
-            # Count approved verifications as tasks completed
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM pending_verifications
-                WHERE user_id = ? AND status = 'approved'
-            """, (user['id'],))
-            tasks_completed = cursor.fetchone()['count']
-            
-            # Add QR code redemptions
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM qr_codes
-                WHERE used_by = ?
-            """, (user['id'],))
-            tasks_completed += cursor.fetchone()['count']
-            
-            self.update_leaderboard_cache(user['id'], user['name'], balance, tasks_completed)
+        Args:
+            blockchain: Blockchain whose balance index supplies total_gp
+            addresses: Only build rows for these wallet addresses (default: all users)
         
+        Returns:
+            (user_id, name, total_gp, tasks_completed, last_updated) tuples
+        """
+        # Tasks completed = approved verifications + QR code redemptions
+        query = """
+            SELECT u.id, u.name, u.wallet_address,
+                   COALESCE(v.count, 0) + COALESCE(q.count, 0) AS tasks_completed
+            FROM users u
+            LEFT JOIN (
+                SELECT user_id, COUNT(*) AS count FROM pending_verifications
+                WHERE status = 'approved' GROUP BY user_id
+            ) v ON v.user_id = u.id
+            LEFT JOIN (
+                SELECT used_by, COUNT(*) AS count FROM qr_codes
+                WHERE used_by IS NOT NULL GROUP BY used_by
+            ) q ON q.used_by = u.id
+            WHERE u.role = 'user' AND u.is_active = 1
+        """
+        params: List = []
+        if addresses is not None:
+            query += " AND u.wallet_address IN (%s)" % ",".join("?" * len(addresses))
+            params = list(addresses)
+        
+        cursor = self.conn.cursor()
+        cursor.execute(query, params)
+        now = time.time()
+        return [(row['id'], row['name'], blockchain.get_balance(row['wallet_address']),
+                 row['tasks_completed'], now)
+                for row in cursor.fetchall()]
+    
+    def _write_leaderboard_rows(self, rows: List[Tuple]):
+        """Upsert leaderboard_cache rows in a single transaction"""
+        self._write(lambda cursor: cursor.executemany("""
+            INSERT OR REPLACE INTO leaderboard_cache 
+            (user_id, name, total_gp, tasks_completed, last_updated)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows))
+    
+    def rebuild_leaderboard(self, blockchain):
+        """
+        Rebuild entire leaderboard from blockchain data
+        
+        Balances come from the blockchain's balance index and task counts
+        from one grouped query, so the cost is one pass over the users
+        rather than a chain scan and two queries per user.
+        """
+        self._write_leaderboard_rows(self._leaderboard_rows(blockchain))
         print("✓ Leaderboard rebuilt")
     
+    def apply_block_to_leaderboard(self, blockchain, block):
+        """
+        Refresh leaderboard rows for the users a newly mined block touched
+        
+        Args:
+            blockchain: Blockchain the block was appended to
+            block: The new block
+        """
+        addresses = set()
+        for tx in block.transactions:
+            addresses.add(tx.get('from'))
+            addresses.add(tx.get('to'))
+        addresses.discard(None)
+        addresses = sorted(addresses)
+        
+        # Stay under SQLite's bound-parameter limit for large blocks
+        rows = []
+        for start in range(0, len(addresses), 500):
+            rows.extend(self._leaderboard_rows(blockchain, addresses[start:start + 500]))
+        if rows:
+            self._write_leaderboard_rows(rows)
+    
     def get_user_stats(self, user_id: int) -> Dict:
         """Get statistics for a user"""
         cursor = self.conn.cursor()
@@ -421,6 +897,12 @@ class Database:
         return stats
     
     def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
+        """Close all database connections (and stop group commit)"""
+        if self.committer is not None:
+            self.committer.stop()
+            self.committer = None
+        if self._shared_conn is not None:
+            self._shared_conn.close()
+        self._shared_conn = None
+        self._local.conn = None
+        self.pool.close()
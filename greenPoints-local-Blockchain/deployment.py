@@ -0,0 +1,319 @@
+"""
+Multi-process Deployment for Green Points Blockchain
+One owner process produces blocks and writes the chain; HTTP workers follow it
+"""
+
+import os
+import secrets
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from blockchain import Block, Blockchain
+from block_producer import BlockProducer
+from block_store import BlockStore
+
+
+ROLE_STANDALONE = "standalone"  # one process serves HTTP and owns the chain
+ROLE_OWNER = "owner"            # owns the chain and accepts writes from workers
+ROLE_WORKER = "worker"          # serves HTTP, reads the shared store, forwards writes
+
+SOCKET_FILE = "owner.sock"
+AUTHKEY_FILE = "ipc.key"
+CHECKPOINT_KEY_FILE = "checkpoint.key"
+
+
+def owner_address(directory: str) -> str:
+    """Unix socket path the owner listens on, next to the chain it owns"""
+    return os.path.join(directory, SOCKET_FILE)
+
+
+def load_authkey(directory: str, create: bool = False) -> bytes:
+    """
+    Read the shared IPC key, generating it on the owner's first start
+
+    Args:
+        directory: Chain directory shared by the owner and its workers
+        create: Generate the key if it does not exist (owner only)
+
+    Returns:
+        The key bytes
+    """
+    return _load_key(os.path.join(directory, AUTHKEY_FILE), create)
+
+
+def load_checkpoint_key(directory: str, create: bool = False) -> bytes:
+    """
+    Read the HMAC key that signs validation checkpoints
+
+    The key must outlive the process: checkpoints are saved in state
+    snapshots and only verify under the key that signed them.
+
+    Args:
+        directory: Chain directory shared by the owner and its workers
+        create: Generate the key if it does not exist (owner or standalone only)
+
+    Returns:
+        The key bytes
+    """
+    return _load_key(os.path.join(directory, CHECKPOINT_KEY_FILE), create)
+
+
+def _load_key(path: str, create: bool) -> bytes:
+    if create and not os.path.exists(path):
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    with open(path) as f:
+        return f.read().strip().encode()
+
+
+# ============ OWNER ============
+
+class ChainOwner:
+    """
+    Accepts write requests from worker processes over a local socket
+
+    Every command runs against the owner's Blockchain and BlockProducer,
+    so block production and the persisted chain have a single writer.
+    Each worker connection is served by its own thread.
+    """
+
+    def __init__(self, blockchain: Blockchain, producer: BlockProducer, address: str, authkey: bytes):
+        """
+        Initialize the owner
+
+        Args:
+            blockchain: The owner's Blockchain (backed by a BlockStore)
+            producer: The owner's running BlockProducer
+            address: Unix socket path to listen on
+            authkey: Key workers must present
+        """
+        self.blockchain = blockchain
+        self.producer = producer
+        self.address = address
+        self.authkey = authkey
+        self._listener: Optional[Listener] = None
+        self._thread: Optional[threading.Thread] = None
+
+        self.commands = {
+            "config": lambda: {"difficulty": blockchain.difficulty, "mining_reward": blockchain.mining_reward},
+            "add_transaction": blockchain.add_transaction,
+            "is_pool_full": blockchain.is_pool_full,
+            "pending_count": lambda: len(blockchain.pending_transactions),
+            "pending_transactions": lambda: list(blockchain.pending_transactions),
+            "pending_balance": blockchain.get_pending_balance,
+            "transaction_status": blockchain.get_transaction_status,
+            "mine": self._mine,
+            "is_saturated": producer.is_saturated,
+            "queue_depth": producer.queue_depth,
+            "record_rejection": producer.record_rejection,
+            "producer_metrics": producer.get_metrics,
+            "max_wait": lambda: producer.max_wait
+        }
+
+    def _mine(self, miner_address: str, max_transactions: Optional[int] = None) -> Tuple[int, Dict]:
+        block = self.blockchain.mine_pending_transactions(miner_address, max_transactions)
+        return block.index, self.blockchain.miner.last_stats
+
+    def start(self) -> None:
+        """
+        Start listening for workers in a background thread
+
+        Raises:
+            RuntimeError: If the blockchain is not backed by a writable
+                          BlockStore, whose writer lock proves this is the
+                          only owner of the directory
+        """
+        store = self.blockchain.store
+        if store is None or store.read_only:
+            raise RuntimeError("The chain owner needs a writable BlockStore (it holds the writer lock)")
+        # Holding the writer lock, any socket left behind is from a dead owner
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        self._thread = threading.Thread(target=self._accept_loop, name="chain-owner", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop accepting workers"""
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def _accept_loop(self) -> None:
+        while self._listener is not None:
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._listener is None:
+                    return
+                continue  # failed handshake (wrong key); keep serving others
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection) -> None:
+        """Answer one worker's requests until it disconnects"""
+        with connection:
+            while True:
+                try:
+                    command, args = connection.recv()
+                except (EOFError, OSError):
+                    return
+                handler = self.commands.get(command)
+                if handler is None:
+                    connection.send(("error", f"Unknown command: {command}"))
+                    continue
+                try:
+                    connection.send(("ok", handler(*args)))
+                except Exception as e:
+                    connection.send(("error", str(e)))
+
+
+# ============ WORKER ============
+
+class ChainClient:
+    """Connection from a worker to the chain owner (thread-safe, reconnects lazily)"""
+
+    def __init__(self, address: str, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def call(self, command: str, *args) -> Any:
+        """
+        Run a command on the owner
+
+        Raises:
+            ConnectionError: If the owner cannot be reached
+            RuntimeError: If the command failed on the owner
+        """
+        with self._lock:
+            try:
+                if self._connection is None:
+                    self._connection = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+                self._connection.send((command, args))
+                status, value = self._connection.recv()
+            except (OSError, EOFError, AuthenticationError) as e:
+                self._connection = None
+                raise ConnectionError(f"Chain owner unavailable: {e}")
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class RemotePool:
+    """Read-only view of the owner's pending transactions"""
+
+    def __init__(self, client: ChainClient):
+        self.client = client
+
+    def __len__(self) -> int:
+        return self.client.call("pending_count")
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.client.call("pending_transactions"))
+
+
+class RemoteProducer:
+    """Stand-in for the owner's BlockProducer, with the methods the HTTP layer uses"""
+
+    def __init__(self, client: ChainClient):
+        self.client = client
+
+    @property
+    def max_wait(self) -> float:
+        return self.client.call("max_wait")
+
+    def is_saturated(self) -> bool:
+        return self.client.call("is_saturated")
+
+    def queue_depth(self) -> int:
+        return self.client.call("queue_depth")
+
+    def record_rejection(self) -> None:
+        self.client.call("record_rejection")
+
+    def get_metrics(self) -> Dict:
+        return self.client.call("producer_metrics")
+
+
+class FollowerBlockchain(Blockchain):
+    """
+    Blockchain for HTTP workers: reads the owner's store, forwards writes
+
+    Confirmed state (balances, counters) is indexed locally from the
+    shared read-only BlockStore; catch_up() indexes blocks the owner has
+    appended since. With a shared SnapshotStore, history and proofs are
+    read from the owner's postings index, which may trail the store by
+    the block being appended. Transactions and mining requests are sent
+    to the owner, which holds the only mempool.
+    """
+
+    def __init__(self, store: BlockStore, client: ChainClient, snapshots=None,
+                 checkpoint_key: Optional[bytes] = None):
+        """
+        Initialize the follower
+
+        Args:
+            store: BlockStore opened with read_only=True on the owner's directory
+            client: Connection to the chain owner
+            snapshots: Optional SnapshotStore shared with the owner (read only)
+            checkpoint_key: The owner's checkpoint key, so its checkpoints verify
+        """
+        if len(store) == 0:
+            raise RuntimeError("The chain owner has not created the chain yet")
+        config = client.call("config")
+        self.client = client
+        super().__init__(difficulty=config["difficulty"], store=store, snapshots=snapshots,
+                         checkpoint_key=checkpoint_key,
+                         postings=snapshots.open_postings(read_only=True) if snapshots is not None else None)
+        self.mining_reward = config["mining_reward"]
+        self.pending_transactions = RemotePool(client)
+        self.indexed_height = len(self.chain)
+
+    def catch_up(self) -> int:
+        """
+        Index blocks the owner has appended since the last call
+
+        Returns:
+            The chain height
+        """
+        height = self.store.refresh()
+        if height > self.indexed_height:
+            with self._state_lock.write():
+                for index in range(self.indexed_height, height):
+                    self._index_block(self.chain[index])
+                self._index_postings(self.chain[index] for index in range(self.indexed_height, height))
+                self.tip = self.chain[height - 1]
+                self.indexed_height = height
+        return height
+
+    def append_block(self, block: Block) -> None:
+        raise RuntimeError("Workers do not append blocks; the chain owner does")
+
+    def add_transaction(self, transaction: Dict) -> bool:
+        return self.client.call("add_transaction", dict(transaction))
+
+    def is_pool_full(self) -> bool:
+        return self.client.call("is_pool_full")
+
+    def get_pending_balance(self, address: str) -> float:
+        return self.client.call("pending_balance", address)
+
+    def get_transaction_status(self, transaction_id: str) -> Optional[str]:
+        return self.client.call("transaction_status", transaction_id)
+
+    def mine_pending_transactions(self, miner_address: str,
+                                  max_transactions: Optional[int] = None) -> Block:
+        index, stats = self.client.call("mine", miner_address, max_transactions)
+        self.miner.last_stats = stats
+        self.catch_up()
+        return self.chain[index]
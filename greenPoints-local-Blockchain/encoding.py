@@ -0,0 +1,160 @@
+"""
+Canonical Binary Encoding for Green Points Blockchain
+Deterministic, msgpack-style bytes used for hashing and storing blocks
+"""
+
+import struct
+from collections.abc import Mapping
+from typing import Any, Tuple
+
+
+# One-byte type tags
+NONE = b"N"
+FALSE = b"F"
+TRUE = b"T"
+INT = b"i"     # zigzag LEB128 varint
+FLOAT = b"d"   # IEEE-754 big-endian double
+STR = b"s"     # varint length + UTF-8
+BYTES = b"b"   # varint length + raw bytes
+LIST = b"l"    # varint count + items
+MAP = b"m"     # varint count + (key, value) pairs sorted by key
+
+DOUBLE = struct.Struct(">d")
+
+
+def _varint(value: int) -> bytes:
+    """Encode a non-negative integer as LEB128"""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def canonical_encode(value: Any) -> bytes:
+    """
+    Encode a JSON-like value deterministically
+
+    Map keys must be strings and are written in sorted order, so equal
+    values always produce identical bytes. Objects with a canonical_bytes()
+    method (e.g. TransactionRecord) contribute their own encoding.
+
+    Args:
+        value: None, bool, int, float, str, bytes, list/tuple or mapping
+
+    Returns:
+        The encoded bytes
+    """
+    out = bytearray()
+    _encode(value, out)
+    return bytes(out)
+
+
+def _encode(value: Any, out: bytearray) -> None:
+    if value is None:
+        out += NONE
+    elif value is True:
+        out += TRUE
+    elif value is False:
+        out += FALSE
+    elif isinstance(value, int):
+        out += INT
+        out += _varint(value * 2 if value >= 0 else -value * 2 - 1)
+    elif isinstance(value, float):
+        out += FLOAT
+        out += DOUBLE.pack(value)
+    elif isinstance(value, str):
+        data = value.encode()
+        out += STR
+        out += _varint(len(data))
+        out += data
+    elif isinstance(value, (bytes, bytearray)):
+        out += BYTES
+        out += _varint(len(value))
+        out += value
+    elif hasattr(value, "canonical_bytes"):
+        out += value.canonical_bytes()
+    elif isinstance(value, (list, tuple)):
+        out += LIST
+        out += _varint(len(value))
+        for item in value:
+            _encode(item, out)
+    elif isinstance(value, Mapping):
+        out += MAP
+        out += _varint(len(value))
+        for key in sorted(value):
+            if not isinstance(key, str):
+                raise TypeError(f"Map keys must be strings, got {type(key).__name__}")
+            _encode(key, out)
+            _encode(value[key], out)
+    else:
+        raise TypeError(f"Cannot canonically encode {type(value).__name__}")
+
+
+def canonical_decode(data: bytes) -> Any:
+    """
+    Decode bytes produced by canonical_encode()
+
+    Args:
+        data: Encoded bytes
+
+    Returns:
+        The decoded value (maps become dicts, lists become lists)
+    """
+    value, position = _decode(memoryview(data), 0)
+    if position != len(data):
+        raise ValueError(f"Trailing data after position {position}")
+    return value
+
+
+def _read_varint(data: memoryview, position: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, position
+        shift += 7
+
+
+def _decode(data: memoryview, position: int) -> Tuple[Any, int]:
+    tag = bytes(data[position:position + 1])
+    position += 1
+
+    if tag == NONE:
+        return None, position
+    if tag == TRUE:
+        return True, position
+    if tag == FALSE:
+        return False, position
+    if tag == INT:
+        zigzag, position = _read_varint(data, position)
+        return (zigzag >> 1) if not zigzag & 1 else -((zigzag + 1) >> 1), position
+    if tag == FLOAT:
+        return DOUBLE.unpack_from(data, position)[0], position + DOUBLE.size
+    if tag in (STR, BYTES):
+        length, position = _read_varint(data, position)
+        raw = bytes(data[position:position + length])
+        return (raw.decode() if tag == STR else raw), position + length
+    if tag == LIST:
+        count, position = _read_varint(data, position)
+        items = []
+        for _ in range(count):
+            item, position = _decode(data, position)
+            items.append(item)
+        return items, position
+    if tag == MAP:
+        count, position = _read_varint(data, position)
+        result = {}
+        for _ in range(count):
+            key, position = _decode(data, position)
+            result[key], position = _decode(data, position)
+        return result, position
+
+    raise ValueError(f"Unknown type tag {tag!r} at position {position - 1}")
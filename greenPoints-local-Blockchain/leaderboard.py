@@ -0,0 +1,225 @@
+"""
+Ranked Leaderboard for Green Points Blockchain
+Order-statistics skip list giving logarithmic rank, top-K and neighbourhood queries
+"""
+
+import random
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+
+MAX_LEVEL = 24  # enough for ~16M members at p = 1/2
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.next: List[Optional["_Node"]] = [None] * level
+        self.width = [1] * level  # positions skipped by each forward link
+
+
+class RankedSet:
+    """
+    Sorted set of unique keys with positional access (indexable skip list)
+
+    Insert, remove, rank() and the element at a position all take
+    O(log n) expected time; iterating k elements from a position adds O(k).
+    A link that runs off the end counts the distance to one past the
+    last element, so widths stay consistent without a tail node.
+    """
+
+    def __init__(self):
+        self._head = _Node(None, MAX_LEVEL)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _predecessors(self, key) -> Tuple[List[_Node], List[int]]:
+        """Last node before key on every level, and the position of each"""
+        chain = [self._head] * MAX_LEVEL
+        positions = [0] * MAX_LEVEL
+        node = self._head
+        position = 0
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+
+    def add(self, key) -> None:
+        """Insert a key (which must not already be present)"""
+        chain, positions = self._predecessors(key)
+        level_count = 1
+        while level_count < MAX_LEVEL and random.random() < 0.5:
+            level_count += 1
+
+        node = _Node(key, level_count)
+        position = positions[0] + 1  # position of the new node (head is 0)
+        for level in range(level_count):
+            prev = chain[level]
+            node.next[level] = prev.next[level]
+            prev.next[level] = node
+            node.width[level] = prev.width[level] - (position - positions[level]) + 1
+            prev.width[level] = position - positions[level]
+        for level in range(level_count, MAX_LEVEL):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key) -> None:
+        """Remove a key, raising KeyError if it is not present"""
+        chain, _ = self._predecessors(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for level in range(len(node.next)):
+            prev = chain[level]
+            prev.width[level] += node.width[level] - 1
+            prev.next[level] = node.next[level]
+        for level in range(len(node.next), MAX_LEVEL):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def rank(self, key) -> int:
+        """0-based position of a key, raising KeyError if it is not present"""
+        chain, positions = self._predecessors(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        return positions[0]
+
+    def iter_from(self, index: int) -> Iterator:
+        """Iterate keys in order starting at a 0-based position"""
+        if index >= self._size:
+            return
+        node = self._head
+        remaining = max(index, 0) + 1
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("RankedSet index out of range")
+        return next(self.iter_from(index))
+
+    def __iter__(self) -> Iterator:
+        return self.iter_from(0)
+
+
+class Leaderboard:
+    """
+    Members ranked by score (highest first), overall and within groups
+
+    Ties are broken by member id so ranks are stable. Every query is
+    logarithmic in the number of members plus the number of entries
+    returned, and update() moves a single member.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[float, Optional[str]]] = {}  # member -> (score, group)
+        self._all = RankedSet()
+        self._groups: Dict[str, RankedSet] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, member: Hashable) -> bool:
+        return member in self._entries
+
+    def _ranking(self, group: Optional[str]) -> RankedSet:
+        if group is None:
+            return self._all
+        return self._groups.get(group) or RankedSet()
+
+    def score(self, member: Hashable) -> Optional[float]:
+        entry = self._entries.get(member)
+        return entry[0] if entry else None
+
+    def update(self, member: Hashable, score: float, group: Optional[str] = None) -> None:
+        """
+        Set a member's score, inserting the member if needed
+
+        Args:
+            member: Member id (must be orderable against other ids)
+            score: New score
+            group: Optional group the member is also ranked in
+        """
+        old = self._entries.get(member)
+        if old == (score, group):
+            return
+        if old is not None:
+            self.remove(member)
+        key = (-score, member)
+        self._all.add(key)
+        if group is not None:
+            self._groups.setdefault(group, RankedSet()).add(key)
+        self._entries[member] = (score, group)
+
+    def remove(self, member: Hashable) -> None:
+        """Remove a member if present"""
+        entry = self._entries.pop(member, None)
+        if entry is None:
+            return
+        score, group = entry
+        key = (-score, member)
+        self._all.remove(key)
+        if group is not None:
+            self._groups[group].remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._all = RankedSet()
+        self._groups.clear()
+
+    def rank(self, member: Hashable, group: Optional[str] = None) -> Optional[int]:
+        """
+        1-based rank of a member, overall or within a group
+
+        Returns:
+            The rank, or None if the member is not ranked there
+        """
+        entry = self._entries.get(member)
+        if entry is None or (group is not None and entry[1] != group):
+            return None
+        return self._ranking(group).rank((-entry[0], member)) + 1
+
+    def top(self, limit: int, group: Optional[str] = None) -> List[Tuple[int, Any, float]]:
+        """
+        Highest-ranked members
+
+        Returns:
+            (rank, member, score) tuples, best first
+        """
+        return self._slice(0, limit, group)
+
+    def around(self, member: Hashable, radius: int = 5,
+               group: Optional[str] = None) -> List[Tuple[int, Any, float]]:
+        """
+        A member and up to `radius` neighbours on each side
+
+        Returns:
+            (rank, member, score) tuples, or [] if the member is not ranked there
+        """
+        rank = self.rank(member, group)
+        if rank is None:
+            return []
+        start = max(rank - 1 - radius, 0)
+        return self._slice(start, rank + radius - start, group)
+
+    def _slice(self, start: int, count: int, group: Optional[str]) -> List[Tuple[int, Any, float]]:
+        result = []
+        for offset, (negative_score, member) in enumerate(self._ranking(group).iter_from(start)):
+            if offset >= count:
+                break
+            result.append((start + offset + 1, member, -negative_score))
+        return result
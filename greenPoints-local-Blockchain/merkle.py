@@ -0,0 +1,138 @@
+"""
+Merkle Tree Helpers for Green Points Blockchain
+Commits a block header to its transaction list with a single fixed-size root
+
+Leaves are SHA-256 digests of the transactions' canonical encoding
+(encoding.py). Leaf hashes are prefixed with 0x00 and interior hashes with
+0x01, so an interior node can never be passed off as a leaf. Trees where
+two sibling nodes are equal are flagged as mutated: padding an odd level by
+repeating its last node means a block with its final transaction(s)
+duplicated has the same root as the original (CVE-2012-2459).
+"""
+
+import hashlib
+from typing import Dict, List, Tuple
+
+from encoding import canonical_encode
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def hash_transaction(transaction: Dict) -> bytes:
+    """Hash a transaction (dict or TransactionRecord) into a Merkle leaf"""
+    digest = hashlib.sha256(canonical_encode(transaction)).digest()
+    return hashlib.sha256(LEAF_PREFIX + digest).digest()
+
+
+def hash_pair(left: bytes, right: bytes) -> bytes:
+    """Hash two child nodes into their parent"""
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def _parent_level(level: List[bytes]) -> Tuple[List[bytes], bool]:
+    """Hash a level into the one above it; also report whether two siblings are equal"""
+    mutated = any(level[i] == level[i + 1] for i in range(0, len(level) - 1, 2))
+    if len(level) % 2:
+        level = level + [level[-1]]
+    return [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)], mutated
+
+
+class MerkleTree:
+    """
+    Merkle tree over a block's transactions
+
+    Odd levels are padded by pairing the last node with itself. All levels
+    are kept so inclusion proofs can be produced without rehashing; use
+    compute_merkle_root() when only the root is needed.
+    """
+
+    def __init__(self, transactions: List[Dict]):
+        """
+        Build the tree
+
+        Args:
+            transactions: Transactions in block order
+        """
+        self.mutated = False  # two siblings are equal: duplicated transactions
+        self.levels: List[List[bytes]] = [[hash_transaction(tx) for tx in transactions]]
+        while len(self.levels[-1]) > 1:
+            level, mutated = _parent_level(self.levels[-1])
+            self.mutated = self.mutated or mutated
+            self.levels.append(level)
+
+    @property
+    def root(self) -> str:
+        """Hex-encoded root hash (the hash of empty input for an empty block)"""
+        if not self.levels[0]:
+            return hashlib.sha256(b"").hexdigest()
+        return self.levels[-1][0].hex()
+
+    def get_proof(self, index: int) -> List[Dict]:
+        """
+        Get the inclusion proof for the transaction at a position
+
+        Args:
+            index: Position of the transaction in the block
+
+        Returns:
+            Sibling hashes from leaf to root, each with the side it sits on
+        """
+        if not 0 <= index < len(self.levels[0]):
+            raise IndexError(f"No transaction at position {index}")
+
+        proof = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            sibling_hash = level[sibling] if sibling < len(level) else level[index]
+            proof.append({
+                "position": "left" if sibling < index else "right",
+                "hash": sibling_hash.hex()
+            })
+            index //= 2
+        return proof
+
+
+def compute_merkle_root(transactions: List[Dict]) -> Tuple[str, bool]:
+    """
+    Compute the Merkle root of a list of transactions
+
+    Only one level is held at a time, so no more than the leaves are
+    ever resident.
+
+    Args:
+        transactions: Transactions in block order
+
+    Returns:
+        (hex-encoded root hash, whether the tree is mutated; see MerkleTree)
+    """
+    level = [hash_transaction(tx) for tx in transactions]
+    if not level:
+        return hashlib.sha256(b"").hexdigest(), False
+    mutated = False
+    while len(level) > 1:
+        level, level_mutated = _parent_level(level)
+        mutated = mutated or level_mutated
+    return level[0].hex(), mutated
+
+
+def verify_proof(transaction: Dict, proof: List[Dict], merkle_root: str) -> bool:
+    """
+    Check that a transaction is included under a Merkle root
+
+    Args:
+        transaction: The transaction as stored in the block
+        proof: Output of MerkleTree.get_proof()
+        merkle_root: Root from the block header
+
+    Returns:
+        True if the proof leads from the transaction to the root
+    """
+    node = hash_transaction(transaction)
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"])
+        if step["position"] == "left":
+            node = hash_pair(sibling, node)
+        else:
+            node = hash_pair(node, sibling)
+    return node.hex() == merkle_root
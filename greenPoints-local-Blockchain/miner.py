@@ -0,0 +1,166 @@
+"""
+Proof-of-Work Mining Engine for Green Points Blockchain
+Searches the nonce space for a block across several worker processes
+"""
+
+import hashlib
+import multiprocessing
+import os
+import queue
+import time
+from typing import Dict, Optional, Tuple
+
+
+# Nonces each worker tries between checks of the shared stop flag
+CHECK_INTERVAL = 4096
+
+# Seconds to wait for a worker result before checking the workers are alive
+RESULT_TIMEOUT = 0.5
+
+
+def search_nonces(header_prefix: bytes, difficulty: int, start: int, step: int,
+                  stop=None, limit: Optional[int] = None) -> Tuple[Optional[int], Optional[str], int]:
+    """
+    Search nonces start, start + step, start + 2*step, ... for a valid hash
+
+    The header prefix is hashed once and the running SHA-256 state is
+    copied for each nonce, so only the nonce digits are hashed per attempt.
+
+    Args:
+        header_prefix: Serialized block header without the nonce
+        difficulty: Number of leading zeros required in the hash
+        start: First nonce to try
+        step: Distance between nonces tried by this worker
+        stop: Optional multiprocessing.Event; the search ends once it is set
+        limit: Optional maximum number of nonces to try
+
+    Returns:
+        (nonce, hash, hashes_tried); nonce and hash are None if not found
+    """
+    target = "0" * difficulty
+    base = hashlib.sha256(header_prefix)
+    nonce = start
+    hashes = 0
+
+    while limit is None or hashes < limit:
+        if stop is not None and stop.is_set():
+            break
+        for _ in range(CHECK_INTERVAL):
+            candidate = base.copy()
+            candidate.update(str(nonce).encode())
+            digest = candidate.hexdigest()
+            hashes += 1
+            if digest.startswith(target):
+                return nonce, digest, hashes
+            nonce += step
+
+    return None, None, hashes
+
+
+def _worker(header_prefix: bytes, difficulty: int, start: int, step: int, stop, results) -> None:
+    """Worker process entry point: report a found nonce or the work done"""
+    nonce, digest, hashes = search_nonces(header_prefix, difficulty, start, step, stop)
+    if nonce is not None:
+        stop.set()
+    results.put((nonce, digest, hashes))
+
+
+class ProofOfWorkMiner:
+    """Mines blocks, in parallel across processes for higher difficulties"""
+
+    def __init__(self, workers: Optional[int] = None, parallel_difficulty: int = 5):
+        """
+        Initialize the miner
+
+        Args:
+            workers: Number of worker processes (default: CPU count)
+            parallel_difficulty: Lowest difficulty worth the cost of
+                                 starting worker processes; easier blocks
+                                 are mined in the calling process
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.parallel_difficulty = parallel_difficulty
+        self.last_stats: Optional[Dict] = None
+
+    def mine(self, block, difficulty: int) -> Dict:
+        """
+        Find a nonce for a block and store it with the resulting hash
+
+        Args:
+            block: Block to mine (its nonce and hash are updated in place)
+            difficulty: Number of leading zeros required in the hash
+
+        Returns:
+            Mining statistics (nonce, hashes, elapsed seconds, hashrate, workers)
+        """
+        started = time.time()
+        header_prefix = block.header_prefix()
+
+        if self.workers > 1 and difficulty >= self.parallel_difficulty:
+            workers = self.workers
+            nonce, digest, hashes = self._mine_parallel(header_prefix, difficulty)
+        else:
+            workers = 1
+            nonce, digest, hashes = search_nonces(header_prefix, difficulty, 0, 1)
+
+        block.nonce = nonce
+        block.hash = digest
+
+        elapsed = time.time() - started
+        self.last_stats = {
+            "nonce": nonce,
+            "hashes": hashes,
+            "elapsed": elapsed,
+            "hashrate": hashes / elapsed if elapsed > 0 else float(hashes),
+            "workers": workers
+        }
+        return self.last_stats
+
+    def _mine_parallel(self, header_prefix: bytes, difficulty: int) -> Tuple[int, str, int]:
+        """
+        Split the nonce space across worker processes by stride
+
+        If every worker exits without finding a nonce (e.g. one was
+        killed), the search is finished in the calling process.
+        """
+        stop = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=_worker,
+                args=(header_prefix, difficulty, i, self.workers, stop, results),
+                daemon=True
+            )
+            for i in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+
+        found = None
+        total_hashes = 0
+        missing = len(processes)
+        exited = False
+        while missing:
+            try:
+                nonce, digest, hashes = results.get(timeout=RESULT_TIMEOUT)
+            except queue.Empty:
+                if exited:
+                    break  # results of workers that crashed will never arrive
+                # one more wait drains results sent just before the workers exited
+                exited = not any(process.is_alive() for process in processes)
+                continue
+            missing -= 1
+            total_hashes += hashes
+            if nonce is not None and found is None:
+                found = (nonce, digest)
+                stop.set()
+
+        stop.set()
+        for process in processes:
+            process.join()
+
+        if found is None:
+            print(f"⚠️ {missing} mining worker(s) exited without a result; mining in this process")
+            nonce, digest, hashes = search_nonces(header_prefix, difficulty, 0, 1)
+            return nonce, digest, total_hashes + hashes
+        return found[0], found[1], total_hashes
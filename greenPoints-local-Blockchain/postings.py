@@ -0,0 +1,185 @@
+"""
+Transaction Postings Index for Green Points Blockchain
+Finds an address's confirmed transactions on disk instead of in memory
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+Posting = Tuple[int, int]  # (block_index, tx_offset)
+
+# One entry per transaction in a block: (location key or None, sender, recipient)
+BlockPostings = Tuple[int, str, List[Tuple[Optional[str], str, str]]]  # (block_index, block_hash, entries)
+
+SCHEMA = [
+    # seq numbers each address's postings in chain order, so any page of
+    # its history is a primary-key range
+    """CREATE TABLE IF NOT EXISTS postings (
+        address TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        block_index INTEGER NOT NULL,
+        tx_offset INTEGER NOT NULL,
+        PRIMARY KEY (address, seq)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS locations (
+        key TEXT PRIMARY KEY,
+        block_index INTEGER NOT NULL,
+        tx_offset INTEGER NOT NULL
+    ) WITHOUT ROWID""",
+    # Hash of every indexed block, to check the index against the chain
+    """CREATE TABLE IF NOT EXISTS blocks (
+        block_index INTEGER PRIMARY KEY,
+        hash TEXT NOT NULL
+    )"""
+]
+
+
+class PostingsIndex:
+    """
+    SQLite index of where each address's transactions sit in the chain
+
+    Replaces per-address posting lists held in memory: pages, counts and
+    location lookups are read from disk when asked for, so memory and
+    startup time do not grow with the number of transactions. Keyed
+    transactions (see Blockchain._location_key) are also located by key
+    for replay checks and inclusion proofs.
+
+    The index is derived from the chain and records the hash of each block
+    it covers, so it can be checked against the chain on startup and cut
+    back to where the two agree. Commits are therefore not fsynced
+    (WAL with synchronous=NORMAL); blocks lost in a crash are re-indexed.
+    All access goes through one connection guarded by a lock.
+    """
+
+    def __init__(self, path: str = ":memory:", read_only: bool = False):
+        """
+        Open (or create) an index
+
+        Args:
+            path: SQLite file, or ":memory:" for an index that is not kept
+            read_only: Open an index written by another process (e.g. a
+                       worker reading the chain owner's index)
+        """
+        self.path = path
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._next_seq: Dict[str, int] = {}  # address -> seq of its next posting (cache)
+
+        if read_only:
+            self._conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True,
+                                         check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+
+    @property
+    def height(self) -> int:
+        """Number of blocks covered by the index"""
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(block_index) FROM blocks").fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def block_hash(self, block_index: int) -> Optional[str]:
+        """Hash recorded for an indexed block, or None if it is not indexed"""
+        with self._lock:
+            row = self._conn.execute("SELECT hash FROM blocks WHERE block_index = ?",
+                                     (block_index,)).fetchone()
+        return row[0] if row else None
+
+    def add_blocks(self, blocks: Iterable[BlockPostings]) -> None:
+        """
+        Index blocks in one transaction
+
+        Args:
+            blocks: (block_index, block_hash, entries) in chain order, where
+                    entries holds (key, sender, recipient) per transaction
+        """
+        with self._lock:
+            try:
+                self._add_blocks(blocks)
+            except Exception:
+                self._next_seq.clear()  # seqs taken by the rolled-back transaction
+                raise
+
+    def _add_blocks(self, blocks: Iterable[BlockPostings]) -> None:
+        with self._conn:
+            for block_index, block_hash, entries in blocks:
+                postings = []
+                locations = []
+                for offset, (key, sender, recipient) in enumerate(entries):
+                    postings.append((sender, self._take_seq(sender), block_index, offset))
+                    if recipient != sender:
+                        postings.append((recipient, self._take_seq(recipient), block_index, offset))
+                    if key is not None:
+                        locations.append((key, block_index, offset))
+                self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", postings)
+                self._conn.executemany("INSERT OR REPLACE INTO locations VALUES (?, ?, ?)", locations)
+                self._conn.execute("INSERT OR REPLACE INTO blocks VALUES (?, ?)", (block_index, block_hash))
+
+    def _take_seq(self, address: str) -> int:
+        seq = self._next_seq.get(address)
+        if seq is None:
+            seq = self._count(address)
+        self._next_seq[address] = seq + 1
+        return seq
+
+    def truncate(self, height: int) -> None:
+        """
+        Drop the postings of blocks at or above a height
+
+        Scans the whole index; it is only needed on startup, when the
+        index is ahead of (or has diverged from) the chain.
+
+        Args:
+            height: Number of blocks to keep (0 empties the index)
+        """
+        with self._lock:
+            with self._conn:
+                for table in ("postings", "locations", "blocks"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE block_index >= ?", (height,))
+            self._next_seq.clear()
+
+    def count(self, address: str) -> int:
+        """Number of confirmed transactions involving an address"""
+        with self._lock:
+            return self._count(address)
+
+    def _count(self, address: str) -> int:
+        row = self._conn.execute("SELECT MAX(seq) FROM postings WHERE address = ?", (address,)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def page(self, address: str, start: int = 0, end: Optional[int] = None) -> List[Posting]:
+        """
+        Get an address's postings at positions [start, end), oldest first
+
+        Args:
+            address: The address
+            start: Position of the first posting
+            end: Position after the last posting (default: all remaining)
+        """
+        query = "SELECT block_index, tx_offset FROM postings WHERE address = ? AND seq >= ?"
+        params: Tuple = (address, start)
+        if end is not None:
+            query += " AND seq < ?"
+            params += (end,)
+        with self._lock:
+            return [tuple(row) for row in self._conn.execute(query + " ORDER BY seq", params)]
+
+    def locate(self, key: str) -> Optional[Posting]:
+        """Get the (block_index, tx_offset) of a keyed transaction, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT block_index, tx_offset FROM locations WHERE key = ?",
+                                     (key,)).fetchone()
+        return tuple(row) if row else None
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
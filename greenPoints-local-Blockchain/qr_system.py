@@ -3,10 +3,17 @@ QR Code System for Business Rewards
 Businesses generate QR codes, users scan to earn GP
 """
 
-import hashlib
+import secrets
+import sqlite3
+import threading
 import time
-import json
-from typing import Optional, Dict, Tuple, List
+from collections import OrderedDict
+from typing import Optional, Dict, Iterator, Tuple, List
+
+from transaction import Transaction
+
+
+MAX_BATCH_QR_CODES = 100000  # per request; larger print runs can be split
 
 
 class QRCodeGenerator:
@@ -26,13 +33,9 @@ class QRCodeGenerator:
         Returns:
             Unique QR code string
         """
-        timestamp = time.time()
-        data = f"{business_id}_{reward_amount}_{service_description}_{timestamp}"
-        hash_value = hashlib.sha256(data.encode()).hexdigest()
-        
-        # Create a readable QR code format
-        qr_code = f"GP-{business_id:04d}-{hash_value[:12].upper()}"
-        return qr_code
+        # 48 random bits from the OS CSPRNG: unguessable, and unique without
+        # relying on distinct timestamps (the database enforces uniqueness)
+        return f"GP-{business_id:04d}-{secrets.token_hex(6).upper()}"
     
     @staticmethod
     def generate_batch_qr_codes(business_id: int, reward_amount: float,
@@ -47,28 +50,78 @@ class QRCodeGenerator:
             service_description: Service description
         
         Returns:
-            List of QR codes
+            List of distinct QR codes
         """
-        qr_codes = []
-        for i in range(count):
-            # Add slight delay to ensure unique timestamps
-            time.sleep(0.001)
-            qr_code = QRCodeGenerator.generate_qr_code(
-                business_id, 
-                reward_amount, 
-                f"{service_description}_batch_{i}"
-            )
-            qr_codes.append(qr_code)
-        
-        return qr_codes
+        qr_codes = set()
+        while len(qr_codes) < count:
+            qr_codes.add(QRCodeGenerator.generate_qr_code(business_id, reward_amount, service_description))
+        return list(qr_codes)
+
+
+class RecentCodeCache:
+    """
+    Short-lived memory of QR codes that cannot be redeemed
+    
+    Holds codes recently redeemed here or found used, expired or unknown,
+    with the message to answer a repeat scan with, so replays are
+    rejected without touching the database. Entries expire after ttl
+    seconds, so a cached answer is never stale for long even when other
+    processes share the database; the least recently seen codes are
+    dropped beyond max_entries.
+    """
+    
+    def __init__(self, max_entries: int = 100000, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # code -> (message, expires)
+        self._lock = threading.Lock()
+    
+    def get(self, qr_code: str) -> Optional[str]:
+        """Cached rejection message for a code, if any"""
+        with self._lock:
+            entry = self._entries.get(qr_code)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._entries[qr_code]
+                return None
+            self._entries.move_to_end(qr_code)
+            return entry[0]
+    
+    def put(self, qr_code: str, message: str) -> None:
+        with self._lock:
+            self._entries[qr_code] = (message, time.monotonic() + self.ttl)
+            self._entries.move_to_end(qr_code)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def discard(self, qr_code: str) -> None:
+        with self._lock:
+            self._entries.pop(qr_code, None)
 
 
 class QRCodeManager:
     """Manages QR code operations"""
     
-    def __init__(self, database, blockchain):
+    def __init__(self, database, blockchain, cache: Optional[RecentCodeCache] = None):
         self.db = database
         self.blockchain = blockchain
+        self.cache = cache or RecentCodeCache()
+        self._metrics_lock = threading.Lock()  # scans run on many request threads
+        self.metrics = {
+            "scans": 0,
+            "redeemed": 0,
+            "rejected": 0,
+            "cache_hits": 0,
+            "released": 0,
+            "unconfirmed": 0
+        }
+    
+    def _count(self, *names: str) -> None:
+        """Increment scan metrics"""
+        with self._metrics_lock:
+            for name in names:
+                self.metrics[name] += 1
     
     def create_qr_code(self, business_id: int, reward_amount: float,
                       service_description: str = "",
@@ -119,25 +172,82 @@ class QRCodeManager:
         if not business or business['role'] != 'business':
             return False, "Invalid business", []
         
+        if reward_amount <= 0:
+            return False, "Reward amount must be positive", []
+        
+        if not 0 < count <= MAX_BATCH_QR_CODES:
+            return False, f"Count must be between 1 and {MAX_BATCH_QR_CODES}", []
+        
         qr_codes = []
-        for i in range(count):
-            success, message, qr_code = self.create_qr_code(
-                business_id, reward_amount, 
-                f"{service_description} (#{i+1})", 
-                expires_in_hours
-            )
-            if success:
-                qr_codes.append(qr_code)
+        for chunk in self.iter_batch_qr_codes(business, reward_amount, count,
+                                              service_description, expires_in_hours):
+            qr_codes.extend(chunk)
         
         return True, f"Generated {len(qr_codes)} QR codes", qr_codes
     
+    def iter_batch_qr_codes(self, business: Dict, reward_amount: float, count: int,
+                            service_description: str = "",
+                            expires_in_hours: Optional[int] = None,
+                            chunk_size: int = 1000) -> Iterator[List[str]]:
+        """
+        Create QR codes in bulk, yielding each chunk once it is committed
+        
+        Codes come from the CSPRNG and each chunk is inserted with a single
+        executemany transaction. If a code collides with an existing one the
+        chunk is rolled back and regenerated.
+        
+        Args:
+            business: Validated business row
+            reward_amount: GP amount per code
+            count: Number of codes to create
+            service_description: Description; codes are numbered "(#1)", "(#2)", ...
+            expires_in_hours: Optional lifetime of the codes
+            chunk_size: Codes per transaction
+        
+        Yields:
+            Lists of saved QR codes
+        """
+        expires_at = time.time() + expires_in_hours * 3600 if expires_in_hours else None
+        
+        for start in range(0, count, chunk_size):
+            size = min(chunk_size, count - start)
+            for attempt in range(3):
+                qr_codes = QRCodeGenerator.generate_batch_qr_codes(business['id'], reward_amount, size)
+                try:
+                    self.db.create_qr_codes(
+                        business['id'], business['name'], reward_amount, qr_codes,
+                        [f"{service_description} (#{start + i + 1})" for i in range(size)],
+                        expires_at
+                    )
+                    break
+                except sqlite3.IntegrityError:
+                    if attempt == 2:
+                        raise
+            yield qr_codes
+    
     def scan_qr_code(self, qr_code: str, user_id: int) -> Tuple[bool, str, Optional[Dict]]:
         """
         Process a QR code scan by a user
         
+        The code is claimed with one conditional UPDATE before the reward
+        transaction is submitted, so concurrent scans of the same code
+        redeem it exactly once. The claim is released only when the
+        transaction is definitely rejected (it fails validation, or the
+        chain returns False). If submitting it raises (e.g. a worker's
+        request to the chain owner times out after the owner accepted it)
+        the outcome is unknown: the claim is kept and recorded for
+        reconcile_claims(). Repeat scans of codes that cannot be redeemed
+        are answered from the recent-code cache.
+        
         Returns:
             (success, message, transaction_data)
         """
+        self._count("scans")
+        cached = self.cache.get(qr_code)
+        if cached is not None:
+            self._count("cache_hits", "rejected")
+            return False, cached, None
+        
         # Validate user
         user = self.db.get_user_by_id(user_id)
         if not user:
@@ -146,41 +256,94 @@ class QRCodeManager:
         if user['role'] != 'user':
             return False, "Only users can scan QR codes", None
         
-        # Validate QR code
-        is_valid, message, qr_data = self.db.validate_qr_code(qr_code)
-        if not is_valid:
+        # Claim the code; the reward transaction gets the ID recorded on it
+        transaction_id = secrets.token_hex(8)
+        qr_data = self.db.claim_qr_code(qr_code, user_id, transaction_id)
+        if qr_data is None:
+            # Lost the race or the code is not redeemable; look up why
+            is_valid, message, _ = self.db.validate_qr_code(qr_code)
+            if is_valid:
+                return False, "QR code is being redeemed, please retry", None
+            self.cache.put(qr_code, message)
+            self._count("rejected")
             return False, message, None
         
-        # Create blockchain transaction
-        from transaction import Transaction
-        
-        # Get business wallet
-        business = self.db.get_user_by_id(qr_data['business_id'])
+        try:
+            tx = Transaction(
+                sender="SYSTEM",  # Business rewards come from system
+                recipient=user['wallet_address'],
+                amount=qr_data['reward_amount'],
+                transaction_type="qr_reward",
+                task_id=qr_code,
+                task_name=f"Business Visit: {qr_data['business_name']}"
+            )
+            tx.transaction_id = transaction_id
+        except (TypeError, ValueError) as e:
+            print(f"Reward transaction for QR code {qr_code} is invalid: {e}")
+            self.db.release_qr_code(qr_code, transaction_id)
+            self._count("released")
+            return False, "Failed to process transaction", None
         
-        tx = Transaction(
-            sender="SYSTEM",  # Business rewards come from system
-            recipient=user['wallet_address'],
-            amount=qr_data['reward_amount'],
-            transaction_type="qr_reward",
-            task_id=qr_code,
-            task_name=f"Business Visit: {qr_data['business_name']}"
-        )
+        try:
+            added = self.blockchain.add_transaction(tx.to_dict())
+        except Exception as e:
+            # The chain may have accepted it anyway; reconcile_claims() finds out
+            print(f"Reward transaction {transaction_id} for QR code {qr_code} has an unknown outcome: {e}")
+            self.db.mark_claim_unconfirmed(qr_code, transaction_id)
+            self._count("unconfirmed")
+            return False, "Your reward is being confirmed; check your balance shortly", None
         
-        # Add transaction to blockchain
-        if self.blockchain.add_transaction(tx.to_dict()):
-            # Mark QR code as used
-            self.db.use_qr_code(qr_code, user_id, tx.transaction_id)
+        if added:
+            self.cache.put(qr_code, f"QR code already used on {time.strftime('%Y-%m-%d %H:%M')}")
+            self._count("redeemed")
             
             return True, f"Earned {qr_data['reward_amount']} GP from {qr_data['business_name']}!", {
-                "transaction_id": tx.transaction_id,
+                "transaction_id": transaction_id,
                 "amount": qr_data['reward_amount'],
                 "business_name": qr_data['business_name'],
                 "service": qr_data['service_description'],
                 "timestamp": time.time()
             }
+        
+        # Give the code back so the user can retry
+        self.db.release_qr_code(qr_code, transaction_id)
+        self._count("released")
+        if self.blockchain.is_pool_full():
+            return False, "Transaction pool is full, please retry", None
         else:
             return False, "Failed to process transaction", None
     
+    def reconcile_claims(self, grace_seconds: float = 60.0) -> Dict[str, int]:
+        """
+        Settle claims whose reward transaction had an unknown outcome
+        
+        Claims whose transaction is confirmed are kept. Claims whose
+        transaction the chain has no record of, grace_seconds after the
+        scan, are released so the code can be redeemed again; younger
+        ones (and pending transactions) are left for a later run.
+        
+        Args:
+            grace_seconds: Time a submission may still be in flight
+        
+        Returns:
+            Counts of claims kept, released and still unresolved
+        """
+        summary = {"kept": 0, "released": 0, "unresolved": 0}
+        cutoff = time.time() - grace_seconds
+        for claim in self.db.get_unconfirmed_claims():
+            status = self.blockchain.get_transaction_status(claim["transaction_id"])
+            if status == "confirmed":
+                self.db.resolve_unconfirmed_claim(claim["qr_code"], claim["transaction_id"], release=False)
+                summary["kept"] += 1
+            elif status is None and claim["claimed_at"] < cutoff:
+                self.db.resolve_unconfirmed_claim(claim["qr_code"], claim["transaction_id"], release=True)
+                self.cache.discard(claim["qr_code"])
+                self._count("released")
+                summary["released"] += 1
+            else:
+                summary["unresolved"] += 1
+        return summary
+    
     def get_qr_code_info(self, qr_code: str) -> Dict:
         """
         Get QR code information (for display before scanning)
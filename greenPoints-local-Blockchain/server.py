@@ -3,21 +3,117 @@ Flask REST API Server for Green Points Blockchain System
 Provides HTTP endpoints for frontend integration
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from blockchain import Blockchain
+from block_store import BlockStore, StoreLockedError
+from block_producer import BlockProducer
+from snapshot import SnapshotStore
+from miner import ProofOfWorkMiner
 from database import Database
 from api import GreenPointsAPI
+from deployment import (
+    ROLE_OWNER, ROLE_STANDALONE, ROLE_WORKER, ChainClient, ChainOwner,
+    FollowerBlockchain, RemoteProducer, load_authkey, load_checkpoint_key, owner_address
+)
+import json
 import os
 
 app = Flask(__name__)
 CORS(app)  # Allow requests from your frontend (React Native/React/etc.)
 
-# Initialize blockchain system
-blockchain = Blockchain(difficulty=2)
-db = Database("greenpoints.db")
+# Deployment role (see deployment.py):
+#   standalone - this process serves HTTP and owns the chain (default)
+#   owner      - as standalone, and also accepts writes forwarded by workers
+#   worker     - serves HTTP from the owner's chain files and forwards writes,
+#                e.g. GREENPOINTS_ROLE=worker gunicorn -w 4 server:app
+ROLE = os.environ.get("GREENPOINTS_ROLE", ROLE_STANDALONE)
+CHAIN_DIR = "chain_data"
+snapshots = SnapshotStore(os.path.join(CHAIN_DIR, "snapshots"), interval=1000)
+db = Database("greenpoints.db", group_commit_ms=2)  # concurrent writes share one fsynced commit (synchronous=FULL)
+
+if ROLE == ROLE_WORKER:
+    # Confirmed state is read from the owner's block store; transactions
+    # and block production stay with the owner
+    client = ChainClient(owner_address(CHAIN_DIR), load_authkey(CHAIN_DIR))
+    blockchain = FollowerBlockchain(
+        BlockStore(CHAIN_DIR, read_only=True), client, snapshots=snapshots,
+        checkpoint_key=load_checkpoint_key(CHAIN_DIR)
+    )
+    producer = RemoteProducer(client)
+else:
+    # Initialize blockchain system (chain is persisted under chain_data/ and reloaded on
+    # restart from the latest state snapshot plus the blocks appended after it).
+    # Checkpoints are signed with a key kept next to the chain so they survive restarts.
+    # Opening the store takes its writer lock, so a second standalone or owner
+    # process (e.g. gunicorn -w 4 without GREENPOINTS_ROLE) fails here
+    try:
+        store = BlockStore(CHAIN_DIR)
+    except StoreLockedError as e:
+        raise SystemExit(
+            f"{e}. Only one process may own the chain: run one GREENPOINTS_ROLE=owner "
+            "process and serve HTTP from GREENPOINTS_ROLE=worker processes"
+        ) from None
+    blockchain = Blockchain(
+        difficulty=2, store=store, miner=ProofOfWorkMiner(), snapshots=snapshots,
+        checkpoint_key=load_checkpoint_key(CHAIN_DIR, create=True)
+    )
+
+    def on_block(block):
+        """Refresh the leaderboard, then settle QR claims whose reward had an unknown outcome"""
+        db.apply_block_to_leaderboard(blockchain, block)
+        api.qr_manager.reconcile_claims()
+
+    # Seal pending rewards into blocks every 100 transactions or 500 ms
+    producer = BlockProducer(
+        blockchain, max_batch=100, max_wait_ms=500, max_pending=10000, on_block=on_block
+    )
+
 api = GreenPointsAPI(blockchain, db)
 
+if ROLE != ROLE_WORKER:
+    producer.start()
+
+    if ROLE == ROLE_OWNER:
+        owner = ChainOwner(blockchain, producer, owner_address(CHAIN_DIR), load_authkey(CHAIN_DIR, create=True))
+        owner.start()
+
+
+if ROLE == ROLE_WORKER:
+    @app.before_request
+    def follow_chain():
+        """Index blocks the owner has sealed since the last request"""
+        blockchain.catch_up()
+else:
+    @app.before_request
+    def check_chain_owner():
+        """Refuse to serve from processes forked after the chain was opened (gunicorn --preload -w N)"""
+        try:
+            store.check_writer()
+        except StoreLockedError as e:
+            return jsonify({
+                "success": False,
+                "message": f"{e}; serve multiple processes with GREENPOINTS_ROLE=worker"
+            }), 500
+
+
+@app.teardown_request
+def release_db_connection(error):
+    """Return the request thread's database connection to the pool"""
+    db.release_connection()
+
+
+def busy_response():
+    """503 returned to writers while the block producer is saturated"""
+    producer.record_rejection()
+    response = jsonify({
+        "success": False,
+        "message": "Server is busy processing rewards, please retry shortly",
+        "data": {"queue_depth": producer.queue_depth()}
+    })
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 if not os.path.exists(UPLOAD_FOLDER):
@@ -177,26 +273,75 @@ def generate_qr():
     )
     return jsonify(response)
 
+@app.route('/api/qr/generate-batch', methods=['POST'])
+def generate_qr_batch():
+    """
+    Business generates many QR codes at once (e.g. printed for an event)
+    
+    Request: {
+        "business_id": 1,
+        "reward_amount": 15,
+        "count": 10000,
+        "service_description": "Beach cleanup",
+        "expires_in_hours": 48  // optional
+    }
+    Response (application/x-ndjson, one JSON object per line):
+        { "success": true, "message": "...", "data": { "count": 10000, ... } }
+        { "qr_code": "GP-0001-..." }   (one line per code, streamed as saved)
+        { "done": true, "generated": 10000 }
+    If generation fails part-way, the last line is instead
+        { "error": "...", "generated": 2000 }   (the codes already streamed are saved)
+    """
+    data = request.json
+    response = api.generate_qr_code_batch(
+        business_id=data['business_id'],
+        reward_amount=data['reward_amount'],
+        count=int(data['count']),
+        service_description=data.get('service_description', ''),
+        expires_in_hours=data.get('expires_in_hours')
+    )
+    if not response['success']:
+        return jsonify(response), 400
+    
+    qr_codes = response['data'].pop('qr_codes')
+    
+    def stream():
+        yield json.dumps(response) + "\n"
+        generated = 0
+        try:
+            for qr_code in qr_codes:
+                generated += 1
+                yield json.dumps({"qr_code": qr_code}) + "\n"
+        except Exception as e:
+            # The 200 status is already sent, so the failure is reported in-band
+            print(f"QR batch for business {response['data']['business_id']} failed after {generated} codes: {e}")
+            yield json.dumps({"error": str(e), "generated": generated}) + "\n"
+            return
+        yield json.dumps({"done": True, "generated": generated}) + "\n"
+    
+    return Response(stream(), mimetype='application/x-ndjson')
+
 @app.route('/api/qr/scan', methods=['POST'])
 def scan_qr():
     """
     User scans QR code to receive reward
     
     Request: { "user_id": 1, "qr_code": "GP-0001-..." }
-    Response: { "success": true, "data": { "amount": 15, "business_name": "Cafe" } }
+    Response: { "success": true, "data": { "amount": 15, "business_name": "Cafe", "transaction_confirmed": false, "confirmation_within_ms": 500 } }
     """
+    if producer.is_saturated():
+        return busy_response()
+    
     data = request.json
     response = api.scan_qr_code(
         qr_code=data['qr_code'],
         user_id=data['user_id']
     )
     
-    # After successful scan, mine the block to process reward immediately
+    # The block producer confirms the reward within its batching window
     if response['success']:
-        mine_result = api.mine_block("SYSTEM")
-        if mine_result['success']:
-            response['data']['block_mined'] = True
-            response['data']['transaction_confirmed'] = True
+        response['data']['transaction_confirmed'] = False
+        response['data']['confirmation_within_ms'] = int(producer.max_wait * 1000)
     
     return jsonify(response)
 
@@ -244,21 +389,22 @@ def approve_verification(verification_id):
     Approve a task verification and reward user (admin only)
     
     Request: { "admin_name": "Admin123" }  // optional
-    Response: { "success": true, "data": { "verification_id": 1, "user_rewarded": true } }
+    Response: { "success": true, "data": { "verification_id": 1, "user_rewarded": true, "reward_confirmed": false, "confirmation_within_ms": 500 } }
     """
     # TODO: Add admin authentication check here
+    if producer.is_saturated():
+        return busy_response()
+    
     data = request.json or {}
     response = api.approve_verification(
         verification_id=verification_id,
         admin_name=data.get('admin_name', 'SYSTEM')
     )
     
-    # Mine block to process reward immediately
+    # The block producer confirms the reward within its batching window
     if response['success']:
-        mine_result = api.mine_block("SYSTEM")
-        if mine_result['success']:
-            response['data']['block_mined'] = True
-            response['data']['reward_confirmed'] = True
+        response['data']['reward_confirmed'] = False
+        response['data']['confirmation_within_ms'] = int(producer.max_wait * 1000)
     
     return jsonify(response)
 
@@ -294,13 +440,29 @@ def get_stats():
 @app.route('/api/transactions/<int:user_id>', methods=['GET'])
 def get_transactions(user_id):
     """
-    Get user's transaction history
+    Get user's transaction history, newest page first
     
     Query params: ?limit=50 (default: 50)
-    Response: { "success": true, "data": { "transactions": [...] } }
+                  ?cursor=<next_cursor> (optional: fetch the next older page)
+    Response: { "success": true, "data": { "transactions": [...], "next_cursor": 120 } }
     """
     limit = request.args.get('limit', 50, type=int)
-    response = api.get_transaction_history(user_id, limit)
+    cursor = request.args.get('cursor', type=int)
+    response = api.get_transaction_history(user_id, limit, cursor)
+    return jsonify(response)
+
+@app.route('/api/transactions/<transaction_id>/proof', methods=['GET'])
+def get_transaction_proof(transaction_id):
+    """
+    Get a Merkle inclusion proof for a confirmed transaction
+    
+    Verify by hashing the transaction and folding in each proof hash on its
+    "position" side; the result must equal merkle_root. Leaves are
+    SHA-256(0x00 + SHA-256 of the canonical encoding (encoding.py)) and
+    parents SHA-256(0x01 + left + right).
+    Response: { "success": true, "data": { "transaction": {...}, "merkle_root": "...", "hash_version": 1, "proof": [...] } }
+    """
+    response = api.get_transaction_proof(transaction_id)
     return jsonify(response)
 
 @app.route('/api/mine', methods=['POST'])
@@ -308,13 +470,26 @@ def mine_block():
     """
     Manually trigger mining of pending transactions
     
-    Response: { "success": true, "data": { "block_hash": "...", "transactions": 3 } }
+    Response: { "success": true, "data": { "block_hash": "...", "transactions": 3, "hashrate": 250000.0 } }
     """
     data = request.json or {}
     miner = data.get('miner', 'SYSTEM')
     response = api.mine_block(miner)
     return jsonify(response)
 
+@app.route('/api/producer/metrics', methods=['GET'])
+def get_producer_metrics():
+    """
+    Get block producer queue depth and seal latency metrics
+    
+    Response: { "success": true, "data": { "queue_depth": 12, "avg_seal_latency_ms": 4.2, ... } }
+    """
+    return jsonify({
+        "success": True,
+        "message": "Producer metrics retrieved",
+        "data": producer.get_metrics()
+    })
+
 # ==================== IMAGE UPLOAD ====================
 
 @app.route('/api/upload-image', methods=['POST'])
@@ -379,6 +554,7 @@ def index():
             },
             "qr_codes": {
                 "POST /api/qr/generate": "Generate QR code (business)",
+                "POST /api/qr/generate-batch": "Generate many QR codes, streamed as NDJSON (business)",
                 "POST /api/qr/scan": "Scan QR code (user)",
                 "GET /api/qr/info/<qr_code>": "Get QR code info"
             },
@@ -390,8 +566,10 @@ def index():
             "utilities": {
                 "GET /api/leaderboard": "Get top users",
                 "GET /api/transactions/<user_id>": "Get transaction history",
+                "GET /api/transactions/<transaction_id>/proof": "Get Merkle inclusion proof",
                 "GET /api/stats": "Get system statistics",
                 "POST /api/mine": "Mine pending transactions",
+                "GET /api/producer/metrics": "Block producer metrics",
                 "POST /api/upload-image": "Upload image"
             }
         },
@@ -415,4 +593,9 @@ if __name__ == '__main__':
     print("💚 Health check: http://localhost:5000/health")
     print("\nPress CTRL+C to stop the server\n")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Request threads share the blockchain safely: reads take the shared
+    # state lock, block appends are the single writer, and each request
+    # checks a sqlite connection out of the database's pool. The debug
+    # reloader would import this module in a second process, which cannot
+    # take the chain's writer lock, so it stays off
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True, use_reloader=False)
@@ -0,0 +1,157 @@
+"""
+State Snapshots for Green Points Blockchain
+Persists the derived chain state so a node can start without replaying every block
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from postings import PostingsIndex
+
+
+SNAPSHOT_PREFIX = "snapshot-"
+SNAPSHOT_SUFFIX = ".json"
+SNAPSHOT_FORMAT = 1
+POSTINGS_FILE = "postings.db"
+
+
+class SnapshotStore:
+    """
+    Writes and loads snapshots of a blockchain's derived state
+
+    A snapshot file is a one-line JSON header (height, tip hash and the
+    SHA-256 of the body) followed by the JSON body. Files are written to a
+    temporary name, fsynced and renamed into place, so a crash never
+    leaves a partial snapshot under a valid name.
+
+    Per-transaction index entries are not part of the snapshots: they grow
+    with every transaction, so they live in a PostingsIndex in the same
+    directory (see open_postings()) that is updated with every block.
+    """
+
+    def __init__(self, directory: str, interval: int = 1000, keep: int = 2):
+        """
+        Open (or create) a snapshot directory
+
+        Args:
+            directory: Directory holding the snapshot files
+            interval: Number of blocks between automatic snapshots
+            keep: Number of most recent snapshots to retain
+        """
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, height: int) -> str:
+        return os.path.join(self.directory, f"{SNAPSHOT_PREFIX}{height:010d}{SNAPSHOT_SUFFIX}")
+
+    def heights(self) -> List[int]:
+        """Get the heights of the snapshots on disk, oldest first"""
+        heights = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SNAPSHOT_PREFIX) and name.endswith(SNAPSHOT_SUFFIX):
+                digits = name[len(SNAPSHOT_PREFIX):-len(SNAPSHOT_SUFFIX)]
+                if digits.isdigit():
+                    heights.append(int(digits))
+        return sorted(heights)
+
+    def save(self, state: Dict) -> str:
+        """
+        Atomically write a snapshot and prune old ones
+
+        Args:
+            state: Output of Blockchain.snapshot_state()
+
+        Returns:
+            Path of the written snapshot
+        """
+        body = json.dumps(state, separators=(",", ":")).encode()
+        header = json.dumps({
+            "format": SNAPSHOT_FORMAT,
+            "height": state["height"],
+            "tip_hash": state["tip_hash"],
+            "created_at": time.time(),
+            "sha256": hashlib.sha256(body).hexdigest()
+        }).encode()
+
+        path = self._path(state["height"])
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(header + b"\n" + body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        self._sync_directory()
+
+        for height in self.heights()[:-self.keep]:
+            os.remove(self._path(height))
+        return path
+
+    def open_postings(self, read_only: bool = False) -> PostingsIndex:
+        """
+        Open the postings index kept next to the snapshots
+
+        Args:
+            read_only: Open the index for reading only (workers)
+        """
+        return PostingsIndex(os.path.join(self.directory, POSTINGS_FILE), read_only=read_only)
+
+    def _sync_directory(self) -> None:
+        """Persist the rename itself (not supported on every platform)"""
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def load(self, height: int) -> Optional[Dict]:
+        """
+        Load and verify the snapshot taken at a height
+
+        Args:
+            height: Chain height of the snapshot
+
+        Returns:
+            The snapshot state, or None if it is missing or corrupt
+        """
+        try:
+            with open(self._path(height), "rb") as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+
+        if header.get("format") != SNAPSHOT_FORMAT:
+            print(f"Ignoring snapshot at height {height}: unknown format")
+            return None
+        if hashlib.sha256(body).hexdigest() != header.get("sha256"):
+            print(f"Ignoring corrupt snapshot at height {height}")
+            return None
+        return json.loads(body)
+
+    def load_latest(self, max_height: Optional[int] = None) -> Optional[Dict]:
+        """
+        Load the newest intact snapshot
+
+        Args:
+            max_height: Ignore snapshots above this height (e.g. the chain length)
+
+        Returns:
+            The snapshot state, or None if there is no usable snapshot
+        """
+        for height in reversed(self.heights()):
+            if max_height is not None and height > max_height:
+                continue
+            state = self.load(height)
+            if state is not None:
+                return state
+        return None
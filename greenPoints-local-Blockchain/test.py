@@ -156,6 +156,1089 @@ def test_integration():
     print("✓ Integration tests passed")
 
 
+def test_balance_index():
+    """Test the incrementally maintained balance index"""
+    print("Testing balance index...")
+    from blockchain import Blockchain
+    
+    bc = Blockchain(difficulty=1)
+    bc.add_transaction({"from": "SYSTEM", "to": "Alice", "amount": 30})
+    bc.add_transaction({"from": "Alice", "to": "Bob", "amount": 5})
+    
+    assert bc.get_balance("Alice") == 0, "Pending transactions are not confirmed"
+    assert bc.get_pending_balance("Alice") == 25, "Pending view should include unmined transactions"
+    
+    bc.mine_pending_transactions("Miner")
+    assert bc.get_balance("Alice") == 25, "Alice should have 25 GP"
+    assert bc.get_balance("Bob") == 5, "Bob should have 5 GP"
+    assert bc.get_balance("Miner") == bc.mining_reward, "Miner should have mining reward"
+    assert bc.get_pending_balance("Alice") == 25, "No pending changes after mining"
+    
+    indexed = dict(bc.balances)
+    bc.rebuild_indexes()
+    assert bc.balances == indexed, "Rebuilt index should match incremental index"
+    
+    print("✓ Balance index tests passed")
+
+
+def test_transaction_history_pages():
+    """Test cursor-based transaction history pagination"""
+    print("Testing transaction history pages...")
+    from blockchain import Blockchain
+    
+    bc = Blockchain(difficulty=1)
+    for amount in range(1, 6):
+        bc.add_transaction({"from": "SYSTEM", "to": "Alice", "amount": amount})
+        bc.mine_pending_transactions("Miner")
+    
+    assert bc.get_transaction_count("Alice") == 5, "Alice should have 5 transactions"
+    
+    page, cursor = bc.get_transaction_page("Alice", limit=2)
+    assert [tx["amount"] for tx in page] == [4, 5], "First page should hold the newest entries"
+    assert cursor is not None, "Older entries should remain"
+    
+    page, cursor = bc.get_transaction_page("Alice", limit=2, cursor=cursor)
+    assert [tx["amount"] for tx in page] == [2, 3], "Second page should continue backwards"
+    
+    page, cursor = bc.get_transaction_page("Alice", limit=2, cursor=cursor)
+    assert [tx["amount"] for tx in page] == [1], "Last page should hold the oldest entry"
+    assert cursor is None, "Cursor should be exhausted"
+    
+    history = bc.get_transaction_history("Alice")
+    assert [tx["block_index"] for tx in history] == [1, 2, 3, 4, 5], "History should be in chain order"
+    
+    print("✓ Transaction history tests passed")
+
+
+def test_block_store():
+    """Test persisting and reloading the chain from the block store"""
+    print("Testing block store...")
+    import os
+    import tempfile
+    from blockchain import Blockchain
+    from block_store import BlockStore, FSYNC_NEVER, StoreLockedError
+    
+    directory = tempfile.mkdtemp()
+    store = BlockStore(directory, fsync=FSYNC_NEVER, segment_size=512)
+    try:
+        BlockStore(directory)
+        assert False, "A second writer should be refused"
+    except StoreLockedError as e:
+        assert str(os.getpid()) in str(e), "The error should name the lock holder"
+    BlockStore(directory, read_only=True).close()
+    bc = Blockchain(difficulty=1, store=store)
+    for amount in (10, 20, 30):
+        bc.add_transaction({"from": "SYSTEM", "to": "Alice", "amount": amount})
+        bc.mine_pending_transactions("Miner")
+    tip_hash = bc.get_latest_block().hash
+    store.close()
+    
+    segments = [name for name in os.listdir(directory) if name.startswith("segment-")]
+    assert len(segments) > 1, "Small segment size should roll over to new segments"
+    
+    # Simulate a crash in the middle of writing a record
+    last_segment = os.path.join(directory, sorted(segments)[-1])
+    with open(last_segment, "ab") as f:
+        f.write(b"\x00\x00\x01\x00partial")
+    
+    store = BlockStore(directory, fsync=FSYNC_NEVER, segment_size=512)
+    reloaded = Blockchain(difficulty=1, store=store)
+    assert len(reloaded.chain) == 4, "Chain should be reloaded, not re-created"
+    assert reloaded.get_latest_block().hash == tip_hash, "Tip should survive a restart"
+    assert reloaded.get_balance("Alice") == 60, "Balances should be rebuilt on load"
+    assert reloaded.is_chain_valid(), "Reloaded chain should be valid"
+    
+    reloaded.add_transaction({"from": "Alice", "to": "Bob", "amount": 5})
+    reloaded.mine_pending_transactions("Miner")
+    assert reloaded.chain[-1].index == 4, "New blocks should append after the reloaded tip"
+    store.close()
+    
+    print("✓ Block store tests passed")
+
+
+def test_block_store_segment_recovery():
+    """Test recovering a record written to a new segment before its index entry"""
+    print("Testing block store segment recovery...")
+    import os
+    import tempfile
+    from blockchain import Blockchain
+    from block_store import BlockStore, FSYNC_NEVER, INDEX_ENTRY
+    
+    directory = tempfile.mkdtemp()
+    store = BlockStore(directory, fsync=FSYNC_NEVER, segment_size=512)
+    bc = Blockchain(difficulty=1, store=store)
+    while True:
+        bc.add_transaction({"from": "SYSTEM", "to": "Alice", "amount": 10})
+        bc.mine_pending_transactions("Miner")
+        if store._entry(len(store) - 1)[1] == 0:
+            break
+    hashes = [block.hash for block in bc.chain]
+    store.close()
+    
+    # Crash after the record reached the new segment but before its index entry
+    index_path = os.path.join(directory, "blocks.idx")
+    with open(index_path, "r+b") as f:
+        f.truncate(os.path.getsize(index_path) - INDEX_ENTRY.size)
+    
+    store = BlockStore(directory, fsync=FSYNC_NEVER, segment_size=512)
+    assert len(store) == len(hashes), "Record in the rolled-over segment should be re-indexed"
+    reloaded = Blockchain(difficulty=1, store=store)
+    reloaded.add_transaction({"from": "Alice", "to": "Bob", "amount": 5})
+    reloaded.mine_pending_transactions("Miner")
+    hashes.append(reloaded.get_latest_block().hash)
+    store.close()
+    
+    store = BlockStore(directory, fsync=FSYNC_NEVER, segment_size=512)
+    assert [store.read_block(i).hash for i in range(len(store))] == hashes, \
+        "Every index entry should point at its own record"
+    assert Blockchain(difficulty=1, store=store).is_chain_valid(full=True), "Recovered chain should be valid"
+    store.close()
+    
+    print("✓ Block store segment recovery tests passed")
+
+
+def test_incremental_validation():
+    """Test watermark/checkpoint validation and full audits"""
+    print("Testing incremental validation...")
+    from blockchain import Blockchain
+    
+    bc = Blockchain(difficulty=1, checkpoint_interval=2)
+    for amount in range(1, 5):
+        bc.add_transaction({"from": "SYSTEM", "to": "Alice", "amount": amount})
+        bc.mine_pending_transactions("Miner")
+    
+    assert bc.is_chain_valid(), "Chain should be valid"
+    assert bc.validated_height == 5, "Watermark should reach the tip"
+    assert [cp["height"] for cp in bc.checkpoints] == [2, 4], "Checkpoints every 2 blocks"
+    assert all(bc.verify_checkpoint(cp) for cp in bc.checkpoints), "Checkpoints should verify"
+    
+    # Tampering below the watermark is only caught by a full audit
+    bc.chain[1].transactions[0]["amount"] = 1000
+    assert bc.is_chain_valid(), "Incremental validation skips validated blocks"
+    assert not bc.is_chain_valid(full=True), "Full audit should detect tampering"
+    assert bc.validated_height == 0, "Failed validation should reset the watermark"
+    assert bc.checkpoints == [], "Checkpoints above the tampered block should be dropped"
+    assert not bc.is_chain_valid(), "Chain should stay invalid until a full audit passes"
+    
+    bc.chain[1].transactions[0]["amount"] = 1
+    assert bc.start_full_audit(), "Audit should start"
+    bc._audit_thread.join()
+    assert bc.last_audit["valid"], "Background audit should pass once restored"
+    assert bc.is_chain_valid(), "Passing audit should clear the invalid mark"
+    
+    # The checkpoint key is kept with the chain so checkpoints verify after a restart
+    import tempfile
+    from deployment import load_checkpoint_key
+    directory = tempfile.mkdtemp()
+    key = load_checkpoint_key(directory, create=True)
+    assert load_checkpoint_key(directory) == key, "Key should be read back unchanged"
+    signer = Blockchain(difficulty=1, checkpoint_interval=1, checkpoint_key=key)
+    signer.is_chain_valid()
+    restarted = Blockchain(difficulty=1, checkpoint_key=load_checkpoint_key(directory))
+    restarted.chain = signer.chain
+    assert restarted.verify_checkpoint(signer.checkpoints[0]), "Checkpoint should verify under the loaded key"
+    
+    print("✓ Incremental validation tests passed")
+
+
+def test_parallel_miner():
+    """Test multi-process mining against the existing chain validation"""
+    print("Testing parallel miner...")
+    from blockchain import Blockchain, Block
+    from miner import ProofOfWorkMiner
+    
+    miner = ProofOfWorkMiner(workers=2, parallel_difficulty=1)
+    bc = Blockchain(difficulty=3, miner=miner)
+    bc.add_transaction({"from": "SYSTEM", "to": "Alice", "amount": 15})
+    block = bc.mine_pending_transactions("Miner")
+    
+    assert block.hash.startswith("000"), "Block should meet the difficulty"
+    assert miner.last_stats["workers"] == 2, "Both workers should have been used"
+    assert miner.last_stats["hashrate"] > 0, "Hashrate should be reported"
+    assert bc.is_chain_valid(full=True), "Parallel-mined chain should be valid"
+    
+    block.transactions[0]["amount"] = 1500
+    assert block.hash != block.calculate_hash(), "Merkle root should bind the transactions"
+    
+    # Workers that die without reporting must not hang mining
+    import miner as miner_module
+    worker = miner_module._worker
+    miner_module._worker = _crashed_mining_worker
+    try:
+        stats = miner.mine(Block(1, 1.0, [], "0"), 3)
+    finally:
+        miner_module._worker = worker
+    assert stats["nonce"] is not None, "Mining should finish in the calling process"
+    
+    print("✓ Parallel miner tests passed")
+
+
+def _crashed_mining_worker(*args):
+    """Stand-in for miner._worker that dies before reporting"""
+    import os
+    os._exit(1)
+
+
+def test_merkle_proofs():
+    """Test Merkle inclusion proofs for confirmed transactions"""
+    print("Testing Merkle proofs...")
+    from blockchain import Blockchain
+    from merkle import verify_proof
+    from transaction import Transaction
+    
+    bc = Blockchain(difficulty=1)
+    txs = [Transaction("SYSTEM", f"user{i}", i + 1, "task_reward") for i in range(5)]
+    for tx in txs:
+        bc.add_transaction(tx.to_dict())
+    block = bc.mine_pending_transactions("Miner")
+    
+    for tx in txs:
+        result = bc.get_transaction_proof(tx.transaction_id)
+        assert result["merkle_root"] == block.merkle_root, "Proof should reference the block root"
+        assert verify_proof(result["transaction"], result["proof"], block.merkle_root), "Proof should verify"
+    
+    result = bc.get_transaction_proof(txs[2].transaction_id)
+    forged = {**result["transaction"], "amount": 999}
+    assert not verify_proof(forged, result["proof"], block.merkle_root), "Forged transaction should fail"
+    assert bc.get_transaction_proof("missing") is None, "Unknown transaction has no proof"
+    
+    print("✓ Merkle proof tests passed")
+
+
+def test_duplicated_transactions():
+    """Test that duplicating a block's last transactions is caught (CVE-2012-2459)"""
+    print("Testing duplicated transactions...")
+    from blockchain import Blockchain
+    
+    bc = Blockchain(difficulty=1)
+    bc.add_transaction({"from": "SYSTEM", "to": "Alice", "amount": 1})
+    bc.add_transaction({"from": "SYSTEM", "to": "Bob", "amount": 2})
+    block = bc.mine_pending_transactions("Miner")
+    assert len(block.transactions) == 3 and bc.get_balance("Miner") == 10
+    
+    block.transactions.append(block.transactions[-1])
+    assert block.calculate_hash() != block.hash, "Transaction count should be bound to the hash"
+    assert not bc.is_chain_valid(full=True), "Duplicated reward should invalidate the chain"
+    assert block.merkle_mutated, "Equal sibling leaves should be flagged"
+    
+    print("✓ Duplicated transaction tests passed")
+
+
+def test_block_producer():
+    """Test size/time triggered block sealing and pool backpressure"""
+    print("Testing block producer...")
+    import time
+    from blockchain import Blockchain
+    from block_producer import BlockProducer
+    
+    bc = Blockchain(difficulty=1)
+    sealed = []
+    producer = BlockProducer(bc, max_batch=3, max_wait_ms=50, max_pending=5,
+                             on_block=sealed.append)
+    producer.start()
+    
+    for amount in (1, 2, 3):
+        bc.add_transaction({"from": "SYSTEM", "to": "Alice", "amount": amount})
+    bc.add_transaction({"from": "SYSTEM", "to": "Bob", "amount": 4})
+    
+    deadline = time.time() + 5
+    while producer.queue_depth() and time.time() < deadline:
+        time.sleep(0.01)
+    producer.stop()
+    
+    metrics = producer.get_metrics()
+    assert metrics["transactions_sealed"] == 4, "All transactions should be sealed"
+    assert metrics["seals_by_size"] >= 1, "A full batch should seal immediately"
+    assert len(sealed) == metrics["blocks_sealed"], "on_block should run per sealed block"
+    assert all(len(block.transactions) <= 4 for block in sealed), "Blocks hold at most max_batch + reward"
+    assert bc.get_balance("Alice") == 6 and bc.get_balance("Bob") == 4, "Balances should be confirmed"
+    
+    for amount in range(1, 7):
+        bc.add_transaction({"from": "SYSTEM", "to": "Carol", "amount": amount})
+    assert producer.queue_depth() == 5, "Pool should stop at max_pending"
+    assert producer.is_saturated() and bc.is_pool_full(), "Full pool should signal backpressure"
+    assert producer.seal_now() is not None, "Manual seal should mine a batch"
+    assert producer.queue_depth() == 2, "Manual seal should take one batch"
+    
+    print("✓ Block producer tests passed")
+
+
+def test_mempool():
+    """Test the indexed, deduplicating mempool"""
+    print("Testing mempool...")
+    from blockchain import Blockchain
+    from transaction import Mempool, Transaction
+    
+    bc = Blockchain(difficulty=1)
+    tx = Transaction("SYSTEM", "Alice", 15, "task_reward").to_dict()
+    assert bc.add_transaction(tx), "First submission should be accepted"
+    assert not bc.add_transaction(dict(tx)), "Duplicate pending transaction should be rejected"
+    bc.mine_pending_transactions("Miner")
+    assert not bc.add_transaction(dict(tx)), "Replay of a confirmed transaction should be rejected"
+    assert bc.get_balance("Alice") == 15, "Alice should be credited once"
+    
+    # Identical transactions without an ID or nonce are separate transfers
+    untagged = {"from": "SYSTEM", "to": "Bob", "amount": 4, "timestamp": 1.0}
+    assert bc.add_transaction(dict(untagged)), "Untagged transaction should be accepted"
+    assert bc.add_transaction(dict(untagged)), "An identical transfer is not a duplicate"
+    bc.mine_pending_transactions("Miner")
+    assert bc.get_balance("Bob") == 8 and not bc.pending_transactions, "Both transfers should be mined"
+    assert bc.add_transaction(dict(untagged)), "Content alone never marks a replay"
+    
+    # A sender-chosen nonce identifies transactions without an ID
+    nonced = {"from": "Bob", "to": "Carol", "amount": 1, "nonce": 7}
+    assert bc.add_transaction(dict(nonced)), "Nonced transaction should be accepted"
+    assert not bc.add_transaction(dict(nonced)), "Duplicate nonce should be rejected while pending"
+    bc.mine_pending_transactions("Miner")
+    assert not bc.add_transaction(dict(nonced)), "Replay of a confirmed nonce should be rejected"
+    assert bc.add_transaction({**nonced, "nonce": 8}), "A new nonce is a new transaction"
+    assert len(Transaction("A", "B", 1).transaction_id) == 64, "IDs should use the full digest"
+    
+    pool = Mempool(Mempool.POLICY_AMOUNT, max_transactions=3)
+    for i, amount in enumerate((5, 1, 9)):
+        pool.add({"transaction_id": f"tx{i}", "from": "Shop", "to": "Alice", "amount": amount})
+    assert [t["amount"] for t in pool.select()] == [9, 5, 1], "Amount policy orders by amount"
+    assert pool.add({"transaction_id": "tx3", "from": "Cafe", "to": "Bob", "amount": 7}), "Higher amount should evict"
+    assert "tx1" not in pool and pool.evicted == 1, "Smallest transaction should be evicted"
+    assert not pool.add({"transaction_id": "tx4", "from": "Cafe", "to": "Bob", "amount": 2}), "Lowest newcomer is rejected"
+    assert [t["transaction_id"] for t in pool.get_by_sender("Cafe")] == ["tx3"], "Per-sender queue"
+    assert pool.remove("tx0")["amount"] == 5 and len(pool) == 2, "Removal by id"
+    
+    print("✓ Mempool tests passed")
+
+
+def test_transaction_records():
+    """Test the compact transaction representation stored in blocks"""
+    print("Testing transaction records...")
+    from blockchain import Block
+    from transaction import ADDRESS_BOOK, Transaction, TransactionRecord
+    
+    tx = Transaction("SYSTEM", "Alice", 20, "task_reward", "t1", "Recycling",
+                     metadata={"note": "bin 4"}).to_dict()
+    tx["location"] = "Central Park"
+    record = TransactionRecord.from_dict(tx)
+    
+    assert record.to_dict() == tx, "Record should round-trip losslessly"
+    assert {**record} == tx and record["location"] == "Central Park", "Record should behave as a mapping"
+    assert record.get("missing") is None and "task_id" in record, "Mapping lookups should work"
+    assert ADDRESS_BOOK.lookup(record.recipient_id) == "Alice", "Addresses should be interned"
+    assert TransactionRecord.from_dict({"from": "A", "to": "B", "amount": 1}).to_dict() == \
+        {"from": "A", "to": "B", "amount": 1}, "Absent fields should stay absent"
+    
+    block = Block(1, 0.0, [tx], "0")
+    assert isinstance(block.transactions[0], TransactionRecord), "Blocks store records"
+    assert Block.from_dict(block.to_dict()).to_dict() == block.to_dict(), "Block dict round-trip"
+    
+    # A resident block must be smaller than the plain dicts it replaces
+    import tracemalloc
+    transactions = [{"transaction_id": f"{i:064x}", "from": "SYSTEM", "to": f"user{i % 50}",
+                     "amount": 15, "type": "qr_reward", "timestamp": 1700000000.0 + i} for i in range(2000)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    plain = [dict(tx) for tx in transactions]
+    plain_size = tracemalloc.get_traced_memory()[0] - before
+    before = tracemalloc.get_traced_memory()[0]
+    block = Block(1, 0.0, transactions, "0")
+    block_size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    assert block_size < plain_size * 0.6, f"Block takes {block_size} bytes, the dicts {plain_size}"
+    assert block.merkle_tree().root == block.merkle_root, "The tree is rebuilt on demand"
+    del plain
+    
+    print("✓ Transaction record tests passed")
+
+
+def test_canonical_encoding():
+    """Test the canonical block encoding and the legacy hash scheme"""
+    print("Testing canonical encoding...")
+    import tempfile
+    from blockchain import Blockchain, Block, HASH_LEGACY, HASH_MERKLE
+    from block_store import BlockStore
+    from encoding import canonical_decode, canonical_encode
+    
+    value = {"b": [1, -2, 2.5, None, True, "é"], "a": {"x": b"raw", "y": -(2 ** 70)}}
+    assert canonical_encode(value) == canonical_encode(dict(reversed(value.items()))), \
+        "Key order should not change the encoding"
+    assert canonical_decode(canonical_encode(value)) == value, "Encoding should round-trip"
+    assert canonical_encode(1) != canonical_encode(1.0), "Ints and floats should differ"
+    
+    bc = Blockchain(difficulty=2)
+    tip = bc.get_latest_block()
+    
+    # Blocks hashed before Merkle roots must keep verifying next to new ones
+    for version in (HASH_LEGACY, HASH_MERKLE):
+        tip = bc.get_latest_block()
+        block = Block(tip.index + 1, 1.0, [{"from": "SYSTEM", "to": "Alice", "amount": 5}],
+                      tip.hash, hash_version=version)
+        if version == HASH_LEGACY:
+            # The nonce is inside the legacy JSON, so the header miner cannot be used
+            while not block.hash.startswith("0" * bc.difficulty):
+                block.nonce += 1
+                block.hash = block.calculate_hash()
+        else:
+            bc.miner.mine(block, bc.difficulty)
+        bc.append_block(block)
+        
+        stored = block.to_dict()
+        assert ("hash_version" in stored) == (version == HASH_MERKLE), "Legacy blocks stay unchanged"
+        reloaded = Block.from_dict(stored)
+        assert reloaded.hash_version == version, "Scheme should be inferred for old blocks"
+        assert reloaded.calculate_hash() == block.hash, f"Version {version} block should verify"
+    assert bc.is_chain_valid(full=True), "Mixed-version chain should validate"
+    
+    block = bc.get_latest_block()
+    assert block.canonical_bytes() is block.canonical_bytes(), "Encoding should be cached"
+    decoded = Block.from_canonical(block.canonical_bytes())
+    assert decoded.to_dict() == block.to_dict() and decoded.calculate_hash() == block.hash, \
+        "Canonical bytes should round-trip"
+    
+    block.transactions[0]["amount"] = 500
+    assert block.calculate_hash() != block.hash, "Mutating a record should change the hash"
+    
+    with tempfile.TemporaryDirectory() as directory:
+        store = BlockStore(directory)
+        stored_chain = Blockchain(difficulty=2, store=store)
+        stored_chain.add_transaction({"from": "SYSTEM", "to": "Bob", "amount": 3})
+        stored_chain.mine_pending_transactions("Miner")
+        store.close()
+        
+        reopened = Blockchain(difficulty=2, store=BlockStore(directory))
+        assert reopened.is_chain_valid(full=True), "Canonically stored chain should validate"
+        assert reopened.get_balance("Bob") == 3, "Balances should survive the reload"
+        reopened.store.close()
+    
+    print("✓ Canonical encoding tests passed")
+
+
+def test_state_snapshots():
+    """Test snapshot + replay startup"""
+    print("Testing state snapshots...")
+    import os
+    import tempfile
+    from blockchain import Blockchain
+    from block_store import BlockStore
+    from snapshot import SnapshotStore
+    
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_dir = os.path.join(directory, "snapshots")
+        bc = Blockchain(difficulty=1, store=BlockStore(directory),
+                        snapshots=SnapshotStore(snapshot_dir, interval=3))
+        save = bc.snapshots.save
+        saved = []
+        
+        def save_unlocked(state):
+            saved.append((bc._state_lock._writer, sorted(state)))
+            return save(state)
+        
+        bc.snapshots.save = save_unlocked
+        for i in range(8):
+            bc.add_transaction({"from": "SYSTEM", "to": "Alice", "amount": 10, "type": "task_reward",
+                                "transaction_id": f"reward-{i}"})
+            bc.add_transaction({"from": "Alice", "to": "Bob", "amount": 4, "transaction_id": f"pay-{i}"})
+            bc.mine_pending_transactions("Miner")
+        expected = (dict(bc.balances), bc.get_transaction_history("Alice"), bc.get_address_counters("Alice"))
+        bc.store.close()
+        bc.postings.close()
+        assert saved and not any(locked for locked, _ in saved), "Snapshots should be written outside the write lock"
+        assert saved[0][1] == ["address_counters", "balances", "checkpoints", "height", "tip_hash"], \
+            "Per-transaction indexes stay in the postings index"
+        
+        snapshots = SnapshotStore(snapshot_dir, interval=3)
+        assert snapshots.heights() == [6, 9], "Snapshots should be taken every interval and pruned"
+        assert expected[2] == {"gp_earned": 80, "gp_spent": 32, "tasks_completed": 8}, "Counters should be tracked"
+        
+        indexed = snapshots.open_postings(read_only=True)
+        assert indexed.height == 9 and indexed.count("Alice") == 16, "Postings should be on disk"
+        indexed.close()
+        
+        reloaded = Blockchain(difficulty=1, store=BlockStore(directory), snapshots=snapshots)
+        assert reloaded.snapshot_height == 9, "Startup should use the latest snapshot"
+        assert (reloaded.balances, reloaded.get_transaction_history("Alice"),
+                reloaded.get_address_counters("Alice")) == expected, "Restored state should match"
+        assert not reloaded.add_transaction({"from": "Alice", "to": "Bob", "amount": 4, "transaction_id": "pay-0"}), \
+            "Restored locations should reject replays"
+        reloaded.add_transaction({"from": "Alice", "to": "Bob", "amount": 1})
+        reloaded.mine_pending_transactions("Miner")
+        assert reloaded.get_balance("Bob") == 33 and reloaded.is_chain_valid(), "Node should keep working"
+        history = reloaded.get_transaction_history("Alice")
+        assert len(history) == 17 and reloaded.get_transaction_page("Alice", limit=2)[1] == 15, \
+            "New blocks should be added to the postings index"
+        reloaded.store.close()
+        reloaded.postings.close()
+        
+        # A corrupt snapshot falls back to an older one, then replays further;
+        # postings lost in a crash are re-indexed from the chain
+        with open(os.path.join(snapshot_dir, "snapshot-0000000009.json"), "ab") as f:
+            f.write(b"garbage")
+        stale = snapshots.open_postings()
+        stale.truncate(4)
+        stale.close()
+        fallback = Blockchain(difficulty=1, store=BlockStore(directory), snapshots=snapshots)
+        assert fallback.snapshot_height == 6, "Corrupt snapshot should be skipped"
+        assert fallback.get_balance("Bob") == 33, "Replay should cover blocks after the snapshot"
+        assert fallback.postings.height == 10 and fallback.get_transaction_history("Alice") == history, \
+            "Missing postings should be re-indexed"
+        fallback.store.close()
+        fallback.postings.close()
+    
+    print("✓ State snapshot tests passed")
+
+
+def test_streaming_backup():
+    """Test streaming NDJSON export and resumable import"""
+    print("Testing streaming backup...")
+    import gzip
+    import json
+    import os
+    import tempfile
+    from backup import _chunk_hash, _dump_items, import_chain, iter_backup, iter_chain_records, write_backup
+    from blockchain import Blockchain
+    from block_store import BlockStore
+    
+    bc = Blockchain(difficulty=1)
+    for i in range(7):
+        bc.add_transaction({"from": "SYSTEM", "to": "Alice", "amount": i + 1})
+        bc.mine_pending_transactions("Miner")
+    bc.add_transaction({"from": "Alice", "to": "Bob", "amount": 2})
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "backup.ndjson.gz")
+        users = ({"user_id": i} for i in range(5))
+        summary = write_backup(path, iter_chain_records(bc, chunk_size=3, sections={"users": users}))
+        records = list(iter_backup(path))
+        kinds = [record["kind"] for record in records]
+        assert kinds == ["header", "blocks", "blocks", "blocks", "pending", "users", "users", "footer"], kinds
+        assert summary["lines"] == len(records), "Every line should be written"
+        
+        # Interrupt an import after the first chunk, then resume it
+        with gzip.open(path, "rt") as f:
+            lines = f.readlines()
+        partial = os.path.join(directory, "partial.ndjson")
+        with open(partial, "w") as f:
+            f.writelines(lines[:3])
+            f.write(lines[3][:40])
+        
+        store = BlockStore(os.path.join(directory, "restored"))
+        try:
+            import_chain(partial, store)
+            assert False, "Truncated backup should fail"
+        except ValueError:
+            pass
+        assert len(store) == 6, "Complete chunks should be kept"
+        
+        sections = []
+        result = import_chain(path, store, on_record=lambda record: sections.append(record["kind"]))
+        assert result["blocks_skipped"] == 6 and result["blocks_imported"] == 2, result
+        assert sections == ["pending", "users", "users"], "Other sections go to the callback"
+        store.close()
+        
+        restored = Blockchain(difficulty=1, store=BlockStore(os.path.join(directory, "restored")))
+        assert restored.get_latest_block().hash == bc.get_latest_block().hash, "Chain should be restored"
+        assert restored.get_balance("Alice") == 28 and restored.is_chain_valid(full=True), "State should match"
+        restored.store.close()
+        
+        # A tampered chunk is rejected by its hash
+        tampered = os.path.join(directory, "tampered.ndjson")
+        with open(tampered, "w") as f:
+            f.writelines(lines[:1] + [lines[1].replace('"amount":2', '"amount":9', 1)] + lines[2:])
+        try:
+            list(iter_backup(tampered))
+            assert False, "Tampered chunk should fail verification"
+        except ValueError as e:
+            assert "hash mismatch" in str(e)
+        
+        # Blocks are held to chain validation rules even with a valid chunk hash
+        def forge(name, change, **kwargs):
+            chunk = json.loads(lines[1])
+            change(chunk["items"][-1])
+            chunk["sha256"] = _chunk_hash(_dump_items(chunk["items"]))
+            forged = os.path.join(directory, name)
+            with open(forged, "w") as f:
+                f.writelines(lines[:1] + [json.dumps(chunk) + "\n"] + lines[2:])
+            store = BlockStore(os.path.join(directory, name + ".store"))
+            try:
+                import_chain(forged, store, **kwargs)
+                assert False, f"{name} should be rejected"
+            except ValueError as e:
+                return str(e)
+            finally:
+                store.close()
+        
+        assert "Merkle root" in forge("root.ndjson", lambda block: block.update(merkle_root="00" * 32))
+        assert "not properly mined" in forge("easy.ndjson", lambda block: None, difficulty=8).lower()
+    
+    print("✓ Streaming backup tests passed")
+
+
+def test_concurrent_access():
+    """Test readers and writers sharing a blockchain and database across threads"""
+    print("Testing concurrent access...")
+    import os
+    import tempfile
+    import threading
+    from blockchain import Blockchain
+    from block_store import BlockStore
+    from concurrency import RWLock
+    from database import Database
+    
+    lock = RWLock()
+    written = threading.Event()
+    
+    def write():
+        with lock.write():
+            written.set()
+    
+    with lock.read():
+        writer = threading.Thread(target=write)
+        writer.start()
+        assert not written.wait(0.1), "Writer should wait for active readers"
+    assert written.wait(2), "Writer should run once readers leave"
+    writer.join()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        bc = Blockchain(difficulty=1, store=BlockStore(directory))
+        bc.chain.cache_size = 4  # force readers to decode from the store
+        errors = []
+        stop = threading.Event()
+        
+        def read_loop():
+            try:
+                while not stop.is_set():
+                    tip = bc.get_latest_block()
+                    assert bc.chain[tip.index].hash == tip.hash
+                    page, _ = bc.get_transaction_page("Alice", limit=5)
+                    assert all(entry["to"] == "Alice" for entry in page)
+                    with bc.read_lock():
+                        assert sum(bc.balances.values()) == 0, "Readers should never see half a block"
+            except Exception as e:
+                errors.append(e)
+        
+        readers = [threading.Thread(target=read_loop) for _ in range(4)]
+        for thread in readers:
+            thread.start()
+        
+        def write_loop(offset):
+            for i in range(15):
+                bc.add_transaction({"from": "SYSTEM", "to": "Alice", "amount": 1,
+                                    "transaction_id": f"{offset}-{i}"})
+                bc.mine_pending_transactions("Miner")
+        writers = [threading.Thread(target=write_loop, args=(n,)) for n in range(2)]
+        for thread in writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        stop.set()
+        for thread in readers:
+            thread.join()
+        
+        assert not errors, errors
+        assert bc.get_balance("Alice") == 30 and bc.is_chain_valid(full=True), "Writes should not be lost"
+        bc.store.close()
+        
+        db = Database(os.path.join(directory, "test.db"), timeout=0.2, pool_size=2)
+        connections = []
+        def request():
+            connections.append(db.conn)
+            db.release_connection()
+        for _ in range(5):
+            thread = threading.Thread(target=request)
+            thread.start()
+            thread.join()
+        assert len({id(conn) for conn in connections}) == 1, "Request threads should reuse pooled connections"
+        
+        held = db.conn
+        thread = threading.Thread(target=lambda: connections.append(db.conn))
+        thread.start()
+        thread.join()
+        assert connections[-1] is not held, "Threads holding a connection never share it"
+        try:
+            db.pool.acquire()
+            assert False, "The pool should be bounded"
+        except TimeoutError:
+            pass
+        db.close()
+    
+    print("✓ Concurrent access tests passed")
+
+
+def test_multi_worker_mode():
+    """Test a worker following the owner's block store and forwarding writes"""
+    print("Testing multi-worker mode...")
+    import os
+    import tempfile
+    from blockchain import Blockchain
+    from block_producer import BlockProducer
+    from block_store import BlockStore
+    from deployment import (ChainClient, ChainOwner, FollowerBlockchain, RemoteProducer,
+                            load_authkey, owner_address)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        owner_chain = Blockchain(difficulty=1, store=BlockStore(directory))
+        producer = BlockProducer(owner_chain, max_batch=100, max_wait_ms=60000, max_pending=50)
+        key = load_authkey(directory, create=True)
+        assert os.stat(os.path.join(directory, "ipc.key")).st_mode & 0o077 == 0, "Key should be private"
+        owner = ChainOwner(owner_chain, producer, owner_address(directory), key)
+        owner.start()
+        
+        client = ChainClient(owner_address(directory), load_authkey(directory))
+        worker = FollowerBlockchain(BlockStore(directory, read_only=True), client)
+        assert worker.difficulty == 1 and len(worker.chain) == 1
+        try:
+            ChainOwner(worker, producer, owner_address(directory), key).start()
+            assert False, "Only the writer of the store may own the chain"
+        except RuntimeError:
+            pass
+        assert os.path.exists(owner_address(directory)), "The running owner's socket should be left alone"
+        
+        assert worker.add_transaction({"from": "SYSTEM", "to": "Alice", "amount": 25})
+        assert len(owner_chain.pending_transactions) == 1, "Writes should reach the owner's pool"
+        assert len(worker.pending_transactions) == 1
+        assert worker.get_pending_balance("Alice") == 25
+        assert worker.get_balance("Alice") == 0, "Nothing is confirmed yet"
+        assert not RemoteProducer(client).is_saturated()
+        
+        # Blocks sealed by the owner show up after catch_up()
+        owner_chain.mine_pending_transactions("Miner")
+        assert worker.get_balance("Alice") == 0
+        assert worker.catch_up() == 2
+        assert worker.get_balance("Alice") == 25
+        assert worker.get_transaction_page("Alice")[0][0]["amount"] == 25
+        
+        # Mining through the worker runs on the owner and returns the block
+        worker.add_transaction({"from": "Alice", "to": "Bob", "amount": 5})
+        block = worker.mine_pending_transactions("Miner")
+        assert block.index == 2 and block.hash == owner_chain.get_latest_block().hash
+        assert worker.get_balance("Bob") == 5 and worker.is_chain_valid(full=True)
+        
+        try:
+            worker.append_block(block)
+            assert False, "Workers should not append blocks"
+        except RuntimeError:
+            pass
+        try:
+            ChainClient(owner_address(directory), b"wrong key").call("pending_count")
+            assert False, "A wrong key should be refused"
+        except ConnectionError:
+            pass
+        
+        client.close()
+        owner.stop()
+        worker.store.close()
+        owner_chain.store.close()
+    
+    print("✓ Multi-worker mode tests passed")
+
+
+def test_leaderboard_rebuild():
+    """Test set-based leaderboard rebuilds and per-block updates"""
+    print("Testing leaderboard rebuild...")
+    from blockchain import Blockchain
+    from database import Database
+    
+    db = Database(":memory:")
+    bc = Blockchain(difficulty=1)
+    users = [db.create_user(f"User {i}", f"user{i}@test.com", None, "user", f"GP_U{i}")
+             for i in range(5)]
+    business = db.create_user("Shop", "shop@test.com", None, "business", "GP_SHOP")
+    
+    for i, user_id in enumerate(users):
+        bc.add_transaction({"from": "SYSTEM", "to": f"GP_U{i}", "amount": 10 * (i + 1)})
+    bc.mine_pending_transactions("Miner")
+    
+    verification = db.submit_verification(users[0], "recycling", "photo", 10)
+    db.approve_verification(verification, "admin", "tx-1")
+    db.create_qr_code(business, 5, "QR-1")
+    db.use_qr_code("QR-1", users[0], "tx-2")
+    db.create_qr_code(business, 5, "QR-2")
+    db.use_qr_code("QR-2", users[1], "tx-3")
+    
+    db.rebuild_leaderboard(bc)
+    board = db.get_leaderboard(limit=10)
+    assert [row["user_id"] for row in board] == users[::-1], "Ranked by balance"
+    assert board[0]["total_gp"] == 50
+    tasks = {row["user_id"]: row["tasks_completed"] for row in board}
+    assert tasks[users[0]] == 2 and tasks[users[1]] == 1 and tasks[users[4]] == 0
+    
+    # A new block only refreshes the users it touched
+    bc.add_transaction({"from": "SYSTEM", "to": "GP_U0", "amount": 100})
+    block = bc.mine_pending_transactions("Miner")
+    db.apply_block_to_leaderboard(bc, block)
+    board = db.get_leaderboard(limit=10)
+    assert board[0]["user_id"] == users[0] and board[0]["total_gp"] == 110
+    assert len(board) == 5, "Miner and business addresses are not users"
+    db.close()
+    
+    print("✓ Leaderboard rebuild tests passed")
+
+
+def test_ranked_leaderboard():
+    """Test the incremental ranked leaderboard"""
+    print("Testing ranked leaderboard...")
+    import random
+    from blockchain import Blockchain
+    from leaderboard import RankedSet
+    import json
+    from wallet_centralized import UserManager, UserType
+    
+    ranked = RankedSet()
+    keys = random.sample(range(1000), 200)
+    for key in keys:
+        ranked.add(key)
+    for key in keys[:50]:
+        ranked.remove(key)
+    expected = sorted(keys[50:])
+    assert list(ranked) == expected
+    assert all(ranked.rank(key) == i for i, key in enumerate(expected))
+    assert list(ranked.iter_from(100)) == expected[100:] and ranked[-1] == expected[-1]
+    
+    bc = Blockchain(difficulty=1)
+    manager = UserManager()
+    types = ["tourist", "user", "business"]
+    wallets = [manager.create_wallet_from_db(i, f"user{i}", types[i % 3], f"u{i}@test.com")
+               for i in range(9)]
+    for i, wallet in enumerate(wallets):
+        bc.add_transaction({"from": "SYSTEM", "to": wallet.address, "amount": 10 * i})
+    bc.mine_pending_transactions("Miner")
+    
+    top = manager.get_leaderboard(bc, limit=3)
+    assert [entry["user_id"] for entry in top] == [8, 7, 6]
+    assert [entry["user_id"] for entry in manager.get_leaderboard(bc, 2, user_type=UserType.TOURIST)] == [6, 3]
+    assert manager.get_user_rank(0, bc) == 9
+    assert manager.get_user_rank(4, bc, user_type=UserType.USER) == 2
+    assert manager.get_user_rank(4, bc, user_type=UserType.TOURIST) is None
+    assert [entry["rank"] for entry in manager.get_users_around(4, bc, radius=1)] == [4, 5, 6]
+    
+    # A new block re-ranks the wallets it touched as their balances are credited
+    bc.add_transaction({"from": "SYSTEM", "to": wallets[0].address, "amount": 500, "type": "task_reward"})
+    bc.mine_pending_transactions("Miner")
+    assert manager.leaderboard.rank(0) == 1, "The leaderboard should be updated with the balance"
+    assert manager.get_leaderboard(bc, limit=1)[0]["user_id"] == 0
+    assert manager.get_user_rank(8, bc) == 2
+    
+    manager.create_wallet_from_db(9, "late", "business", "late@test.com")
+    assert manager.get_user_rank(9, bc) == 10, "New wallets are ranked when created"
+    stats = json.loads(manager.get_user_stats_json(0, bc))
+    assert stats["statistics"]["rank"] == 1
+    leader = manager.get_leaderboard(bc, limit=1)[0]
+    assert (leader["total_gp_earned"], leader["tasks_completed"]) == \
+        (stats["statistics"]["total_gp_earned"], stats["statistics"]["total_tasks_completed"]) == (500, 1), \
+        "Leaderboard and stats should report the same chain totals"
+    assert manager.get_leaderboard(bc, 10, force_refresh=True) == manager.get_leaderboard(bc, 10)
+    
+    print("✓ Ranked leaderboard tests passed")
+
+
+def test_database_profile():
+    """Test WAL mode and schema migrations on an existing database"""
+    print("Testing database profile...")
+    import os
+    import sqlite3
+    import tempfile
+    from database import Database, SCHEMA_VERSION
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "old.db")
+        old = sqlite3.connect(path)
+        old.execute("""
+            CREATE TABLE pending_verifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+                task_type TEXT NOT NULL, submitted_at REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending'
+            )
+        """)
+        old.execute("INSERT INTO pending_verifications (user_id, task_type, submitted_at) VALUES (1, 'recycling', 0)")
+        old.commit()
+        old.close()
+        
+        db = Database(path)
+        conn = db.conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1, "synchronous=NORMAL"
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"idx_verifications_user_status", "idx_qr_codes_used_by",
+                "idx_leaderboard_total_gp"} <= indexes
+        assert len(db.get_pending_verifications()) == 0  # no matching users, but query runs
+        plan = " ".join(str(tuple(row)) for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT user_id, name, total_gp, tasks_completed "
+            "FROM leaderboard_cache WHERE total_gp > 0 ORDER BY total_gp DESC LIMIT 10"))
+        assert "COVERING INDEX idx_leaderboard_total_gp" in plan, plan
+        assert db.migrate() == SCHEMA_VERSION, "Migrating again is a no-op"
+        db.close()
+    
+    print("✓ Database profile tests passed")
+
+
+def test_group_commit():
+    """Test batching concurrent database writes into shared commits"""
+    print("Testing group commit...")
+    import os
+    import tempfile
+    import threading
+    from database import Database
+    
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(os.path.join(directory, "group.db"), group_commit_ms=20)
+        assert db.synchronous == "FULL", "Group commit acknowledges fsynced commits"
+        business = db.create_user("Shop", "shop@test.com", None, "business", "GP_SHOP")
+        user = db.create_user("Alice", "alice@test.com", None, "user", "GP_ALICE")
+        assert db.get_user_by_id(user)["name"] == "Alice", "Acknowledged writes are visible"
+        
+        ids = []
+        def submit(n):
+            ids.append(db.submit_verification(user, "recycling", f"photo {n}", 10))
+        threads = [threading.Thread(target=submit, args=(n,)) for n in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(set(ids)) == 20 and len(db.get_pending_verifications()) == 20
+        assert db.committer.metrics["max_batch_size"] > 1, "Concurrent writes should share a commit"
+        
+        # A failing write is rolled back alone
+        assert db.create_qr_code(business, 5, "QR-1")
+        results = []
+        def create(code):
+            results.append(db.create_qr_code(business, 5, code))
+        threads = [threading.Thread(target=create, args=(code,)) for code in ("QR-1", "QR-2")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(result is None for result in results) == [False, True]
+        assert db.get_qr_code("QR-2") is not None
+        assert db.use_qr_code("QR-2", user, "tx-1") and not db.use_qr_code("QR-2", user, "tx-2")
+        db.close()
+        
+        reopened = Database(os.path.join(directory, "group.db"))
+        assert len(reopened.get_pending_verifications()) == 20, "Writes are durable after close"
+        reopened.close()
+    
+    print("✓ Group commit tests passed")
+
+
+def test_bulk_qr_codes():
+    """Test bulk QR code generation"""
+    print("Testing bulk QR codes...")
+    import time
+    from api import GreenPointsAPI
+    from blockchain import Blockchain
+    from database import Database
+    
+    db = Database(":memory:")
+    api = GreenPointsAPI(Blockchain(difficulty=1), db)
+    business = db.create_user("Cafe", "cafe@test.com", None, "business", "GP_CAFE")
+    user = db.create_user("Alice", "alice@test.com", None, "user", "GP_ALICE")
+    
+    start = time.time()
+    response = api.generate_qr_code_batch(business, 5, 10000, "Festival", expires_in_hours=24)
+    assert response["success"]
+    qr_codes = list(response["data"]["qr_codes"])
+    elapsed = time.time() - start
+    assert len(set(qr_codes)) == 10000 and all(code.startswith("GP-0001-") for code in qr_codes)
+    assert elapsed < 1.0, f"10k codes took {elapsed:.2f}s"
+    assert db.conn.execute("SELECT COUNT(*) FROM qr_codes").fetchone()[0] == 10000
+    assert db.get_qr_code(qr_codes[-1])["service_description"] == "Festival (#10000)"
+    
+    # Codes are committed a chunk at a time as the stream is consumed
+    lazy = api.generate_qr_code_batch(business, 5, 2500)["data"]["qr_codes"]
+    next(lazy)
+    assert db.conn.execute("SELECT COUNT(*) FROM qr_codes").fetchone()[0] == 11000
+    
+    success, _, batch = api.qr_manager.create_batch_qr_codes(business, 2, 3)
+    assert success and len(batch) == 3
+    assert api.scan_qr_code(batch[0], user)["success"]
+    assert not api.generate_qr_code_batch(user, 5, 10)["success"], "Only businesses"
+    assert not api.generate_qr_code_batch(business, 5, 0)["success"]
+    db.close()
+    
+    print("✓ Bulk QR code tests passed")
+
+
+def test_qr_redemption():
+    """Test exactly-once QR redemption under concurrent scans"""
+    print("Testing QR redemption...")
+    import os
+    import tempfile
+    import threading
+    from blockchain import Blockchain
+    from database import Database
+    from qr_system import QRCodeManager
+    
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(os.path.join(directory, "qr.db"), group_commit_ms=2)
+        bc = Blockchain(difficulty=1)
+        manager = QRCodeManager(db, bc)
+        business = db.create_user("Cafe", "cafe@test.com", None, "business", "GP_CAFE")
+        users = [db.create_user(f"User {i}", f"user{i}@test.com", None, "user", f"GP_U{i}")
+                 for i in range(10)]
+        _, _, (code, spare, expired) = manager.create_batch_qr_codes(business, 15, 3)
+        db.conn.execute("UPDATE qr_codes SET expires_at = 1 WHERE qr_code = ?", (expired,))
+        db.conn.commit()
+        
+        results = []
+        barrier = threading.Barrier(20)
+        def scan(n):
+            barrier.wait()
+            try:
+                results.append(manager.scan_qr_code(code, users[n % 10]))
+            finally:
+                db.release_connection()  # as the server does when a request ends
+        threads = [threading.Thread(target=scan, args=(n,)) for n in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        winners = [data for success, _, data in results if success]
+        assert len(winners) == 1, "Exactly one concurrent scan redeems the code"
+        assert len(bc.pending_transactions) == 1
+        assert db.get_qr_code(code)["transaction_id"] == winners[0]["transaction_id"]
+        
+        hits = manager.metrics["cache_hits"]
+        success, message, _ = manager.scan_qr_code(code, users[0])
+        assert not success and "already used" in message
+        assert manager.metrics["cache_hits"] == hits + 1, "Replays are answered from the cache"
+        assert manager.scan_qr_code(expired, users[0])[1] == "QR code expired"
+        assert manager.scan_qr_code("GP-9999-NOPE", users[0])[1] == "QR code not found"
+        
+        # A claim whose transaction is refused is released for a retry
+        bc.max_pending = 1
+        success, message, _ = manager.scan_qr_code(spare, users[1])
+        assert not success and "full" in message
+        assert not db.get_qr_code(spare)["is_used"]
+        bc.max_pending = None
+        assert manager.scan_qr_code(spare, users[1])[0]
+        
+        # A submission that raises has an unknown outcome: the claim is kept
+        # until reconcile_claims() finds the transaction on the chain or not
+        accepted, lost = manager.create_qr_code(business, 15)[2], manager.create_qr_code(business, 15)[2]
+        add_transaction = bc.add_transaction
+        def timed_out(transaction):
+            add_transaction(transaction)
+            raise TimeoutError("owner accepted the transaction, the reply was lost")
+        def unreachable(transaction):
+            raise ConnectionError("owner unreachable")
+        bc.add_transaction = timed_out
+        success, message, _ = manager.scan_qr_code(accepted, users[2])
+        assert not success and "being confirmed" in message
+        bc.add_transaction = unreachable
+        assert not manager.scan_qr_code(lost, users[3])[0]
+        del bc.add_transaction
+        assert db.get_qr_code(accepted)["is_used"] and db.get_qr_code(lost)["is_used"], \
+            "Claims with an unknown outcome should not be released"
+        assert manager.reconcile_claims() == {"kept": 0, "released": 0, "unresolved": 2}
+        
+        bc.mine_pending_transactions("Miner")
+        assert manager.reconcile_claims(grace_seconds=0) == {"kept": 1, "released": 1, "unresolved": 0}
+        assert db.get_qr_code(accepted)["is_used"], "A confirmed reward keeps its claim"
+        assert not db.get_qr_code(lost)["is_used"], "A reward the chain never saw is released"
+        assert manager.scan_qr_code(lost, users[3])[0] and not db.get_unconfirmed_claims()
+        db.close()
+    
+    print("✓ QR redemption tests passed")
+
+
 def run_all_tests():
     """Run all tests"""
     print("\n" + "="*80)
@@ -167,7 +1250,29 @@ def run_all_tests():
         test_wallet_system,
         test_transaction_system,
         test_task_system,
-        test_integration
+        test_integration,
+        test_balance_index,
+        test_transaction_history_pages,
+        test_block_store,
+        test_block_store_segment_recovery,
+        test_incremental_validation,
+        test_parallel_miner,
+        test_merkle_proofs,
+        test_duplicated_transactions,
+        test_block_producer,
+        test_mempool,
+        test_transaction_records,
+        test_canonical_encoding,
+        test_state_snapshots,
+        test_streaming_backup,
+        test_concurrent_access,
+        test_multi_worker_mode,
+        test_leaderboard_rebuild,
+        test_ranked_leaderboard,
+        test_database_profile,
+        test_group_commit,
+        test_bulk_qr_codes,
+        test_qr_redemption
     ]
     
     passed = 0
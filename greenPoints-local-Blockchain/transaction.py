@@ -4,8 +4,14 @@ Transaction Management for Green Points Blockchain
 
 import time
 import hashlib
+import heapq
 import json
-from typing import Dict, Optional
+import secrets
+import threading
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from encoding import canonical_encode
 
 
 class Transaction:
@@ -37,15 +43,21 @@ class Transaction:
         self.transaction_id = self.generate_transaction_id()
     
     def generate_transaction_id(self) -> str:
-        """Generate a unique transaction ID"""
+        """
+        Generate a unique transaction ID
+        
+        A random nonce is hashed in with the contents, so two otherwise
+        identical transactions created at the same time get different IDs.
+        """
         tx_string = json.dumps({
             "sender": self.sender,
             "recipient": self.recipient,
             "amount": self.amount,
             "timestamp": self.timestamp,
-            "type": self.transaction_type
+            "type": self.transaction_type,
+            "nonce": secrets.token_hex(16)
         }, sort_keys=True)
-        return hashlib.sha256(tx_string.encode()).hexdigest()[:16]
+        return hashlib.sha256(tx_string.encode()).hexdigest()
     
     def to_dict(self) -> Dict:
         """Convert transaction to dictionary format"""
@@ -93,11 +105,383 @@ class Transaction:
         return self.__str__()
 
 
+class AddressBook:
+    """Interns wallet addresses as small integer IDs shared by all blocks"""
+    
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._addresses: List[str] = []
+        self._lock = threading.Lock()
+    
+    def intern(self, address: str) -> int:
+        """Get the ID for an address, assigning one on first sight"""
+        address_id = self._ids.get(address)
+        if address_id is None:
+            with self._lock:
+                address_id = self._ids.get(address)
+                if address_id is None:
+                    address_id = len(self._addresses)
+                    self._addresses.append(address)
+                    self._ids[address] = address_id
+        return address_id
+    
+    def lookup(self, address_id: int) -> str:
+        """Get the address for an ID"""
+        return self._addresses[address_id]
+    
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+
+ADDRESS_BOOK = AddressBook()
+
+_MISSING = object()
+
+
+class TransactionRecord(MutableMapping):
+    """
+    Compact form of a confirmed transaction stored inside a Block
+    
+    Known fields live in __slots__ and addresses are stored as interned
+    integer IDs, so a record is several times smaller than the equivalent
+    dict. It still behaves as a mapping with the original keys ("from",
+    "to", "amount", ...), and to_dict()/from_dict() round-trip losslessly;
+    unknown keys are kept in an overflow dict.
+    """
+    
+    __slots__ = ("sender_id", "recipient_id", "amount", "transaction_id", "type",
+                 "timestamp", "task_id", "task_name", "metadata", "extra")
+    
+    # Optional dictionary keys stored in slots of the same name
+    OPTIONAL_FIELDS = ("transaction_id", "type", "timestamp", "task_id", "task_name", "metadata")
+    
+    def __init__(self, sender: str, recipient: str, amount: float, **fields):
+        self.sender_id = ADDRESS_BOOK.intern(sender)
+        self.recipient_id = ADDRESS_BOOK.intern(recipient)
+        self.amount = amount
+        for field in self.OPTIONAL_FIELDS:
+            setattr(self, field, fields.pop(field, _MISSING))
+        self.extra = fields or None
+    
+    @classmethod
+    def from_dict(cls, transaction) -> "TransactionRecord":
+        """Build a record from a transaction dictionary (records are returned as-is)"""
+        if isinstance(transaction, cls):
+            return transaction
+        fields = dict(transaction)
+        return cls(fields.pop("from"), fields.pop("to"), fields.pop("amount"), **fields)
+    
+    def to_dict(self) -> Dict:
+        """Convert back to the original transaction dictionary"""
+        tx_dict = {"from": self.sender, "to": self.recipient, "amount": self.amount}
+        for field in self.OPTIONAL_FIELDS:
+            value = getattr(self, field)
+            if value is not _MISSING:
+                tx_dict[field] = value
+        if self.extra:
+            tx_dict.update(self.extra)
+        return tx_dict
+    
+    def canonical_bytes(self) -> bytes:
+        """Encode the transaction dictionary with encoding.canonical_encode()"""
+        return canonical_encode(self.to_dict())
+    
+    @property
+    def sender(self) -> str:
+        return ADDRESS_BOOK.lookup(self.sender_id)
+    
+    @property
+    def recipient(self) -> str:
+        return ADDRESS_BOOK.lookup(self.recipient_id)
+    
+    def __getitem__(self, key: str) -> Any:
+        if key == "from":
+            return self.sender
+        if key == "to":
+            return self.recipient
+        if key == "amount":
+            return self.amount
+        if key in self.OPTIONAL_FIELDS:
+            value = getattr(self, key)
+            if value is not _MISSING:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == "from":
+            self.sender_id = ADDRESS_BOOK.intern(value)
+        elif key == "to":
+            self.recipient_id = ADDRESS_BOOK.intern(value)
+        elif key == "amount":
+            self.amount = value
+        elif key in self.OPTIONAL_FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+    
+    def __delitem__(self, key: str) -> None:
+        if key in self.OPTIONAL_FIELDS and getattr(self, key) is not _MISSING:
+            setattr(self, key, _MISSING)
+        elif self.extra and key in self.extra:
+            del self.extra[key]
+        else:
+            raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        yield "from"
+        yield "to"
+        yield "amount"
+        for field in self.OPTIONAL_FIELDS:
+            if getattr(self, field) is not _MISSING:
+                yield field
+        if self.extra:
+            yield from self.extra
+    
+    def __len__(self) -> int:
+        present = sum(1 for field in self.OPTIONAL_FIELDS if getattr(self, field) is not _MISSING)
+        return 3 + present + (len(self.extra) if self.extra else 0)
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (TransactionRecord, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        return f"TransactionRecord({self.to_dict()!r})"
+
+
+def transaction_key(transaction: Dict) -> Optional[str]:
+    """
+    Get the key identifying a transaction dictionary for deduplication
+    
+    Uses the transaction_id when present, otherwise the sender and a
+    sender-chosen "nonce". The contents alone are never used: two
+    legitimate transfers can be identical.
+    
+    Returns:
+        The key, or None if the transaction has neither an ID nor a nonce
+        (it is then never treated as a replay)
+    """
+    if "transaction_id" in transaction:
+        return transaction["transaction_id"]
+    if "nonce" in transaction:
+        tx_string = json.dumps({"from": transaction["from"], "nonce": transaction["nonce"]},
+                               sort_keys=True, default=str)
+        return hashlib.sha256(tx_string.encode()).hexdigest()
+    return None
+
+
+class Mempool:
+    """
+    Pending transaction pool indexed by transaction key
+    
+    Lookups, duplicate checks and removals are O(1). Transactions without
+    a key (see transaction_key) are never rejected as duplicates; they are
+    stored under a pool-internal key (see key_of). Transactions are also
+    grouped per sender, and are handed to the miner either oldest-first or
+    highest-amount-first. The pool can be bounded by count and by
+    approximate encoded size; when full, a lower-priority transaction is
+    evicted to make room, or the new one is rejected if it ranks lowest.
+    """
+    
+    POLICY_OLDEST = "oldest"
+    POLICY_AMOUNT = "amount"
+    
+    def __init__(self, policy: str = POLICY_OLDEST, max_transactions: Optional[int] = None,
+                 max_bytes: Optional[int] = None,
+                 on_evict: Optional[Callable[[Dict], None]] = None):
+        """
+        Initialize the mempool
+        
+        Args:
+            policy: Block inclusion order (POLICY_OLDEST or POLICY_AMOUNT)
+            max_transactions: Maximum number of pending transactions
+            max_bytes: Maximum total JSON-encoded size of pending transactions
+            on_evict: Optional callback for transactions evicted to make room
+        """
+        if policy not in (self.POLICY_OLDEST, self.POLICY_AMOUNT):
+            raise ValueError(f"Unknown mempool policy: {policy}")
+        
+        self.policy = policy
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        
+        self._transactions: Dict[str, Dict] = {}  # key -> transaction, in arrival order
+        self._sizes: Dict[str, int] = {}
+        self._sequence: Dict[str, int] = {}
+        self._by_sender: Dict[str, Dict[str, None]] = {}  # sender -> ordered set of keys
+        self._eviction_heap: List = []  # (amount, -sequence, key), lazily pruned
+        self._unkeyed: Dict[int, str] = {}  # id() of a pending transaction without a key -> internal key
+        self._next_sequence = 0
+        self.total_bytes = 0
+        self.rejected_duplicates = 0
+        self.evicted = 0
+    
+    def __len__(self) -> int:
+        return len(self._transactions)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._transactions
+    
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(list(self._transactions.values()))
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Get a pending transaction by key"""
+        return self._transactions.get(key)
+    
+    def key_of(self, transaction: Dict) -> Optional[str]:
+        """Get the key a pending transaction is stored under (None if it is not pending)"""
+        key = transaction_key(transaction)
+        if key is None:
+            return self._unkeyed.get(id(transaction))
+        return key
+    
+    def get_by_sender(self, sender: str) -> List[Dict]:
+        """Get a sender's pending transactions, oldest first"""
+        return [self._transactions[key] for key in self._by_sender.get(sender, {})]
+    
+    def is_full(self) -> bool:
+        """Check whether the pool is at its count or size budget"""
+        if self.max_transactions is not None and len(self) >= self.max_transactions:
+            return True
+        return self.max_bytes is not None and self.total_bytes >= self.max_bytes
+    
+    def add(self, transaction: Dict) -> bool:
+        """
+        Add a transaction unless it is a duplicate or cannot be made room for
+        
+        Args:
+            transaction: Transaction dictionary
+        
+        Returns:
+            True if the transaction was added
+        """
+        key = transaction_key(transaction)
+        unkeyed = key is None
+        if unkeyed:
+            key = f"#{self._next_sequence}"
+        elif key in self._transactions:
+            self.rejected_duplicates += 1
+            print(f"Duplicate transaction rejected: {key}")
+            return False
+        
+        size = len(json.dumps(transaction, default=str))
+        if self.max_bytes is not None and size > self.max_bytes:
+            print("Transaction larger than the pool budget")
+            return False
+        while self._over_budget(1, size):
+            if not self._evict_for(transaction):
+                print("Transaction pool full")
+                return False
+        
+        sequence = self._next_sequence
+        self._next_sequence += 1
+        self._transactions[key] = transaction
+        if unkeyed:
+            self._unkeyed[id(transaction)] = key
+        self._sizes[key] = size
+        self._sequence[key] = sequence
+        self._by_sender.setdefault(transaction["from"], {})[key] = None
+        self.total_bytes += size
+        if self.policy == self.POLICY_AMOUNT:
+            heapq.heappush(self._eviction_heap, (transaction["amount"], -sequence, key))
+        return True
+    
+    def _over_budget(self, extra_count: int, extra_bytes: int) -> bool:
+        if self.max_transactions is not None and len(self) + extra_count > self.max_transactions:
+            return True
+        return self.max_bytes is not None and self.total_bytes + extra_bytes > self.max_bytes
+    
+    def _evict_for(self, transaction: Dict) -> bool:
+        """Evict the lowest-priority transaction if it ranks below the newcomer"""
+        if self.policy == self.POLICY_OLDEST or not self._transactions:
+            return False  # the newcomer is always the lowest priority
+        
+        while self._eviction_heap:
+            amount, negative_sequence, key = self._eviction_heap[0]
+            if self._sequence.get(key) != -negative_sequence:
+                heapq.heappop(self._eviction_heap)  # stale entry
+                continue
+            if amount >= transaction["amount"]:
+                return False
+            heapq.heappop(self._eviction_heap)
+            evicted = self.remove(key)
+            self.evicted += 1
+            if self.on_evict:
+                self.on_evict(evicted)
+            return True
+        return False
+    
+    def remove(self, key: str) -> Optional[Dict]:
+        """
+        Remove a transaction by key
+        
+        Returns:
+            The removed transaction, or None if it was not pending
+        """
+        transaction = self._transactions.pop(key, None)
+        if transaction is None:
+            return None
+        
+        self.total_bytes -= self._sizes.pop(key)
+        del self._sequence[key]
+        if self._unkeyed.get(id(transaction)) == key:
+            del self._unkeyed[id(transaction)]
+        sender_keys = self._by_sender[transaction["from"]]
+        del sender_keys[key]
+        if not sender_keys:
+            del self._by_sender[transaction["from"]]
+        
+        if len(self._eviction_heap) > 2 * len(self._transactions) + 64:
+            self._eviction_heap = [entry for entry in self._eviction_heap
+                                   if self._sequence.get(entry[2]) == -entry[1]]
+            heapq.heapify(self._eviction_heap)
+        return transaction
+    
+    def select(self, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Get pending transactions in block inclusion order
+        
+        Args:
+            limit: Maximum number of transactions to return
+        
+        Returns:
+            Transactions, oldest first or highest amount first per the policy
+        """
+        if self.policy == self.POLICY_AMOUNT:
+            count = len(self) if limit is None else limit
+            keys = heapq.nsmallest(count, self._transactions,
+                                   key=lambda k: (-self._transactions[k]["amount"], self._sequence[k]))
+            return [self._transactions[key] for key in keys]
+        
+        transactions = self._transactions.values()
+        if limit is None:
+            return list(transactions)
+        return [tx for tx, _ in zip(transactions, range(limit))]
+    
+    def clear(self) -> None:
+        """Remove all pending transactions"""
+        self._transactions.clear()
+        self._sizes.clear()
+        self._sequence.clear()
+        self._by_sender.clear()
+        self._eviction_heap = []
+        self._unkeyed.clear()
+        self.total_bytes = 0
+
+
 class TransactionPool:
     """Manages pending transactions"""
     
-    def __init__(self):
-        self.pending_transactions = []
+    def __init__(self, policy: str = Mempool.POLICY_OLDEST,
+                 max_transactions: Optional[int] = None):
+        self.mempool = Mempool(policy, max_transactions)
     
     def add_transaction(self, transaction: Transaction) -> bool:
         """
@@ -113,7 +497,8 @@ class TransactionPool:
             print(f"Invalid transaction: {transaction}")
             return False
         
-        self.pending_transactions.append(transaction)
+        if not self.mempool.add(transaction.to_dict()):
+            return False
         print(f"Transaction added to pool: {transaction.transaction_id}")
         return True
     
@@ -127,14 +512,11 @@ class TransactionPool:
         Returns:
             List of transaction dictionaries
         """
-        transactions = [tx.to_dict() for tx in self.pending_transactions]
-        if limit:
-            return transactions[:limit]
-        return transactions
+        return self.mempool.select(limit or None)
     
     def clear(self) -> None:
         """Clear all pending transactions"""
-        self.pending_transactions = []
+        self.mempool.clear()
     
     def remove_transaction(self, transaction_id: str) -> bool:
         """
@@ -146,12 +528,8 @@ class TransactionPool:
         Returns:
             True if transaction was removed
         """
-        for i, tx in enumerate(self.pending_transactions):
-            if tx.transaction_id == transaction_id:
-                self.pending_transactions.pop(i)
-                return True
-        return False
+        return self.mempool.remove(transaction_id) is not None
     
     def get_count(self) -> int:
         """Get number of pending transactions"""
-        return len(self.pending_transactions)
+        return len(self.mempool)
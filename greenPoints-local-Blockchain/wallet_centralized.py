@@ -5,10 +5,13 @@ Supports 3 user types: Tourist, User, Business
 
 import json
 import hashlib
+import threading
 import time
 from typing import Dict, List, Optional
 from enum import Enum
 
+from leaderboard import Leaderboard
+
 
 class UserType(Enum):
     """Types of users in the system"""
@@ -41,10 +44,7 @@ class Wallet:
         self.created_at = time.time()
         self.reward_points = 0  # Points that can be redeemed for rewards
         self.metadata = {
-            "total_tasks_completed": 0,
-            "total_gp_earned": 0,
-            "total_gp_spent": 0,
-            "rank": 0
+            "rank": 0  # activity totals come from the chain's counters, not the wallet
         }
     
     def generate_address(self, user_id: int, username: str) -> str:
@@ -117,8 +117,9 @@ class UserManager:
         self.wallets: Dict[str, Wallet] = {}  # address -> Wallet
         self.user_id_to_address: Dict[int, str] = {}  # user_id -> address
         self.username_to_address: Dict[str, str] = {}  # username -> address
-        self.leaderboard_cache = []
-        self.leaderboard_last_updated = 0
+        self.leaderboard = Leaderboard()  # user_id ranked by confirmed GP balance
+        self.blockchain = None  # chain the leaderboard follows (see attach())
+        self._leaderboard_lock = threading.Lock()
     
     def create_wallet_from_db(self, user_id: int, username: str, user_type: str,
                              email: Optional[str] = None, phone: Optional[str] = None) -> Optional[Wallet]:
@@ -150,6 +151,7 @@ class UserManager:
         self.wallets[wallet.address] = wallet
         self.user_id_to_address[user_id] = wallet.address
         self.username_to_address[username] = wallet.address
+        self._rank_new_wallet(wallet)
         
         print(f"✓ Wallet created for {user_type_enum.value}: '{username}' (ID: {user_id})")
         return wallet
@@ -210,56 +212,130 @@ class UserManager:
         """Get total number of users"""
         return len(self.wallets)
     
-    def get_leaderboard(self, blockchain, limit: int = 10, force_refresh: bool = False) -> List[Dict]:
+    def attach(self, blockchain) -> None:
         """
-        Get leaderboard of top GP holders
+        Rank every wallet and keep the leaderboard in step with a blockchain
         
-        Args:
-            blockchain: Blockchain instance to get balances
-            limit: Number of top users to return
-            force_refresh: Force refresh of leaderboard cache
+        The leaderboard is updated from Blockchain.block_listeners, i.e. in
+        the same pass that credits a block's balances, so it is never
+        behind the balances it ranks. Re-attaching re-scores every wallet.
         
-        Returns:
-            List of user dictionaries with rankings
+        Args:
+            blockchain: Blockchain whose confirmed balances are ranked
         """
-        # Cache leaderboard for 5 minutes
-        if not force_refresh and time.time() - self.leaderboard_last_updated < 300:
-            return self.leaderboard_cache[:limit]
-        
-        leaderboard = []
-        for wallet in self.wallets.values():
-            balance = blockchain.get_balance(wallet.address)
-            leaderboard.append({
-                "rank": 0,  # Will be set after sorting
+        with self._leaderboard_lock:
+            if self.blockchain is not blockchain:
+                if self.blockchain is not None:
+                    self.blockchain.block_listeners.remove(self._on_block)
+                blockchain.block_listeners.append(self._on_block)
+                self.blockchain = blockchain
+            self.leaderboard.clear()
+            for wallet in self.wallets.values():
+                self._rank_wallet(wallet)
+    
+    def _follow(self, blockchain, force_refresh: bool = False) -> None:
+        """Attach to the blockchain a query is made against, if not attached already"""
+        if force_refresh or self.blockchain is not blockchain:
+            self.attach(blockchain)
+    
+    def _rank_wallet(self, wallet: Wallet) -> None:
+        self.leaderboard.update(wallet.user_id, self.blockchain.get_balance(wallet.address),
+                                wallet.user_type.value)
+    
+    def _rank_new_wallet(self, wallet: Wallet) -> None:
+        with self._leaderboard_lock:
+            if self.blockchain is not None:
+                self._rank_wallet(wallet)
+    
+    def _on_block(self, block) -> None:
+        """Block listener: re-score the wallets whose balances the block changed"""
+        with self._leaderboard_lock:
+            for tx in block.transactions:
+                for address in (tx.sender, tx.recipient):
+                    wallet = self.wallets.get(address)
+                    if wallet:
+                        self._rank_wallet(wallet)
+    
+    def _leaderboard_entries(self, ranked: List) -> List[Dict]:
+        """Expand (rank, user_id, balance) tuples into leaderboard entries"""
+        entries = []
+        for rank, user_id, balance in ranked:
+            wallet = self.get_wallet_by_user_id(user_id)
+            wallet.metadata["rank"] = rank
+            counters = self.blockchain.get_address_counters(wallet.address)
+            entries.append({
+                "rank": rank,
                 "user_id": wallet.user_id,
                 "username": wallet.username,
                 "user_type": wallet.user_type.value,
                 "address": wallet.address,
                 "gp_balance": balance,
                 "reward_points": wallet.reward_points,
-                "tasks_completed": wallet.metadata.get("total_tasks_completed", 0),
-                "total_gp_earned": wallet.metadata.get("total_gp_earned", 0)
+                "tasks_completed": counters["tasks_completed"],
+                "total_gp_earned": counters["gp_earned"]
             })
+        return entries
+    
+    def get_leaderboard(self, blockchain, limit: int = 10, force_refresh: bool = False,
+                        user_type: Optional[UserType] = None) -> List[Dict]:
+        """
+        Get leaderboard of top GP holders
+        
+        Args:
+            blockchain: Blockchain instance to get balances
+            limit: Number of top users to return
+            force_refresh: Re-score every wallet from the current balances
+            user_type: Rank only users of this type (ranks are within the type)
         
-        # Sort by GP balance
-        leaderboard.sort(key=lambda x: x["gp_balance"], reverse=True)
+        Returns:
+            List of user dictionaries with rankings
+        """
+        group = user_type.value if user_type else None
+        self._follow(blockchain, force_refresh)
+        with self._leaderboard_lock:
+            return self._leaderboard_entries(self.leaderboard.top(limit, group))
+    
+    def get_user_rank(self, user_id: int, blockchain,
+                      user_type: Optional[UserType] = None) -> Optional[int]:
+        """
+        Get a user's leaderboard rank
         
-        # Assign ranks
-        for i, user in enumerate(leaderboard, 1):
-            user["rank"] = i
-            # Update wallet metadata
-            wallet = self.get_wallet_by_user_id(user["user_id"])
-            if wallet:
-                wallet.metadata["rank"] = i
+        Args:
+            user_id: Database user ID
+            blockchain: Blockchain instance to get balances
+            user_type: Rank within this user type instead of overall
         
-        self.leaderboard_cache = leaderboard
-        self.leaderboard_last_updated = time.time()
+        Returns:
+            1-based rank, or None if the user is unknown (or of another type)
+        """
+        group = user_type.value if user_type else None
+        self._follow(blockchain)
+        with self._leaderboard_lock:
+            return self.leaderboard.rank(user_id, group)
+    
+    def get_users_around(self, user_id: int, blockchain, radius: int = 5,
+                         user_type: Optional[UserType] = None) -> List[Dict]:
+        """
+        Get a user's leaderboard neighbourhood ("users around me")
+        
+        Args:
+            user_id: Database user ID
+            blockchain: Blockchain instance to get balances
+            radius: Number of users to include above and below
+            user_type: Rank within this user type instead of overall
         
-        return leaderboard[:limit]
+        Returns:
+            Leaderboard entries from rank - radius to rank + radius
+        """
+        group = user_type.value if user_type else None
+        self._follow(blockchain)
+        with self._leaderboard_lock:
+            return self._leaderboard_entries(self.leaderboard.around(user_id, radius, group))
     
-    def get_leaderboard_json(self, blockchain, limit: int = 10) -> str:
+    def get_leaderboard_json(self, blockchain, limit: int = 10,
+                             user_type: Optional[UserType] = None) -> str:
         """Get leaderboard as JSON string"""
-        leaderboard = self.get_leaderboard(blockchain, limit)
+        leaderboard = self.get_leaderboard(blockchain, limit, user_type=user_type)
         return json.dumps({
             "success": True,
             "timestamp": time.time(),
@@ -287,11 +363,10 @@ class UserManager:
             })
         
         balance = blockchain.get_balance(wallet.address)
-        tx_history = blockchain.get_transaction_history(wallet.address)
+        counters = blockchain.get_address_counters(wallet.address)
+        recent_transactions, _ = blockchain.get_transaction_page(wallet.address, limit=10)
         
-        # Get user's rank
-        leaderboard = self.get_leaderboard(blockchain, limit=1000)
-        rank = next((u["rank"] for u in leaderboard if u["user_id"] == user_id), 0)
+        rank = self.get_user_rank(user_id, blockchain) or 0
         
         stats = {
             "success": True,
@@ -310,12 +385,12 @@ class UserManager:
             },
             "statistics": {
                 "rank": rank,
-                "total_tasks_completed": wallet.metadata.get("total_tasks_completed", 0),
-                "total_gp_earned": wallet.metadata.get("total_gp_earned", 0),
-                "total_gp_spent": wallet.metadata.get("total_gp_spent", 0),
-                "total_transactions": len(tx_history)
+                "total_tasks_completed": counters["tasks_completed"],
+                "total_gp_earned": counters["gp_earned"],
+                "total_gp_spent": counters["gp_spent"],
+                "total_transactions": blockchain.get_transaction_count(wallet.address)
             },
-            "recent_transactions": tx_history[-10:]  # Last 10 transactions
+            "recent_transactions": recent_transactions  # Last 10 transactions
         }
         
         return json.dumps(stats, indent=2)
@@ -358,8 +433,9 @@ class UserManager:
                         balance = blockchain.get_balance(wallet.address)
                         print(f"GP Balance: {balance} (x{wallet.get_multiplier()} multiplier)")
                         print(f"Reward Points: {wallet.reward_points}")
+                        counters = blockchain.get_address_counters(wallet.address)
+                        print(f"Tasks Completed: {counters['tasks_completed']}")
                     
-                    print(f"Tasks Completed: {wallet.metadata.get('total_tasks_completed', 0)}")
                     print("-" * 80)
     
     def save_to_file(self, filename: str = "blockchain_users.json") -> None:
@@ -398,6 +474,7 @@ class UserManager:
                 self.wallets[wallet.address] = wallet
                 self.user_id_to_address[wallet.user_id] = wallet.address
                 self.username_to_address[wallet.username] = wallet.address
+                self._rank_new_wallet(wallet)
             
             print(f"✓ Loaded {len(self.wallets)} users from {filename}")
             return True